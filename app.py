@@ -1,18 +1,60 @@
 import streamlit as st
+import altair as alt
+import pandas as pd
 import os
 import json
 import tempfile
 import vertexai
 from vertexai import agent_engines
 import uuid
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from google.oauth2 import service_account
 
+from deployment.coalesce import Coalescer, merge
+from deployment.events import (
+    TurnTiming, collect_output_text, event_text, query_events, stream_output_text, waterfall_rows
+)
+from deployment.gateway_client import GatewayBusy, GatewayClient
+from deployment.routing import DeploymentRouter
+from deployment.scheduler import QueueFull, QueueTimeout, default_scheduler, priority_for
+from deployment.session_pool import SessionPool
+from deployment.transcript import Transcript, TranscriptStore
+from deployment.usage import UsageLedger
+from proto_1 import settings
+from proto_1.crisis import assess as assess_crisis, crisis_response
+from proto_1.resilience import backoff_delay
+from proto_1.schemas import AGENT_SCHEMAS
+from proto_1.structured import decode, decode_stats
+from proto_1.tracing import critical_path
+
 # === Load credentials from Streamlit Secrets ===
-PROJECT_ID = st.secrets["PROJECT_ID"]
-LOCATION = st.secrets["LOCATION"] 
-STAGING_BUCKET = st.secrets["STAGING_BUCKET"]
-RESOURCE_ID = st.secrets["RESOURCE_ID"]
+# "local" runs the pipeline in-process (deployment/local.py) and needs no GCP secrets.
+RUNTIME = st.secrets.get("RUNTIME", settings.RUNTIME)
+PROJECT_ID = st.secrets.get("PROJECT_ID")
+LOCATION = st.secrets.get("LOCATION")
+STAGING_BUCKET = st.secrets.get("STAGING_BUCKET")
+RESOURCE_ID = st.secrets.get("RESOURCE_ID")
+# When set, turns go through a running deployment/gateway.py instead of
+# being driven from this process.
+GATEWAY_URL = st.secrets.get("GATEWAY_URL", settings.GATEWAY_URL)
+# "sse" streams output_agent tokens as they are generated; "none" buffers.
+STREAMING_MODE = st.secrets.get("STREAMING_MODE", "sse")
+
+# Turns kept for the Debug Mode latency waterfall.
+TRACE_TURNS = 20
+
+# Messages drawn at first, and added by each "Show earlier messages".
+HISTORY_PAGE = 50
+
+FALLBACK_REPLY = "I'm here to listen and support you. Could you tell me more about how you're feeling?"
+BUSY_REPLY = (
+    "I'm talking with a lot of people right now and couldn't get to your message. "
+    "Please send it again in a moment."
+)
 
 # === Streamlit Page Configuration ===
 st.set_page_config(
@@ -53,6 +95,16 @@ st.markdown("""
         box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
         border: 1px solid #dee2e6;
     }
+    .crisis-message {
+        background: linear-gradient(135deg, #fff5f5 0%, #ffe3e3 100%);
+        color: #333;
+        padding: 1rem 1.5rem;
+        border-radius: 20px 20px 20px 5px;
+        margin: 1rem 0;
+        margin-right: 15%;
+        box-shadow: 0 4px 15px rgba(220, 53, 69, 0.2);
+        border-left: 5px solid #dc3545;
+    }
     .message-time {
         font-size: 0.75rem;
         opacity: 0.7;
@@ -83,10 +135,20 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # === Agent Initialization with Service Account ===
-@st.cache_resource
 def initialize_agent():
     """Initialize connection to Vertex AI agent with proper authentication."""
     try:
+        if GATEWAY_URL:
+            return GatewayClient(GATEWAY_URL), True, f"Connected through the gateway at {GATEWAY_URL}."
+
+        if RUNTIME == "local":
+            # Imported here so the engine and gateway runtimes never load the
+            # local runner or define its absl flags.
+            from deployment.local import LocalApp
+
+            local_app = LocalApp()
+            return local_app, True, f"Running Saarthi locally on the '{local_app.backend}' backend."
+
         # Method 1: Try using service account key from secrets
         if "GOOGLE_SERVICE_ACCOUNT_KEY" in st.secrets:
             # Create credentials from service account key
@@ -115,6 +177,10 @@ def initialize_agent():
                 staging_bucket=STAGING_BUCKET,
             )
 
+        if settings.DEPLOYMENTS:
+            router = DeploymentRouter.from_resources(settings.DEPLOYMENTS, agent_engines.get)
+            return router, True, f"Connected to {len(router.targets)} Saarthi deployments."
+
         # Get the deployed agent
         remote_app = agent_engines.get(RESOURCE_ID)
         return remote_app, True, "Connected to your mental health support bot!"
@@ -122,38 +188,198 @@ def initialize_agent():
     except Exception as e:
         return None, False, f"Connection failed: {str(e)}"
 
+# === Background Pipeline Runs ===
+@st.cache_resource
+def background_executor():
+    """Shared worker pool for pipeline runs that finish after the page has rendered."""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="saarthi-bg")
+
+# === Transcript Storage ===
+@st.cache_resource
+def transcript_store():
+    """Where every session's older messages go once they leave its in-memory window."""
+    return TranscriptStore()
+
+# === Background Connect ===
+@st.cache_resource
+def agent_connection():
+    """Connects once per process, off the script thread, so the first page renders at once.
+
+    The future resolves to ``(remote_app, session_pool, success, message)``.
+    """
+    def connect():
+        remote_app, success, message = initialize_agent()
+        return remote_app, SessionPool(remote_app) if success else None, success, message
+
+    return background_executor().submit(connect)
+
+# === Outbound Scheduling ===
+def outbound_scheduler():
+    """The scheduler shared by every session in this process; the gateway schedules its own turns."""
+    return None if GATEWAY_URL else default_scheduler()
+
 # === Agent Response Handler ===
-def get_agent_response(remote_app, user_id, session_id, message, debug=False):
+def open_agent_stream(remote_app, user_id, session_id, message, debug=False, on_wait=None, on_send=None):
+    """Waits for a slot from the outbound scheduler, starts a stream_query call and yields its raw events."""
+    scheduler = outbound_scheduler()
+    if scheduler:
+        scheduler.acquire(priority_for(message), on_wait=on_wait)
+    if on_send:
+        on_send()
+    events = query_events(
+        remote_app, user_id, session_id, message, STREAMING_MODE, attempts=settings.RETRY_ATTEMPTS
+    )
     try:
-        response_text = ""
-        for event in remote_app.stream_query(
-            user_id=user_id,
-            session_id=session_id,
-            message=message,
-        ):
+        for event in events:
             if debug:
-                st.write("DEBUG Event:", event.get("author", "unknown"))
-            if event.get("author") == "output_agent":
-                for part in event.get("content", {}).get("parts", []):
-                    if "text" in part:
-                        response_text = part["text"].strip()
-                        break
-
-        return response_text or "I'm here to listen and support you. Could you tell me more about how you're feeling?"
+                author = event.get("author", "unknown")
+                st.write("DEBUG Event:", author)
+                if author in AGENT_SCHEMAS and event_text(event):
+                    decoded = decode(author, event_text(event))
+                    st.json(decoded.value.model_dump() if decoded.ok else {"decode_failed": decoded.error})
+            yield event
+    finally:
+        events.close()
+
+
+def get_agent_response(remote_app, user_id, session_id, message, debug=False, timing=None, on_send=None):
+    try:
+        response_text = collect_output_text(
+            open_agent_stream(remote_app, user_id, session_id, message, debug, on_send=on_send), timing
+        )
+        return response_text or FALLBACK_REPLY
+    except (QueueFull, QueueTimeout, GatewayBusy):
+        return BUSY_REPLY
+    except Exception as e:
+        return f"I'm experiencing technical difficulties: {str(e)}"
+
+
+def stream_agent_response(
+    remote_app, user_id, session_id, message, placeholder, debug=False, timing=None, on_send=None
+):
+    """Renders output_agent deltas into a live placeholder and returns the full reply."""
+    response_text = ""
+
+    def show_queue(position, waited):
+        with placeholder:
+            st.caption(f"Saarthi is busy right now; {position} message(s) ahead of yours ({waited:.0f}s)...")
+
+    try:
+        for delta in stream_output_text(
+            open_agent_stream(
+                remote_app, user_id, session_id, message, debug, on_wait=show_queue, on_send=on_send
+            ),
+            timing,
+        ):
+            response_text += delta
+            placeholder.markdown(
+                message_html("assistant", response_text, datetime.now().strftime("%H:%M:%S")),
+                unsafe_allow_html=True,
+            )
+    except (QueueFull, QueueTimeout, GatewayBusy):
+        return BUSY_REPLY
     except Exception as e:
+        if response_text.strip():
+            # Keep what already streamed; the user has been reading it.
+            return f"{response_text.strip()} … (the rest of my reply was cut off: {str(e)})"
         return f"I'm experiencing technical difficulties: {str(e)}"
+    return response_text.strip() or FALLBACK_REPLY
 
 # === Session Creator ===
-def create_session(remote_app, user_id):
+def start_session(pool, user_id=None):
+    """Takes a pre-created session; without ``user_id`` it comes with a fresh one."""
     try:
-        session = remote_app.create_session(user_id=user_id)
-        return session["id"], True
+        user_id, session_id = pool.take(user_id)
+        return user_id, session_id, True
     except Exception as e:
-        return None, False
+        return user_id, None, False
+
+
+def begin_session(user_id, session_id):
+    """Makes a visitor's first session current and greets them."""
+    st.session_state.user_id = user_id
+    st.session_state.session_id = session_id
+    # Add welcome message
+    st.session_state.messages.append({
+        "role": "assistant",
+        "content": "Hello! I'm Saarthi, your AI mental health support companion. I'm here to provide a safe, non-judgmental space for you to express your thoughts and feelings. How are you doing today?",
+        "timestamp": datetime.now().strftime("%H:%M:%S")
+    })
+    first_paint = st.session_state.first_paint
+    first_paint["ready_s"] = round(time.perf_counter() - first_paint["started"], 3)
+
+
+def adopt_connection(remote_app, pool, success, message):
+    """Stores a finished connect in the session and opens its first session.
+
+    A pooled session is used at once; otherwise one is created in the
+    background and picked up by a later run.
+    """
+    if not success:
+        st.session_state.connect_error = message
+        return
+    st.session_state.remote_app = remote_app
+    st.session_state.session_pool = pool
+    st.session_state.agent_connected = True
+    st.session_state.connect_error = None
+    if st.session_state.session_id or st.session_state.opening_session:
+        return
+    ready = pool.take(create=False)
+    if ready:
+        begin_session(*ready)
+    else:
+        open_session_in_background(pool)
+
+
+def open_session_in_background(pool, attempt=0):
+    """Creates the first session off the script thread, backing off before a retry."""
+    def take():
+        if attempt:
+            time.sleep(backoff_delay(attempt - 1, settings.RETRY_BASE_DELAY, settings.RETRY_MAX_DELAY))
+        return pool.take()
+
+    st.session_state.opening_attempt = attempt
+    st.session_state.opening_session = background_executor().submit(take)
+
+# === Message Rendering ===
+def message_html(role, content, timestamp, crisis=False):
+    role_class = "user-message" if role == "user" else "bot-message"
+    if crisis:
+        role_class = "crisis-message"
+        content = content.replace("\n", "<br>")
+    role_label = "You" if role == "user" else "Saarthi"
+    return f"""
+            <div class="{role_class}">
+                {content}
+                <div class="message-time">{role_label} • {timestamp}</div>
+            </div>
+            """
+
+
+def stored_message_html(role, content, timestamp, crisis=False):
+    """``message_html`` for messages already in the transcript, which never change."""
+    return message_html(role, content, timestamp, crisis).strip()
 
 # === Session State Defaults ===
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.messages = Transcript(transcript_store())
+
+# Rendered transcript messages. Cached per session, so a conversation's
+# content goes when its session does.
+if "message_html_cache" not in st.session_state:
+    st.session_state.message_html_cache = functools.lru_cache(maxsize=settings.TRANSCRIPT_WINDOW)(
+        stored_message_html
+    )
+
+# Pending messages and the coalesced turn being sent, when coalescing is on.
+if "coalescer" not in st.session_state:
+    st.session_state.coalescer = Coalescer() if settings.COALESCE_WINDOW > 0 else None
+
+if "inflight_turn" not in st.session_state:
+    st.session_state.inflight_turn = None
+
+if "history_shown" not in st.session_state:
+    st.session_state.history_shown = HISTORY_PAGE
 
 if "session_id" not in st.session_state:
     st.session_state.session_id = None
@@ -167,11 +393,273 @@ if "agent_connected" not in st.session_state:
 if "remote_app" not in st.session_state:
     st.session_state.remote_app = None
 
+if "session_pool" not in st.session_state:
+    st.session_state.session_pool = None
+
+if "connect_error" not in st.session_state:
+    st.session_state.connect_error = None
+
+if "opening_session" not in st.session_state:
+    st.session_state.opening_session = None
+
+# Why the first session could not be opened, and tries so far.
+if "session_error" not in st.session_state:
+    st.session_state.session_error = None
+
+if "opening_attempt" not in st.session_state:
+    st.session_state.opening_attempt = 0
+
+# Deployment the router moved this session to, which lacks its earlier turns.
+if "session_moved" not in st.session_state:
+    st.session_state.session_moved = None
+
+# Seconds from the first script run to the page being sent (first_paint_s)
+# and to the first session being ready (ready_s).
+if "first_paint" not in st.session_state:
+    st.session_state.first_paint = {"started": time.perf_counter()}
+
 if "debug_mode" not in st.session_state:
     st.session_state.debug_mode = False
 
+if "stream_replies" not in st.session_state:
+    st.session_state.stream_replies = True
+
+if "latency_log" not in st.session_state:
+    st.session_state.latency_log = []
+
+if "usage_ledger" not in st.session_state:
+    st.session_state.usage_ledger = UsageLedger()
+
+if "trace_log" not in st.session_state:
+    st.session_state.trace_log = []
+
+if "pending_replies" not in st.session_state:
+    st.session_state.pending_replies = []
+
+if "escalations" not in st.session_state:
+    st.session_state.escalations = []
+
+# === Pending Follow-ups ===
+def follow_up_turn(remote_app, user_id, session_id, message, after=()):
+    """Runs a crisis follow-up off the script thread; returns ``(reply, timing)``.
+
+    Waits for the follow-ups in ``after`` first, so the session only ever
+    has one turn running, and follows any failover they reported.
+    """
+    for earlier in after:
+        _, earlier_timing = earlier.result()
+        if earlier_timing.failover:
+            session_id = earlier_timing.failover["session_id"]
+    timing = TurnTiming()
+    return get_agent_response(remote_app, user_id, session_id, message, timing=timing), timing
+
+
+def settle_pending_replies(wait=False):
+    """Adds finished follow-ups to the chat in order; with ``wait``, all of them."""
+    pending = st.session_state.pending_replies
+    while pending and (wait or pending[0].done()):
+        response, timing = pending.pop(0).result()
+        record_turn(timing, streamed=False)
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": response,
+            "timestamp": datetime.now().strftime("%H:%M:%S")
+        })
+
+
+@st.fragment(run_every=1.0)
+def poll_pending_replies():
+    """Appends background pipeline replies to the chat once they finish."""
+    if not st.session_state.pending_replies[0].done():
+        st.caption("Saarthi is preparing a follow-up...")
+        return
+    settle_pending_replies()
+    st.rerun()
+
+# === Chat History ===
+def show_earlier():
+    st.session_state.history_shown += HISTORY_PAGE
+
+
+@st.fragment
+def render_history():
+    """Draws the newest ``history_shown`` messages as one block.
+
+    Older messages stay in the transcript store until the user asks for
+    them; paging reruns only this fragment.
+    """
+    transcript = st.session_state.messages
+    start = max(0, len(transcript) - st.session_state.history_shown)
+    if start:
+        st.caption(f"{start} earlier message(s)")
+        st.button("Show earlier messages", key="show_earlier", on_click=show_earlier)
+    st.markdown(
+        "\n\n".join(
+            st.session_state.message_html_cache(
+                message["role"], message["content"], message["timestamp"], message.get("crisis", False)
+            )
+            for message in transcript.slice(start)
+        ),
+        unsafe_allow_html=True,
+    )
+
+# === Message Coalescing ===
+def settle_superseded():
+    """Hands a coalesced turn that a newer run cut short back to the coalescer."""
+    turn = st.session_state.inflight_turn
+    if turn:
+        st.session_state.inflight_turn = None
+        st.session_state.coalescer.supersede(turn["messages"], turn["sent"])
+
+
+def reset_coalescing():
+    st.session_state.coalescer = Coalescer() if settings.COALESCE_WINDOW > 0 else None
+    st.session_state.inflight_turn = None
+
+
+@st.fragment(run_every=0.25)
+def await_coalesced():
+    """Waits out the coalescing window, then reruns the page to send the turn."""
+    if st.session_state.coalescer.due():
+        st.rerun()
+    st.caption("Saarthi is listening...")
+
+# === Waiting for the Connection ===
+@st.fragment(run_every=0.25)
+def await_connection():
+    """Reruns the page once the background connect, or first session, is ready."""
+    if (st.session_state.opening_session or agent_connection()).done():
+        st.rerun()
+    st.caption("Connecting to Saarthi...")
+
+# === Latency Waterfall ===
+def render_waterfall(trace_log, turns):
+    """Per-stage bars for the last ``turns`` turns, plus p95 per stage."""
+    recent = trace_log[-turns:]
+    rows = [
+        {**row, "turn": f"#{entry['turn']}"} for entry in recent for row in entry["rows"]
+    ]
+    if not rows:
+        st.caption("No traced turns yet.")
+        return
+    chart = alt.Chart(pd.DataFrame(rows)).mark_bar().encode(
+        x=alt.X("start_s:Q", title="seconds"),
+        x2="end_s:Q",
+        y=alt.Y("name:N", title=None, sort=None),
+        color="kind:N",
+        row=alt.Row("turn:N", title=None, sort="descending"),
+        tooltip=["turn", "name", "kind", alt.Tooltip("start_s:Q", format=".3f"),
+                 alt.Tooltip("end_s:Q", format=".3f")],
+    ).properties(height=max(60, 18 * len({row["name"] for row in rows})))
+    st.altair_chart(chart, use_container_width=True)
+
+    summaries = [entry["summary"] for entry in recent if entry["summary"]["durations"]]
+    if not summaries:
+        st.caption("Server-side spans unavailable; bars show client arrival times.")
+        return
+    parallelism = [summary["parallelism"] for summary in summaries if summary["parallelism"] is not None]
+    if parallelism:
+        st.metric("Context parallelism (median)", f"{pd.Series(parallelism).median():.2f}x")
+    durations = pd.DataFrame([summary["durations"] for summary in summaries])
+    p95 = durations.quantile(0.95).sort_values(ascending=False).rename("p95_s")
+    slowest = pd.Series([summary["slowest"] for summary in summaries]).value_counts().rename("on_critical_path")
+    st.dataframe(pd.concat([p95, slowest], axis=1).fillna(0), use_container_width=True)
+
 # === Main App ===
+# === Pipeline Turn ===
+def record_turn(timing, streamed):
+    """Follows a turn's failover and logs its latency, trace and token usage."""
+    if timing.failover:
+        # The router replaced the session; later turns must use the new one.
+        st.session_state.session_id = timing.failover["session_id"]
+        st.session_state.session_moved = timing.failover["target"]
+    st.session_state.latency_log.append({"streamed": streamed, **timing.as_dict()})
+    st.session_state.trace_log.append({
+        "turn": len(st.session_state.latency_log),
+        "rows": waterfall_rows(timing),
+        "summary": critical_path(timing.trace),
+    })
+    del st.session_state.trace_log[:-TRACE_TURNS]
+    for agent, usage in timing.usage.items():
+        st.session_state.usage_ledger.record(
+            st.session_state.user_id, st.session_state.session_id, agent, usage
+        )
+
+
+def run_turn(message, sent_at=None, on_send=None):
+    """Sends one turn through the pipeline, shows the reply and reruns the page.
+
+    ``sent_at`` echoes the user's message above a streamed reply; coalesced
+    turns leave it out, as their messages are already in the history.
+    """
+    if st.session_state.pending_replies:
+        # One turn per session at a time: a crisis follow-up still running
+        # goes first, and may have moved the session.
+        with st.spinner("Saarthi is finishing its follow-up..."):
+            settle_pending_replies(wait=True)
+    timing = TurnTiming()
+    if st.session_state.stream_replies:
+        if sent_at:
+            st.markdown(
+                message_html("user", message, sent_at),
+                unsafe_allow_html=True,
+            )
+        placeholder = st.empty()
+        with placeholder:
+            st.caption("Saarthi is responding...")
+        response = stream_agent_response(
+            st.session_state.remote_app,
+            st.session_state.user_id,
+            st.session_state.session_id,
+            message,
+            placeholder,
+            debug=st.session_state.debug_mode,
+            timing=timing,
+            on_send=on_send,
+        )
+    else:
+        with st.spinner("Saarthi is responding..."):
+            response = get_agent_response(
+                st.session_state.remote_app,
+                st.session_state.user_id,
+                st.session_state.session_id,
+                message,
+                debug=st.session_state.debug_mode,
+                timing=timing,
+                on_send=on_send,
+            )
+    record_turn(timing, st.session_state.stream_replies)
+
+    # Add agent response
+    st.session_state.messages.append({
+        "role": "assistant",
+        "content": response,
+        "timestamp": datetime.now().strftime("%H:%M:%S")
+    })
+    st.session_state.inflight_turn = None
+
+    st.rerun()
+
 def main():
+    # Pick up the background connect and first session once they have
+    # finished; never wait for them here.
+    if not st.session_state.agent_connected and not st.session_state.connect_error:
+        connection = agent_connection()
+        if connection.done():
+            adopt_connection(*connection.result())
+    opening = st.session_state.opening_session
+    if opening and opening.done():
+        st.session_state.opening_session = None
+        try:
+            begin_session(*opening.result())
+            st.session_state.session_error = None
+        except Exception as e:
+            logging.warning("Could not create the first session", exc_info=True)
+            st.session_state.session_error = str(e)
+            attempt = st.session_state.opening_attempt + 1
+            if attempt < settings.RETRY_ATTEMPTS:
+                open_session_in_background(st.session_state.session_pool, attempt)
+
     # Header
     st.markdown("""
     <div class="main-header">
@@ -200,22 +688,35 @@ def main():
         st.header("Control Center")
 
         st.session_state.debug_mode = st.checkbox("Debug Mode", value=st.session_state.debug_mode)
+        st.session_state.stream_replies = st.checkbox("Stream Replies", value=st.session_state.stream_replies)
+
+        if st.session_state.debug_mode:
+            st.subheader("Latency Waterfall")
+            turns = st.slider("Turns", 1, TRACE_TURNS, min(5, TRACE_TURNS))
+            render_waterfall(st.session_state.trace_log, turns)
 
         if st.session_state.agent_connected:
             st.success("Connected")
         else:
             st.error("Not connected")
 
+        scheduler = outbound_scheduler()
+        waiting = scheduler.snapshot()["queue_depth"] if scheduler else 0
+        if waiting:
+            st.warning(f"High load: {waiting} message(s) waiting to be sent.")
+
         if st.button("Connect to Saarthi", type="primary"):
+            if st.session_state.connect_error:
+                # The failed attempt is cached; start a new one.
+                agent_connection.clear()
+                st.session_state.connect_error = None
             with st.spinner("Connecting..."):
-                remote_app, success, msg = initialize_agent()
-                if success:
-                    st.session_state.remote_app = remote_app
-                    st.session_state.agent_connected = True
-                    st.success(msg)
+                result = agent_connection().result()
+                adopt_connection(*result)
+                if st.session_state.agent_connected:
+                    st.success(result[3])
                 else:
-                    st.session_state.agent_connected = False
-                    st.error(msg)
+                    st.error(result[3])
 
         st.divider()
         st.subheader("Session")
@@ -224,15 +725,27 @@ def main():
             st.info(f"Active Session: {st.session_state.session_id[:12]}...")
         else:
             st.warning("No active session")
+        if st.session_state.session_moved:
+            st.warning(
+                f"This session moved to the '{st.session_state.session_moved}' deployment after "
+                "an outage; Saarthi no longer remembers the earlier messages."
+            )
 
         if st.button("Start New Session"):
-            if st.session_state.remote_app:
-                session_id, success = create_session(
-                    st.session_state.remote_app, st.session_state.user_id
+            if st.session_state.session_pool:
+                user_id, session_id, success = start_session(
+                    st.session_state.session_pool, st.session_state.user_id
                 )
                 if success:
+                    st.session_state.user_id = user_id
                     st.session_state.session_id = session_id
-                    st.session_state.messages = []
+                    st.session_state.session_error = None
+                    st.session_state.session_moved = None
+                    st.session_state.messages.clear()
+                    st.session_state.message_html_cache.cache_clear()
+                    st.session_state.history_shown = HISTORY_PAGE
+                    st.session_state.pending_replies = []
+                    reset_coalescing()
                     st.success("New session started!")
                     st.rerun()
                 else:
@@ -241,48 +754,36 @@ def main():
                 st.error("Please connect first")
 
         if st.button("Clear Chat"):
-            st.session_state.messages = []
+            st.session_state.messages.clear()
+            st.session_state.message_html_cache.cache_clear()
+            st.session_state.history_shown = HISTORY_PAGE
+            reset_coalescing()
             st.success("Chat cleared!")
             st.rerun()
 
-    # Auto-initialize on first load
-    if not st.session_state.agent_connected and st.session_state.remote_app is None:
-        with st.spinner("Initializing Saarthi..."):
-            remote_app, success, message = initialize_agent()
-            if success:
-                st.session_state.remote_app = remote_app
-                st.session_state.agent_connected = True
-                
-                # Auto-create session
-                session_id, sess_success = create_session(remote_app, st.session_state.user_id)
-                if sess_success:
-                    st.session_state.session_id = session_id
-                    # Add welcome message
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": "Hello! I'm Saarthi, your AI mental health support companion. I'm here to provide a safe, non-judgmental space for you to express your thoughts and feelings. How are you doing today?",
-                        "timestamp": datetime.now().strftime("%H:%M:%S")
-                    })
-                st.rerun()
-            else:
-                st.error(f"Failed to initialize: {message}")
+    # Auto-initialize on first load, without holding up the rest of the page
+    if st.session_state.connect_error:
+        st.error(f"Failed to initialize: {st.session_state.connect_error}")
+    elif not st.session_state.agent_connected or st.session_state.opening_session:
+        if st.session_state.session_error:
+            st.warning(f"Could not open a session ({st.session_state.session_error}); retrying...")
+        await_connection()
+    elif st.session_state.session_error and not st.session_state.session_id:
+        st.error(
+            f"Could not open a session: {st.session_state.session_error}. "
+            "Use \"Start New Session\" to try again."
+        )
 
     # Main Chat
     if st.session_state.messages:
         st.subheader("Your Safe Space")
-
-        for message in st.session_state.messages:
-            role_class = "user-message" if message["role"] == "user" else "bot-message"
-            role_label = "You" if message["role"] == "user" else "Saarthi"
-            st.markdown(f"""
-            <div class="{role_class}">
-                {message["content"]}
-                <div class="message-time">{role_label} • {message["timestamp"]}</div>
-            </div>
-            """, unsafe_allow_html=True)
+        render_history()
     else:
         st.info("Welcome! Your conversation will appear here once you start chatting.")
 
+    if st.session_state.pending_replies:
+        poll_pending_replies()
+
     st.divider()
     st.markdown("### Share what's on your mind...")
 
@@ -305,30 +806,66 @@ def main():
             st.error("No active session. Please start a new session.")
         else:
             # Add user message
+            sent_at = datetime.now().strftime("%H:%M:%S")
             st.session_state.messages.append({
                 "role": "user",
                 "content": user_message,
-                "timestamp": datetime.now().strftime("%H:%M:%S")
+                "timestamp": sent_at
             })
 
-            # Get agent response
-            with st.spinner("Saarthi is responding..."):
-                response = get_agent_response(
-                    st.session_state.remote_app,
-                    st.session_state.user_id,
-                    st.session_state.session_id,
-                    user_message,
-                    debug=st.session_state.debug_mode
+            # Crisis fast-path: answer locally now, let the pipeline enrich the follow-up
+            crisis = assess_crisis(user_message)
+            if crisis.is_crisis:
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": crisis_response(crisis),
+                    "timestamp": datetime.now().strftime("%H:%M:%S"),
+                    "crisis": True
+                })
+                st.session_state.escalations.append({
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "session_id": st.session_state.session_id,
+                    **crisis.as_state()
+                })
+                logging.warning(
+                    "Crisis fast-path for user %s session %s: %s",
+                    st.session_state.user_id, st.session_state.session_id, crisis.as_state()
                 )
+                follow_up = user_message
+                if st.session_state.coalescer:
+                    # Whatever was still waiting goes with the crisis message, now.
+                    st.session_state.coalescer.add(user_message, urgent=True)
+                    settle_superseded()
+                    follow_up = merge(st.session_state.coalescer.flush())
+                st.session_state.pending_replies.append(
+                    background_executor().submit(
+                        follow_up_turn,
+                        st.session_state.remote_app,
+                        st.session_state.user_id,
+                        st.session_state.session_id,
+                        follow_up,
+                        list(st.session_state.pending_replies),
+                    )
+                )
+                st.rerun()
 
-            # Add agent response
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": response,
-                "timestamp": datetime.now().strftime("%H:%M:%S")
-            })
+            if st.session_state.coalescer:
+                # Sent with whatever follows within the window.
+                st.session_state.coalescer.add(user_message)
+                settle_superseded()
+                st.rerun()
 
-            st.rerun()
+            run_turn(user_message, sent_at)
+
+    coalescer = st.session_state.coalescer
+    if coalescer and st.session_state.agent_connected and st.session_state.session_id:
+        settle_superseded()
+        if coalescer.due():
+            parts = coalescer.flush()
+            inflight = st.session_state.inflight_turn = {"messages": parts, "sent": False}
+            run_turn(merge(parts), on_send=lambda: inflight.update(sent=True))
+        elif coalescer.pending:
+            await_coalesced()
 
     # Debug info
     if st.session_state.debug_mode:
@@ -338,8 +875,42 @@ def main():
             "session_id": st.session_state.session_id,
             "user_id": st.session_state.user_id,
             "messages_count": len(st.session_state.messages),
+            "escalations": st.session_state.escalations,
+            "decode_stats": decode_stats(),
+            "scheduler": outbound_scheduler().snapshot() if outbound_scheduler() else "gateway",
+            "session_pool": st.session_state.session_pool.snapshot() if st.session_state.session_pool else None,
+            "coalescing": dict(st.session_state.coalescer.stats) if st.session_state.coalescer else None,
+            "deployments": (
+                st.session_state.remote_app.snapshot()
+                if isinstance(st.session_state.remote_app, DeploymentRouter) else None
+            ),
+            "first_paint": {
+                key: value for key, value in st.session_state.first_paint.items() if key != "started"
+            },
             "has_service_account": "GOOGLE_SERVICE_ACCOUNT_KEY" in st.secrets
         })
+        if st.session_state.latency_log:
+            st.markdown("**Turn latency (time-to-first-token vs. total)**")
+            st.dataframe(st.session_state.latency_log[-20:], use_container_width=True)
+        ledger = st.session_state.usage_ledger
+        if ledger.rows():
+            st.markdown("**Token usage and estimated cost**")
+            col_agent, col_session, col_user = st.columns(3)
+            for column, title, totals in (
+                (col_agent, "Per agent", ledger.by_agent()),
+                (col_session, "Per session", ledger.by_session()),
+                (col_user, "Per user", ledger.by_user()),
+            ):
+                with column:
+                    st.caption(title)
+                    st.dataframe(
+                        [{"key": key, **usage.as_dict()} for key, usage in totals.items()],
+                        use_container_width=True,
+                    )
+
+    first_paint = st.session_state.first_paint
+    if "first_paint_s" not in first_paint:
+        first_paint["first_paint_s"] = round(time.perf_counter() - first_paint["started"], 3)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1 @@
+# Makes 'benchmarks' a package so scripts run with `python -m benchmarks.<name>`.
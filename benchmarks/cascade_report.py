@@ -0,0 +1,63 @@
+"""Reports how many LLM calls the intent/tone cascade avoids, and at what cost.
+
+The labeled set is JSONL with ``message``, ``intent`` and ``emotion`` fields.
+The bundled set is labeled by hand from the agents' label sets, so
+``match`` is how often the cascade agrees with those hand labels, not with
+the LLM; to measure the latter, score a file whose labels are the intent
+and tone agents' own answers to the same messages.
+
+    python -m benchmarks.cascade_report --labels=benchmarks/data/cascade_labeled.jsonl
+"""
+from absl import app, flags
+
+from benchmarks.corpus import read_jsonl
+from proto_1 import settings
+from proto_1.cascade import accept, intent_payloads, tone_payloads
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string(
+    "labels", "benchmarks/data/cascade_labeled.jsonl", "Hand- or LLM-labeled JSONL to score against."
+)
+flags.DEFINE_list(
+    "thresholds",
+    None,
+    "Confidence thresholds to sweep; defaults to SAARTHI_CASCADE_THRESHOLD.",
+)
+
+
+def score(records, field, label_key, payloads, threshold):
+    messages = [record["message"] for record in records]
+    handled = matched = 0
+    for record, (payload, confidence) in zip(records, payloads(messages)):
+        if not accept(record["message"], payload, confidence, threshold):
+            continue
+        handled += 1
+        matched += payload[field] == record[label_key]
+    return handled, matched
+
+
+def main(argv):
+    del argv
+    records = list(read_jsonl(FLAGS.labels))
+    thresholds = [float(t) for t in FLAGS.thresholds or [settings.CASCADE_THRESHOLD]]
+    total_calls = 2 * len(records)
+    print(f"{len(records)} labeled messages, {total_calls} intent+tone LLM calls without the cascade")
+    print(f"{'threshold':>9} {'agent':>6} {'local':>6} {'avoided':>8} {'match':>9}")
+    for threshold in thresholds:
+        avoided = 0
+        for agent, field, label_key, payloads in (
+            ("intent", "primary_intent", "intent", intent_payloads),
+            ("tone", "primary_emotion", "emotion", tone_payloads),
+        ):
+            handled, matched = score(records, field, label_key, payloads, threshold)
+            avoided += handled
+            match = matched / handled if handled else float("nan")
+            print(
+                f"{threshold:>9.2f} {agent:>6} {handled:>6} "
+                f"{handled / len(records):>7.0%} {match:>9.0%}"
+            )
+        print(f"{'':>9} {'total':>6} {avoided:>6} {avoided / total_calls:>7.0%}")
+
+
+if __name__ == "__main__":
+    app.run(main)
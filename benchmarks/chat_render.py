@@ -0,0 +1,113 @@
+"""Rerun time and memory per session of ``app.py`` as conversations grow.
+
+For each ``--sizes`` entry a fresh process opens ``--sessions`` Streamlit
+sessions of the app under ``streamlit.testing.v1.AppTest``, each seeded
+with that many messages (alternating user turns from the corpus and
+assistant replies), and times ``--reruns`` plain reruns per session, the
+work every click in the chat pays. ``rss_mb`` is the growth of the
+process's resident memory per open session, after one empty warm-up
+session has imported everything.
+
+``--app`` runs another copy of the app, e.g. an older revision; older
+revisions keep messages in a plain list, so pass ``--list_messages``:
+
+    python -m benchmarks.chat_render --sizes=10,100,1000
+    git show HEAD~1:app.py > /tmp/app_before.py
+    python -m benchmarks.chat_render --app=/tmp/app_before.py --list_messages
+"""
+import gc
+import multiprocessing
+import os
+import time
+
+from absl import app, flags
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.corpus import load_messages, percentile
+from deployment.transcript import Transcript, TranscriptStore
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("app", os.path.join(os.path.dirname(os.path.dirname(__file__)), "app.py"), "Streamlit script.")
+flags.DEFINE_list("sizes", ["10", "100", "1000"], "Messages per session to test.")
+flags.DEFINE_integer("sessions", 5, "Sessions open at once per size.")
+flags.DEFINE_integer("reruns", 5, "Timed reruns per session.")
+flags.DEFINE_bool("list_messages", False, "Seed messages as a plain list (app.py before the transcript).")
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_integer("seed", 0, "Seed for the corpus.")
+
+REPLY = (
+    "It sounds like a lot has been building up for you, and it makes sense that you feel worn "
+    "down. Would it help to talk through what has been weighing on you most this week? We can "
+    "take it one piece at a time, and there is no right or wrong place to start."
+)
+
+
+def _rss() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _history(session, size, user_messages, store):
+    messages = [] if store is None else Transcript(store)
+    for index in range(size):
+        # Unique text per session, so no session shares another's rendered HTML.
+        content = user_messages[index // 2] if index % 2 == 0 else REPLY
+        messages.append({
+            "role": "user" if index % 2 == 0 else "assistant",
+            "content": f"[{session}] {content}",
+            "timestamp": f"{index // 3600 % 24:02d}:{index // 60 % 60:02d}:{index % 60:02d}",
+        })
+    return messages
+
+
+def _open(app_path, session, messages):
+    at = AppTest.from_file(app_path, default_timeout=120)
+    # Already connected, so nothing is contacted; the runtime only has to parse.
+    at.secrets["RUNTIME"] = "local"
+    at.session_state["messages"] = messages
+    at.session_state["agent_connected"] = True
+    at.session_state["session_id"] = f"bench_{session}"
+    at.run()
+    return at
+
+
+def measure(app_path, size, sessions, reruns, list_messages, corpus, seed):
+    """Runs in a fresh process; returns rerun times (s) and RSS growth per session (bytes)."""
+    user_messages = load_messages(corpus, max(1, size // 2 + 1), seed=seed)
+    store = None if list_messages else TranscriptStore()
+    opened = [_open(app_path, "warmup", [] if store is None else Transcript(store))]
+    gc.collect()
+    before = _rss()
+    times = []
+    for session in range(sessions):
+        at = _open(app_path, session, _history(session, size, user_messages, store))
+        for _ in range(reruns):
+            started = time.perf_counter()
+            at.run()
+            times.append(time.perf_counter() - started)
+        opened.append(at)
+    gc.collect()
+    return times, (_rss() - before) / sessions
+
+
+def main(argv):
+    del argv
+    context = multiprocessing.get_context("spawn")
+    print(f"{FLAGS.app}, {FLAGS.sessions} sessions per size, {FLAGS.reruns} reruns each")
+    print(f"{'messages':>9} {'rerun_p50':>10} {'rerun_p95':>10} {'rss_mb':>8}")
+    for size in (int(size) for size in FLAGS.sizes):
+        with context.Pool(1) as pool:
+            times, rss = pool.apply(
+                measure,
+                (FLAGS.app, size, FLAGS.sessions, FLAGS.reruns, FLAGS.list_messages, FLAGS.corpus, FLAGS.seed),
+            )
+        print(
+            f"{size:>9} {percentile(times, 50):>10.3f} {percentile(times, 95):>10.3f} {rss / 2**20:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,138 @@
+"""Model calls saved by coalescing rapid messages, replayed over a chat log.
+
+Each session's messages are replayed on a simulated clock through
+``deployment.coalesce.Coalescer`` for every ``--windows`` entry; window 0
+is the app without coalescing, one turn per message. A turn makes the
+three context-agent calls when it starts and the output agent's call once
+they are done, with durations drawn from the stub engine's latency models.
+A message arriving while a turn runs supersedes it, as a new run of the
+Streamlit script does: the calls it had already started are still counted.
+
+``--log`` is JSONL with ``session``, ``message`` and ``offset_s`` (seconds
+since the session started); without it a synthetic log is generated in
+which ``--burst_rate`` of messages follow the previous one within a few
+seconds.
+
+    python -m benchmarks.coalesce --windows=0,1,2,4
+    python -m benchmarks.coalesce --log=chats.jsonl --windows=0,1.5 --max_wait=8
+"""
+import math
+import random
+from collections import defaultdict
+
+from absl import app, flags
+
+from benchmarks.corpus import percentile, read_jsonl, synthetic_messages
+from benchmarks.stub_engine import DEFAULT_LATENCIES
+from deployment.coalesce import Coalescer
+from proto_1.crisis import assess
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("log", None, "JSONL chat log; synthetic when unset.")
+flags.DEFINE_list("windows", ["0", "1", "2", "4"], "Coalescing windows (seconds) to compare.")
+flags.DEFINE_float("max_wait", 6.0, "Longest a first message waits for more.")
+flags.DEFINE_integer("sessions", 200, "Synthetic sessions.")
+flags.DEFINE_integer("messages_per_session", 20, "Synthetic messages per session.")
+flags.DEFINE_float("burst_rate", 0.4, "Share of synthetic messages sent right after the previous one.")
+flags.DEFINE_integer("seed", 0, "Seed for the log and latency draws.")
+
+CONTEXT_CALLS = 3  # entity, intent and tone, in parallel
+OUTPUT_CALLS = 1
+# Typical reply length and decoding speed, as in the stub engine.
+OUTPUT_TOKENS, SECONDS_PER_OUTPUT_TOKEN = 120, 0.006
+
+
+def synthetic_log(sessions, per_session, burst_rate, seed):
+    """{session: [(offset_s, message)]} with bursts of quick follow-ups."""
+    rng = random.Random(seed)
+    messages = iter(synthetic_messages(sessions * per_session, seed=seed))
+    log = {}
+    for session in range(sessions):
+        offset, turns = 0.0, []
+        for index in range(per_session):
+            if index:
+                # Follow-ups are typed in a second or three; new thoughts take a while.
+                offset += rng.uniform(0.5, 3.0) if rng.random() < burst_rate else rng.lognormvariate(math.log(25), 0.6)
+            turns.append((offset, next(messages)))
+        log[f"session_{session}"] = turns
+    return log
+
+
+def read_log(path):
+    log = defaultdict(list)
+    for record in read_jsonl(path):
+        log[str(record["session"])].append((float(record["offset_s"]), record["message"]))
+    return {session: sorted(turns) for session, turns in log.items()}
+
+
+def _durations(rng):
+    """(context_done_s, total_s) for one turn."""
+    context = max(DEFAULT_LATENCIES[agent].sample(rng) for agent in ("entity", "intent", "tone"))
+    output = DEFAULT_LATENCIES["output_agent"].sample(rng) + OUTPUT_TOKENS * SECONDS_PER_OUTPUT_TOKEN
+    return context, context + output
+
+
+def replay(turns, window, rng):
+    """Stats for one session: calls, turns, superseded, waits and reply latencies."""
+    coalescer = Coalescer(window=window, max_wait=FLAGS.max_wait)
+    result = {"calls": 0, "waits": [], "replies": []}
+    inflight = None  # (context_done_at, done_at, last_message_at, parts)
+    index = 0
+    while index < len(turns) or coalescer.pending:
+        arrives = turns[index][0] if index < len(turns) else math.inf
+        due = coalescer.due_at()
+        if due is not None and due <= arrives:
+            last = coalescer.pending[-1][1]
+            parts = coalescer.flush()
+            context, total = _durations(rng)
+            inflight = (due + context, due + total, last, parts)
+            result["waits"].append(due - last)
+            continue
+        offset, message = turns[index]
+        index += 1
+        coalescer.add(message, now=offset, urgent=assess(message).is_crisis)
+        if inflight and offset < inflight[1]:
+            result["calls"] += CONTEXT_CALLS + (OUTPUT_CALLS if offset >= inflight[0] else 0)
+            coalescer.supersede(inflight[3], sent=True, now=offset)
+        elif inflight:
+            result["calls"] += CONTEXT_CALLS + OUTPUT_CALLS
+            result["replies"].append(inflight[1] - inflight[2])
+        inflight = None
+    if inflight:
+        result["calls"] += CONTEXT_CALLS + OUTPUT_CALLS
+        result["replies"].append(inflight[1] - inflight[2])
+    result.update(coalescer.stats)
+    return result
+
+
+def main(argv):
+    del argv
+    if FLAGS.log:
+        log = read_log(FLAGS.log)
+    else:
+        log = synthetic_log(FLAGS.sessions, FLAGS.messages_per_session, FLAGS.burst_rate, FLAGS.seed)
+    messages = sum(len(turns) for turns in log.values())
+    print(f"{len(log)} sessions, {messages} messages, max_wait {FLAGS.max_wait}s")
+    print(
+        f"{'window':>7} {'turns':>6} {'superseded':>10} {'calls':>7} {'calls/sess':>10}"
+        f" {'saved/sess':>10} {'saved':>7} {'wait_p95':>9} {'reply_p50':>10} {'reply_p95':>10}"
+    )
+    baseline = None
+    for window in (float(window) for window in FLAGS.windows):
+        rng = random.Random(FLAGS.seed)
+        results = [replay(turns, window, rng) for turns in log.values()]
+        calls = sum(result["calls"] for result in results)
+        baseline = calls if baseline is None else baseline
+        waits = [wait for result in results for wait in result["waits"]]
+        replies = [reply for result in results for reply in result["replies"]]
+        print(
+            f"{window:>7.1f} {sum(result.get('turns', 0) for result in results):>6}"
+            f" {sum(result.get('superseded', 0) for result in results):>10} {calls:>7}"
+            f" {calls / len(log):>10.2f} {(baseline - calls) / len(log):>10.2f}"
+            f" {(baseline - calls) / baseline:>7.1%} {percentile(waits, 95):>9.2f}"
+            f" {percentile(replies, 50):>10.2f} {percentile(replies, 95):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    app.run(main)
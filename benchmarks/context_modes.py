@@ -0,0 +1,52 @@
+"""Side-by-side latency and token comparison of the parallel and fused context stages.
+
+Both pipelines run against the offline ``StubLlm``, so the numbers reflect
+orchestration shape and prompt sizes rather than live model behaviour.
+
+    python -m benchmarks.context_modes --turns=20 --time_scale=10
+"""
+import statistics
+
+from absl import app, flags
+
+from benchmarks.corpus import synthetic_messages
+from benchmarks.harness import run, run_session
+from proto_1.main import build_pipeline
+from proto_1.models import stub_model
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer("turns", 20, "Turns per session.")
+flags.DEFINE_float("time_scale", 10.0, "Divides simulated model latency.")
+flags.DEFINE_integer("seed", 0, "Seed for the synthetic conversation.")
+
+
+def measure(mode, messages):
+    stub = stub_model(time_scale=FLAGS.time_scale)
+    turns = run(run_session(build_pipeline(context_mode=mode, model=stub), messages))
+    context_calls = len(stub.calls) - len(turns)
+    return {
+        "mode": mode,
+        "calls_per_turn": len(stub.calls) / len(turns),
+        "context_calls_per_turn": context_calls / len(turns),
+        "prompt_tokens_per_turn": sum(c["prompt_tokens"] for c in stub.calls) / len(turns),
+        "output_tokens_per_turn": sum(c["output_tokens"] for c in stub.calls) / len(turns),
+        # Scaled back to real time so the figures read as seconds of user wait.
+        "context_s": statistics.mean(t["context_s"] for t in turns) * FLAGS.time_scale,
+        "turn_s": statistics.mean(t["latency_s"] for t in turns) * FLAGS.time_scale,
+    }
+
+
+def main(argv):
+    del argv
+    # Cascade-free messages so both modes do the same model work.
+    messages = [m for m in synthetic_messages(FLAGS.turns * 4, seed=FLAGS.seed) if len(m) > 40]
+    messages = messages[:FLAGS.turns]
+    rows = [measure(mode, messages) for mode in ("parallel", "fused")]
+    columns = list(rows[0])
+    print(" ".join(f"{c:>22}" for c in columns))
+    for row in rows:
+        print(" ".join(f"{row[c]:>22.2f}" if isinstance(row[c], float) else f"{row[c]:>22}" for c in columns))
+
+
+if __name__ == "__main__":
+    app.run(main)
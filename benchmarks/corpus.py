@@ -0,0 +1,91 @@
+"""Synthetic and file-backed message corpora shared by the benchmarks."""
+import json
+import random
+from typing import Iterator, List, Optional
+
+BENIGN_MESSAGES = [
+    "thanks!",
+    "ok",
+    "hi",
+    "I failed my exam and I feel so stupid.",
+    "My manager keeps giving me impossible deadlines and I can't sleep.",
+    "Can you explain what a panic attack is?",
+    "I've been feeling lonely since I moved to Bangalore for my new job.",
+    "My parents keep comparing me to my cousin and it hurts.",
+    "I finally finished my thesis today!",
+    "How do I stop overthinking at night?",
+    "I killed it at the interview today, I'm so happy.",
+    "Mujhe bahut tension ho rahi hai exams ki wajah se.",
+    "मुझे आज बहुत अकेलापन महसूस हो रहा है।",
+    "Estoy muy estresado con el trabajo.",
+    "What are some breathing exercises for anxiety?",
+    "I had a fight with my best friend and she isn't talking to me.",
+    "Is it normal to feel tired all the time?",
+    "I don't know what to do about my breakup.",
+    "Therapy is helping a bit, but it's slow.",
+    "This deadline is going to kill me lol",
+]
+
+CRISIS_MESSAGES = [
+    "I want to die.",
+    "I've been thinking about suicide a lot lately.",
+    "I don't want to live anymore, nothing matters.",
+    "Sometimes I hurt myself when it gets too much.",
+    "main marna chahta hu, sab khatam karna hai",
+    "मैं आत्महत्या के बारे में सोच रहा हूँ",
+    "Ya no puedo más, quiero morir.",
+    "He is going to hurt me again tonight, I'm not safe.",
+]
+
+NEGATED_MESSAGES = [
+    "I would never kill myself, but I'm exhausted.",
+    "I do not want to die, I just want the pain to stop.",
+    "Don't worry, I'm not suicidal, just sad.",
+]
+
+
+def synthetic_messages(
+    count: int, seed: int = 0, crisis_rate: float = 0.02, negated_rate: float = 0.01
+) -> List[str]:
+    """Returns a deterministic mix of everyday, crisis and negated messages."""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < crisis_rate:
+            pool = CRISIS_MESSAGES
+        elif roll < crisis_rate + negated_rate:
+            pool = NEGATED_MESSAGES
+        else:
+            pool = BENIGN_MESSAGES
+        message = rng.choice(pool)
+        # Pad some messages so lengths look like real chat turns.
+        if rng.random() < 0.3:
+            message = f"{message} {rng.choice(BENIGN_MESSAGES)}"
+        messages.append(message)
+    return messages
+
+
+def read_jsonl(path: str) -> Iterator[dict]:
+    """Yields one dict per non-empty line of a JSONL file."""
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def load_messages(path: Optional[str], count: int, seed: int = 0) -> List[str]:
+    """Reads ``message`` fields from a JSONL corpus, or synthesizes one."""
+    if not path:
+        return synthetic_messages(count, seed=seed)
+    return [record["message"] for record in read_jsonl(path)][:count]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,44 @@
+"""Measures per-message cost of the local crisis screen.
+
+    python -m benchmarks.crisis_matcher --messages=100000
+"""
+import time
+
+from absl import app, flags
+
+from benchmarks.corpus import load_messages, percentile
+from proto_1.crisis import MATCHER
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("corpus", None, "JSONL corpus with a 'message' field per line.")
+flags.DEFINE_integer("messages", 100_000, "Number of messages to screen.")
+flags.DEFINE_integer("seed", 0, "Seed for the synthetic corpus.")
+
+
+def main(argv):
+    del argv
+    messages = load_messages(FLAGS.corpus, FLAGS.messages, FLAGS.seed)
+    assess = MATCHER.assess
+    timings = []
+    flagged = negated = 0
+    started = time.perf_counter()
+    for message in messages:
+        t0 = time.perf_counter()
+        assessment = assess(message)
+        timings.append(time.perf_counter() - t0)
+        flagged += assessment.is_crisis
+        negated += any(match.negated for match in assessment.matches)
+    elapsed = time.perf_counter() - started
+
+    micros = [t * 1e6 for t in timings]
+    print(f"Screened {len(messages)} messages in {elapsed:.2f}s")
+    print(f"  throughput: {len(messages) / elapsed:,.0f} msg/s")
+    print(f"  mean: {sum(micros) / len(micros):.1f} us")
+    print(f"  p50:  {percentile(micros, 50):.1f} us")
+    print(f"  p99:  {percentile(micros, 99):.1f} us")
+    print(f"  max:  {max(micros):.1f} us")
+    print(f"  flagged: {flagged}  negated-only matches: {negated}")
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,86 @@
+"""Turn latency with and without context-stage deadlines under latency spikes.
+
+The entity agent runs on its own ``StubLlm`` whose calls are held up by
+``--spike_latency`` seconds at ``--spike_rate``, as under quota pressure.
+With deadlines the output agent stops waiting once a budget runs out; the
+late result is kept and written to state on the next turn.
+
+    python -m benchmarks.deadlines --turns=200 --spike_rate=0.1
+    python -m benchmarks.deadlines --deadline=entity=1.2,intent=1.0,tone=1.0
+"""
+from absl import app, flags
+
+from benchmarks.corpus import load_messages, percentile
+from benchmarks.harness import run, run_session
+from proto_1 import deadlines as deadline_stats
+from proto_1.main import build_pipeline
+from proto_1.models import StubLlm, stub_model
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_integer("turns", 200, "Turns to send.")
+flags.DEFINE_integer("turns_per_session", 10, "Turns per session.")
+flags.DEFINE_float("spike_rate", 0.1, "Share of entity calls that hit a latency spike.")
+flags.DEFINE_float("spike_latency", 3.0, "Extra seconds a spiked call takes.")
+flags.DEFINE_list("deadline", ["entity=1.2", "intent=1.0", "tone=1.0"], "Per-agent budgets in seconds.")
+flags.DEFINE_float("time_scale", 20.0, "Divides simulated latency; results are scaled back.")
+flags.DEFINE_integer("seed", 0, "Seed for the corpus and the spikes.")
+
+
+def _budgets():
+    pairs = (item.split("=", 1) for item in FLAGS.deadline)
+    return {name.strip(): float(seconds) for name, seconds in pairs}
+
+
+def measure(budgets, messages):
+    """Per-turn latency in real seconds and the agents that missed their deadline."""
+    turns = []
+    size = FLAGS.turns_per_session
+    for session, start in enumerate(range(0, len(messages), size)):
+        stub = stub_model(time_scale=FLAGS.time_scale)
+        slow = StubLlm(
+            time_scale=FLAGS.time_scale,
+            spike_rate=FLAGS.spike_rate,
+            spike_latency=FLAGS.spike_latency,
+            seed=FLAGS.seed + session,
+            calls=[],
+        )
+        pipeline = build_pipeline(
+            model=stub,
+            route_messages=False,
+            context_deadlines={name: seconds / FLAGS.time_scale for name, seconds in budgets.items()},
+        )
+        context_stage = pipeline.sub_agents[0]
+        next(agent for agent in context_stage.sub_agents if agent.name == "entity").model = slow
+        for turn in run(run_session(pipeline, messages[start:start + size], stub=stub)):
+            missed = (turn["state"].get("context_deadline") or {}).get("missed", [])
+            turns.append({"latency_s": turn["latency_s"] * FLAGS.time_scale, "missed": missed})
+    return turns
+
+
+def report(label, turns):
+    latencies = [turn["latency_s"] for turn in turns]
+    degraded = sum(bool(turn["missed"]) for turn in turns)
+    print(
+        f"{label:>10} {percentile(latencies, 50):>7.3f} {percentile(latencies, 95):>7.3f} "
+        f"{percentile(latencies, 99):>7.3f} {degraded / len(turns):>9.1%}"
+    )
+
+
+def main(argv):
+    del argv
+    messages = load_messages(FLAGS.corpus, FLAGS.turns, seed=FLAGS.seed)
+    budgets = _budgets()
+    with_deadlines = measure(budgets, messages)
+    stats = dict(deadline_stats.STATS)
+    without = measure({}, messages)
+
+    print(f"{len(messages)} turns, {FLAGS.spike_rate:.0%} of entity calls +{FLAGS.spike_latency}s")
+    print(f"{'pipeline':>10} {'p50_s':>7} {'p95_s':>7} {'p99_s':>7} {'degraded':>9}")
+    report("deadlines", with_deadlines)
+    report("wait_all", without)
+    print("\n" + ", ".join(f"{key}={value}" for key, value in sorted(stats.items())))
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,76 @@
+"""Microbenchmark of the tolerant context-agent decoder.
+
+By default the corpus is built from canned agent replies in the shapes
+models actually return (fenced, wrapped in prose, trailing commas, Python
+literals, truncated). Pass ``--corpus`` with recorded outputs instead: JSONL
+with ``agent`` (entity, intent, tone or context_agent) and ``text`` fields.
+
+    python -m benchmarks.decoder --repeat=2000
+"""
+import json
+import time
+from collections import defaultdict
+
+from absl import app, flags
+
+from benchmarks.corpus import percentile, read_jsonl
+from proto_1.models import ENTITY_REPLY, INTENT_REPLY, TONE_REPLY
+from proto_1.structured import decode, decode_stats
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("corpus", None, "JSONL of recorded agent outputs.")
+flags.DEFINE_integer("repeat", 2000, "Decodes per corpus entry.")
+
+VARIANTS = {
+    "clean": lambda text: text,
+    "pretty": lambda text: json.dumps(json.loads(text), indent=2),
+    "fenced": lambda text: f"```json\n{text}\n```",
+    "prose": lambda text: f"Here is the analysis:\n{text}\nLet me know if you need more.",
+    "trailing_comma": lambda text: text[:-1] + ",}",
+    "python_literals": lambda text: text.replace("false", "False").replace("null", "None"),
+    "truncated": lambda text: text[: int(len(text) * 0.8)],
+}
+
+
+def synthetic_corpus():
+    replies = {
+        "entity": ENTITY_REPLY,
+        "intent": INTENT_REPLY,
+        "tone": TONE_REPLY,
+        "context_agent": {"entity": ENTITY_REPLY, "intent": INTENT_REPLY, "tone": TONE_REPLY},
+    }
+    for agent, reply in replies.items():
+        text = json.dumps(reply)
+        for variant, make in VARIANTS.items():
+            yield {"agent": agent, "variant": variant, "text": make(text)}
+
+
+def main(argv):
+    del argv
+    corpus = list(read_jsonl(FLAGS.corpus)) if FLAGS.corpus else list(synthetic_corpus())
+    timings = defaultdict(list)
+    stages = {}
+    for record in corpus:
+        variant = record.get("variant", "recorded")
+        for _ in range(FLAGS.repeat):
+            t0 = time.perf_counter()
+            result = decode(record["agent"], record["text"])
+            timings[variant].append((time.perf_counter() - t0) * 1e6)
+        stages[(record["agent"], variant)] = result.stage
+
+    print(f"{'variant':>16} {'p50 us':>8} {'p99 us':>8}  outcome per agent")
+    for variant, values in timings.items():
+        outcomes = ", ".join(
+            f"{agent}={stage}" for (agent, name), stage in stages.items() if name == variant
+        )
+        print(f"{variant:>16} {percentile(values, 50):>8.1f} {percentile(values, 99):>8.1f}  {outcomes}")
+    print()
+    for agent, row in decode_stats().items():
+        print(
+            f"{agent:>14}: repair rate {row['repair_rate']:.0%}, "
+            f"failure rate {row['failure_rate']:.0%} over {sum(v for k, v in row.items() if not k.endswith('rate'))} decodes"
+        )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,132 @@
+"""First paint and time to a ready session for new visitors to ``app.py``.
+
+Each visitor is a fresh ``streamlit.testing.v1.AppTest`` run of the app in
+this process, so ``st.cache_resource`` (the connection and its session pool)
+is shared between visitors the way it is between browser tabs on one server.
+The app talks to ``deployment.gateway`` serving the stub Agent Engine on a
+local port, with ``create_session`` taking ``--session_latency``.
+
+For every visitor the benchmark records:
+
+- ``paint``: the first script run, i.e. until the page is sent
+- ``ready``: until a run shows an active session, re-running the script
+  every ``--poll`` seconds the way the connection fragment does
+- ``new_session``: clicking "Start New Session" ``--think`` seconds later
+
+Visitors arrive ``--interval`` seconds apart. Each ``--pool_sizes`` entry
+starts from a cold process (caches cleared, after one untimed visit has
+imported everything); 0 creates every session on demand, with no spares. ``--app`` runs another copy of the app, e.g. an older revision:
+
+    python -m benchmarks.first_paint --visitors=10 --pool_sizes=0,2
+    git show HEAD~1:app.py > /tmp/app_before.py
+    python -m benchmarks.first_paint --app=/tmp/app_before.py --pool_sizes=0
+"""
+import logging
+import os
+import socket
+import threading
+import time
+
+import uvicorn
+from absl import app, flags
+from streamlit.testing.v1 import AppTest
+
+import streamlit as st
+from benchmarks.corpus import percentile
+from benchmarks.stub_engine import StubAgentEngines, parse_latencies
+from deployment.gateway import create_gateway
+from proto_1 import settings
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("app", os.path.join(os.path.dirname(os.path.dirname(__file__)), "app.py"), "Streamlit script.")
+flags.DEFINE_integer("visitors", 10, "Visitors per configuration.")
+flags.DEFINE_float("interval", 1.0, "Seconds between visitors.")
+flags.DEFINE_list("pool_sizes", ["0", "2"], "SESSION_POOL_SIZE values to compare.")
+flags.DEFINE_integer("spares", 1, "SESSION_POOL_SPARES when the pool is on.")
+flags.DEFINE_string("session_latency", "0.8/1.6", "create_session median/p95 seconds.")
+flags.DEFINE_float("think", 2.0, "Seconds a visitor waits before starting a new session.")
+flags.DEFINE_float("poll", 0.05, "Seconds between runs while waiting for a session.")
+flags.DEFINE_float("timeout", 30.0, "Seconds one visitor may take to get a session.")
+flags.DEFINE_integer("seed", 0, "Seed for the latency draws.")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_gateway():
+    """Starts the gateway on a background thread; returns its URL and server."""
+    engine = StubAgentEngines(
+        session_latency=parse_latencies(f"session={FLAGS.session_latency}")["session"],
+        seed=FLAGS.seed,
+    ).get("stub")
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(create_gateway(engine), host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+def visit(url):
+    """(paint_s, ready_s, new_session_s) for one new visitor; None where it never got there."""
+    at = AppTest.from_file(FLAGS.app, default_timeout=FLAGS.timeout)
+    at.secrets["GATEWAY_URL"] = url
+    started = time.perf_counter()
+    at.run()
+    paint = time.perf_counter() - started
+    while not at.session_state["session_id"]:
+        if time.perf_counter() - started > FLAGS.timeout:
+            return paint, None, None
+        time.sleep(FLAGS.poll)
+        at.run()
+    ready = time.perf_counter() - started
+    time.sleep(FLAGS.think)
+    button = next(button for button in at.button if button.label == "Start New Session")
+    clicked = time.perf_counter()
+    button.click().run()
+    return paint, ready, time.perf_counter() - clicked
+
+
+def main(argv):
+    del argv
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    url, server = serve_gateway()
+    print(
+        f"{FLAGS.visitors} visitors {FLAGS.interval}s apart, create_session {FLAGS.session_latency}s"
+        f" (median/p95), app {FLAGS.app}"
+    )
+    print(
+        f"{'pool':>5} {'paint_p50':>10} {'paint_max':>10} {'ready_p50':>10} {'ready_p95':>10}"
+        f" {'first_ready':>12} {'new_p50':>8} {'new_p95':>8}"
+    )
+    try:
+        visit(url)
+        for size in (int(size) for size in FLAGS.pool_sizes):
+            settings.SESSION_POOL_SIZE = size
+            settings.SESSION_POOL_SPARES = FLAGS.spares if size else 0
+            st.cache_resource.clear()
+            results = []
+            for number in range(FLAGS.visitors):
+                if number:
+                    time.sleep(FLAGS.interval)
+                results.append(visit(url))
+            paints = [paint for paint, _, _ in results]
+            readies = [ready for _, ready, _ in results if ready is not None]
+            clicks = [click for _, _, click in results if click is not None]
+            print(
+                f"{size:>5} {percentile(paints, 50):>10.3f} {max(paints):>10.3f}"
+                f" {percentile(readies, 50):>10.3f} {percentile(readies, 95):>10.3f}"
+                f" {results[0][1] or float('nan'):>12.3f}"
+                f" {percentile(clicks, 50):>8.3f} {percentile(clicks, 95):>8.3f}"
+            )
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,268 @@
+"""Concurrent sessions per process: blocking calls per user vs. the asyncio gateway.
+
+"threads" is how ``app.py`` serves users without a gateway: each turn runs
+the blocking ``stream_query`` on a worker thread out of a pool of
+``--max_threads`` (the server's thread budget), so turns beyond it queue for
+a free thread. "gateway" serves ``deployment.gateway`` on uvicorn in a child
+process and sends the same turns from here, one WebSocket per user (or
+with ``--transport=sse``, one SSE response per turn); every open session is
+a coroutine on the gateway's event loop.
+
+Both sides run against the stub Agent Engine, whose ``async_stream_query``
+waits with ``asyncio.sleep``, so the figures compare how one process holds
+concurrent sessions rather than model speed. Latencies count from the
+moment a user sends, including any wait for a thread. ``peak_threads`` is
+the OS thread count of the process serving the users (read from /proc, so
+Linux only).
+
+    python -m benchmarks.gateway_load --users=50,200,1000
+    python -m benchmarks.gateway_load --users=500 --max_threads=128 --transport=sse
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import uvicorn
+import websockets
+from absl import app, flags
+
+from benchmarks.corpus import load_messages, percentile
+from benchmarks.stub_engine import StubAgentEngines, parse_latencies
+from deployment.events import event_text, is_output_event, query_events, stream_output_text
+from deployment.gateway import create_gateway
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_list("users", ["50", "200", "1000"], "Concurrent users (one session each) to test.")
+flags.DEFINE_integer("turns_per_user", 3, "Turns each user sends, one after another.")
+flags.DEFINE_integer("max_threads", 64, "Worker threads available to the blocking front end.")
+flags.DEFINE_enum("transport", "ws", ["ws", "sse"], "How the gateway clients send turns.")
+flags.DEFINE_string(
+    "agent_latency", "", "Per-agent median/p95 seconds, e.g. 'entity=0.9/1.9,output_agent=0.6/1.3'."
+)
+flags.DEFINE_float("time_scale", 1.0, "Divides simulated latency; results are scaled back.")
+flags.DEFINE_integer("seed", 0, "Seed for the corpus and latency draws.")
+
+# Sessions created at once by the gateway clients; httpx's pool slows down
+# sharply with thousands of queued requests.
+_SESSION_FANOUT = 50
+
+
+def _engine(agent_latency, time_scale, seed):
+    return StubAgentEngines(
+        latencies=parse_latencies(agent_latency), time_scale=time_scale, seed=seed
+    ).get("stub")
+
+
+def _threads(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+
+class PeakThreads:
+    """Samples a process's OS thread count in the background."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak = _threads(pid)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, _threads(self.pid))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_threads(batches):
+    """Every turn as a blocking call on a bounded thread pool.
+
+    Returns (total_s, ttft_s, replied) per turn, the wall time and the peak
+    thread count.
+    """
+    remote_app = _engine(FLAGS.agent_latency, FLAGS.time_scale, FLAGS.seed)
+    expected = sum(len(batch) for batch in batches)
+    results, lock, finished = [], threading.Lock(), threading.Event()
+    pool = ThreadPoolExecutor(max_workers=FLAGS.max_threads)
+
+    def turn(user_id, session_id, batch, index, sent):
+        first, reply = None, ""
+        try:
+            session_id = session_id or remote_app.create_session(user_id=user_id)["id"]
+            for delta in stream_output_text(query_events(remote_app, user_id, session_id, batch[index])):
+                first = first or time.perf_counter()
+                reply += delta
+        except Exception:
+            logging.exception("Turn failed for %s", user_id)
+        with lock:
+            results.append((time.perf_counter() - sent, first and first - sent, bool(reply)))
+            if len(results) == expected:
+                finished.set()
+        if index + 1 < len(batch):
+            pool.submit(turn, user_id, session_id, batch, index + 1, time.perf_counter())
+
+    with PeakThreads(os.getpid()) as threads:
+        started = time.perf_counter()
+        for number, batch in enumerate(batches):
+            pool.submit(turn, f"load_{number}", None, batch, 0, started)
+        finished.wait()
+        wall = time.perf_counter() - started
+    pool.shutdown()
+    return results, wall, threads.peak
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(port, agent_latency, time_scale, seed):
+    uvicorn.run(
+        create_gateway(_engine(agent_latency, time_scale, seed)),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+    )
+
+
+def _wait_until_up(port: int) -> None:
+    while True:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/healthz").raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.05)
+
+
+def _observe(event, sent, turn):
+    """Updates ``turn`` (first, replied) for one event dict."""
+    if is_output_event(event) and event_text(event):
+        turn["first"] = turn["first"] or time.perf_counter() - sent
+        turn["replied"] = True
+
+
+async def _ws_turns(port, user_id, session_id, batch, results):
+    url = f"ws://127.0.0.1:{port}/sessions/{user_id}/{session_id}/ws"
+    async with websockets.connect(url, max_size=None) as connection:
+        for message in batch:
+            sent, turn = time.perf_counter(), {"first": None, "replied": False}
+            await connection.send(json.dumps({"message": message, "streaming_mode": "sse"}))
+            while True:
+                frame = json.loads(await connection.recv())
+                if "queued" in frame:
+                    continue
+                if "event" not in frame:
+                    break
+                _observe(frame["event"], sent, turn)
+            results.append((time.perf_counter() - sent, turn["first"], turn["replied"]))
+
+
+async def _sse_turns(client, user_id, session_id, batch, results):
+    for message in batch:
+        sent, turn = time.perf_counter(), {"first": None, "replied": False}
+        async with client.stream(
+            "POST",
+            f"/sessions/{user_id}/{session_id}/messages",
+            json={"message": message, "streaming_mode": "sse"},
+        ) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    _observe(json.loads(line[len("data:"):]), sent, turn)
+        results.append((time.perf_counter() - sent, turn["first"], turn["replied"]))
+
+
+def run_gateway(batches):
+    """The same turns through ``deployment.gateway`` in a child process."""
+    port = _free_port()
+    serving = multiprocessing.get_context("spawn").Process(
+        target=_serve, args=(port, FLAGS.agent_latency, FLAGS.time_scale, FLAGS.seed), daemon=True
+    )
+    serving.start()
+    _wait_until_up(port)
+
+    async def user(client, fanout, number, batch, results):
+        user_id = f"load_{number}"
+        try:
+            async with fanout:
+                session_id = (await client.post("/sessions", json={"user_id": user_id})).json()["id"]
+            if FLAGS.transport == "ws":
+                await _ws_turns(port, user_id, session_id, batch, results)
+            else:
+                async with httpx.AsyncClient(base_url=client.base_url, timeout=None) as own:
+                    await _sse_turns(own, user_id, session_id, batch, results)
+        except Exception:
+            logging.exception("Turns failed for %s", user_id)
+
+    async def drive():
+        results, fanout = [], asyncio.Semaphore(_SESSION_FANOUT)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            await asyncio.gather(
+                *(user(client, fanout, number, batch, results) for number, batch in enumerate(batches))
+            )
+        return results
+
+    try:
+        with PeakThreads(serving.pid) as threads:
+            started = time.perf_counter()
+            results = asyncio.run(drive())
+            wall = time.perf_counter() - started
+    finally:
+        serving.terminate()
+        serving.join()
+    return results, wall, threads.peak
+
+
+def summarize(mode, users, expected, results, wall, peak_threads):
+    scale = FLAGS.time_scale
+    latencies = [total * scale for total, _, _ in results]
+    ttfts = [ttft * scale for _, ttft, _ in results if ttft is not None]
+    return {
+        "mode": mode,
+        "users": users,
+        "turns": len(results),
+        "failed": expected - sum(replied for _, _, replied in results),
+        "turns_per_s": len(results) / (wall * scale) if wall else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "ttft_p95_s": percentile(ttfts, 95),
+        "peak_threads": peak_threads,
+    }
+
+
+def main(argv):
+    del argv
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    rows = []
+    for users in (int(level) for level in FLAGS.users):
+        size = FLAGS.turns_per_user
+        messages = load_messages(FLAGS.corpus, users * size, seed=FLAGS.seed)
+        batches = [messages[start:start + size] for start in range(0, len(messages), size)]
+        rows.append(summarize("threads", users, len(messages), *run_threads(batches)))
+        rows.append(summarize("gateway", users, len(messages), *run_gateway(batches)))
+
+    columns = list(rows[0])
+    print(" ".join(f"{c:>12}" for c in columns))
+    for row in rows:
+        print(" ".join(f"{row[c]:>12.3f}" if isinstance(row[c], float) else f"{row[c]:>12}" for c in columns))
+
+
+if __name__ == "__main__":
+    app.run(main)
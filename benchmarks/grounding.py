@@ -0,0 +1,66 @@
+"""Search rate and output-stage latency per intent, with and without the search gate.
+
+Both pipelines run against the offline ``StubLlm``, which searches whenever
+the google_search tool is offered, so "always grounded" is the ungated
+baseline and the delta is what gating saves per intent class.
+
+    python -m benchmarks.grounding --turns=200 --time_scale=10
+"""
+import statistics
+from collections import defaultdict
+
+from absl import app, flags
+
+from benchmarks.corpus import load_messages
+from benchmarks.harness import run, run_session
+from proto_1.main import build_pipeline
+from proto_1.models import stub_model
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_integer("turns", 200, "Turns to send.")
+flags.DEFINE_integer("turns_per_session", 10, "Turns per session.")
+flags.DEFINE_float("time_scale", 10.0, "Divides simulated model latency.")
+flags.DEFINE_integer("seed", 0, "Seed for the synthetic conversation.")
+
+
+def measure(gated, messages):
+    """intent -> list of (searched, output-stage seconds) per turn."""
+    results = defaultdict(list)
+    size = FLAGS.turns_per_session
+    for start in range(0, len(messages), size):
+        stub = stub_model(time_scale=FLAGS.time_scale)
+        pipeline = build_pipeline(model=stub, gate_search_tool=gated)
+        for turn in run(run_session(pipeline, messages[start:start + size], stub=stub)):
+            intent = (turn["state"].get("intent_context") or {}).get("primary_intent", "unknown")
+            searched = any(call["searched"] for call in turn["calls"])
+            # Scaled back to real time so the figures read as seconds of user wait.
+            output_s = (turn["latency_s"] - (turn["context_s"] or 0.0)) * FLAGS.time_scale
+            results[intent].append((searched, output_s))
+    return results
+
+
+def main(argv):
+    del argv
+    messages = load_messages(FLAGS.corpus, FLAGS.turns, seed=FLAGS.seed)
+    gated = measure(True, messages)
+    ungated = measure(False, messages)
+    print(f"{'intent':>22} {'turns':>6} {'search_rate':>12} {'output_s':>9} {'ungated_s':>10} {'delta_s':>8}")
+    total = searches = 0
+    for intent in sorted(gated, key=lambda name: -len(gated[name])):
+        rows = gated[intent]
+        base = ungated.get(intent) or rows
+        rate = sum(searched for searched, _ in rows) / len(rows)
+        output_s = statistics.mean(seconds for _, seconds in rows)
+        ungated_s = statistics.mean(seconds for _, seconds in base)
+        total += len(rows)
+        searches += sum(searched for searched, _ in rows)
+        print(
+            f"{intent:>22} {len(rows):>6} {rate:>12.2f} {output_s:>9.3f} {ungated_s:>10.3f} "
+            f"{output_s - ungated_s:>+8.3f}"
+        )
+    print(f"\nsearch invoked on {searches}/{total} turns with the gate (ungated: every turn)")
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,90 @@
+"""Runs agent pipelines in-process for the offline benchmarks."""
+import asyncio
+import time
+from typing import List, Optional, Sequence
+
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from proto_1.tracing import TRACE_METADATA_KEY, TracingPlugin, span_dict
+
+OUTPUT_PREFIX = "output_agent"
+
+
+async def run_session(
+    agent,
+    messages: Sequence[str],
+    user_id: str = "bench_user",
+    stream: bool = False,
+    runner: Optional[InMemoryRunner] = None,
+    stub=None,
+    raise_errors: bool = True,
+) -> List[dict]:
+    """Sends ``messages`` as consecutive turns of one session.
+
+    Returns one record per turn with total latency, time to the first
+    output_agent event, the moment the context stage finished and the list
+    of event authors in arrival order, plus the turn's spans from
+    ``TracingPlugin`` and the state changes it made. When the pipeline runs on a ``StubLlm``, pass it as
+    ``stub`` to get each turn's model calls too. With ``raise_errors`` off, a
+    failed turn is recorded with its ``error`` and the session carries on.
+    """
+    tracer = None
+    if runner is None:
+        tracer = TracingPlugin()
+        runner = InMemoryRunner(agent=agent, app_name="bench", plugins=[tracer])
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id=user_id)
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE if stream else StreamingMode.NONE)
+    turns = []
+    for message in messages:
+        calls_before = len(stub.calls) if stub else 0
+        started = time.perf_counter()
+        first_output = context_done = None
+        authors = []
+        trace = []
+        state = {}
+        error = None
+        try:
+            async for event in runner.run_async(
+                user_id=user_id,
+                session_id=session.id,
+                new_message=types.Content(role="user", parts=[types.Part(text=message)]),
+                run_config=run_config,
+            ):
+                now = time.perf_counter() - started
+                authors.append(event.author)
+                state.update(event.actions.state_delta)
+                trace = (event.custom_metadata or {}).get(TRACE_METADATA_KEY) or trace
+                if event.author.startswith(OUTPUT_PREFIX):
+                    if first_output is None and event.content:
+                        first_output = now
+                elif event.content:
+                    context_done = now
+        except Exception as failure:
+            if raise_errors:
+                raise
+            error = repr(failure)
+        if tracer and tracer.recent:
+            # The finished trace, including the spans still open when the
+            # output event carried its partial copy.
+            trace = [span_dict(span) for span in tracer.recent[-1][1]]
+        turns.append(
+            {
+                "message": message,
+                "latency_s": time.perf_counter() - started,
+                "first_output_s": first_output,
+                "context_s": context_done,
+                "authors": authors,
+                "trace": trace,
+                "state": state,
+                "calls": stub.calls[calls_before:] if stub else [],
+                "error": error,
+            }
+        )
+    return turns
+
+
+def run(coro):
+    """Runs a benchmark coroutine to completion."""
+    return asyncio.run(coro)
@@ -0,0 +1,119 @@
+"""Offline load test: replays a message corpus against the stub Agent Engine.
+
+Each virtual user opens a session and sends its turns one after another
+through ``deployment.events.query_events`` and ``collect_output_text`` (the
+code path behind ``app.get_agent_response``). Runs need no credentials or
+network, so the thresholds below can gate a release.
+
+    python -m benchmarks.load_test --concurrency=1,8,32 --time_scale=20
+    python -m benchmarks.load_test --corpus=msgs.jsonl --max_p95_s=4.0
+"""
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from absl import app, flags
+
+from benchmarks.corpus import load_messages, percentile
+from benchmarks.stub_engine import StubAgentEngines, parse_latencies
+from deployment.events import TurnTiming, collect_output_text, query_events
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_integer("messages", 200, "Turns sent per concurrency level.")
+flags.DEFINE_list("concurrency", ["1", "8", "32"], "Concurrent virtual users to test.")
+flags.DEFINE_integer("turns_per_session", 5, "Turns each virtual user sends per session.")
+flags.DEFINE_enum("streaming_mode", "sse", ["sse", "none"], "run_config streaming mode.")
+flags.DEFINE_string(
+    "agent_latency", "", "Per-agent median/p95 seconds, e.g. 'entity=0.9/1.9,output_agent=0.6/1.3'."
+)
+flags.DEFINE_float("time_scale", 20.0, "Divides simulated latency; results are scaled back.")
+flags.DEFINE_integer("seed", 0, "Seed for the corpus and latency draws.")
+flags.DEFINE_float("max_p95_s", None, "Fail when any level's p95 turn latency exceeds this.")
+flags.DEFINE_float("max_ttft_p95_s", None, "Fail when any level's p95 time-to-first-token exceeds this.")
+
+
+def virtual_user(remote_app, work, results, lock):
+    """Pulls session-sized batches of messages and sends them as turns."""
+    user_id = f"load_{threading.get_ident()}"
+    while True:
+        try:
+            batch = work.get_nowait()
+        except queue.Empty:
+            return
+        session_id = remote_app.create_session(user_id=user_id)["id"]
+        for message in batch:
+            timing = TurnTiming()
+            reply = collect_output_text(
+                query_events(remote_app, user_id, session_id, message, FLAGS.streaming_mode), timing
+            )
+            with lock:
+                results.append((timing, bool(reply)))
+
+
+def run_level(concurrency, messages):
+    remote_app = StubAgentEngines(
+        latencies=parse_latencies(FLAGS.agent_latency),
+        time_scale=FLAGS.time_scale,
+        seed=FLAGS.seed,
+    ).get("stub")
+    work = queue.Queue()
+    for start in range(0, len(messages), FLAGS.turns_per_session):
+        work.put(messages[start:start + FLAGS.turns_per_session])
+    results, lock = [], threading.Lock()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        users = [pool.submit(virtual_user, remote_app, work, results, lock) for _ in range(concurrency)]
+    for user in users:
+        # A user that died would silently shrink the figures below; fail the run instead.
+        user.result()
+    # Scaled back to real time so the figures read as seconds of user wait.
+    wall = (time.perf_counter() - started) * FLAGS.time_scale
+    latencies = [timing.total_latency * FLAGS.time_scale for timing, _ in results]
+    ttfts = [
+        timing.time_to_first_token * FLAGS.time_scale
+        for timing, _ in results
+        if timing.time_to_first_token is not None
+    ]
+    return {
+        "concurrency": concurrency,
+        "turns": len(results),
+        "empty": sum(not ok for _, ok in results),
+        "turns_per_s": len(results) / wall if wall else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "ttft_p50_s": percentile(ttfts, 50),
+        "ttft_p95_s": percentile(ttfts, 95),
+    }
+
+
+def main(argv):
+    del argv
+    messages = load_messages(FLAGS.corpus, FLAGS.messages, seed=FLAGS.seed)
+    rows = [run_level(int(level), messages) for level in FLAGS.concurrency]
+    columns = list(rows[0])
+    print(" ".join(f"{c:>12}" for c in columns))
+    for row in rows:
+        print(" ".join(f"{row[c]:>12.3f}" if isinstance(row[c], float) else f"{row[c]:>12}" for c in columns))
+
+    failures = []
+    for row in rows:
+        if FLAGS.max_p95_s is not None and row["p95_s"] > FLAGS.max_p95_s:
+            failures.append(f"concurrency {row['concurrency']}: p95 {row['p95_s']:.3f}s > {FLAGS.max_p95_s}s")
+        if FLAGS.max_ttft_p95_s is not None and row["ttft_p95_s"] > FLAGS.max_ttft_p95_s:
+            failures.append(
+                f"concurrency {row['concurrency']}: ttft p95 {row['ttft_p95_s']:.3f}s > {FLAGS.max_ttft_p95_s}s"
+            )
+        if row["empty"]:
+            failures.append(f"concurrency {row['concurrency']}: {row['empty']} empty replies")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,139 @@
+"""Success rate and latency of pinning one deployment vs. routing across several.
+
+Three stub engines stand in for regions: ``near`` with the stub's default
+latencies, ``far`` with every latency scaled by ``--far_factor``, and
+``flaky``, slightly slower than ``near`` and failing ``--flaky_error_rate``
+of calls with a 503. ``near`` goes down (every call fails) while sessions
+``--outage`` (fractions of the run) are being started, then recovers.
+
+``--users`` threads each open sessions of ``--turns`` turns one after
+another until ``--sessions`` have run. ``pinned`` sends everything to
+``near``, as ``RESOURCE_ID`` does today; ``routed`` goes through
+``deployment.routing.DeploymentRouter``. Neither retries on top, so the
+numbers show what routing alone buys. Latencies are simulated seconds
+(wall time times ``--time_scale``), and the router's cooldown is given in
+simulated seconds too.
+
+    python -m benchmarks.multi_region
+    python -m benchmarks.multi_region --flaky_error_rate=0.5 --outage=0.2,0.8
+"""
+import itertools
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from absl import app, flags
+
+from benchmarks.corpus import load_messages, percentile
+from benchmarks.stub_engine import DEFAULT_LATENCIES, LatencyModel, StubRemoteApp
+from deployment.events import TurnTiming, collect_output_text, query_events
+from deployment.routing import DeploymentRouter
+
+FLAGS = flags.FLAGS
+flags.DEFINE_list("strategies", ["pinned", "routed"], "Strategies to compare.")
+flags.DEFINE_integer("sessions", 120, "Sessions per strategy.")
+flags.DEFINE_integer("turns", 3, "Turns per session.")
+flags.DEFINE_integer("users", 8, "Sessions running at once.")
+flags.DEFINE_float("far_factor", 1.8, "Latency multiplier of the far region.")
+flags.DEFINE_float("flaky_error_rate", 0.3, "Share of calls the flaky region fails.")
+flags.DEFINE_list("outage", ["0.3", "0.6"], "Part of the run (start, end) during which near is down.")
+flags.DEFINE_float("cooldown", 20.0, "Router cooldown in simulated seconds.")
+flags.DEFINE_float("explore", 0.05, "Router exploration rate.")
+flags.DEFINE_float("time_scale", 10.0, "Simulated seconds per wall second.")
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_integer("seed", 0, "Seed for the corpus, latencies and failures.")
+
+
+def _scaled(factor):
+    return {agent: LatencyModel(model.median * factor, model.p95 * factor) for agent, model in DEFAULT_LATENCIES.items()}
+
+
+def regions(seed):
+    options = {"time_scale": FLAGS.time_scale, "session_latency": LatencyModel(0.1, 0.3)}
+    return {
+        "near": StubRemoteApp(seed=seed, **options),
+        "far": StubRemoteApp(latencies=_scaled(FLAGS.far_factor), seed=seed + 1, **options),
+        "flaky": StubRemoteApp(
+            latencies=_scaled(1.1), seed=seed + 2, error_rate=FLAGS.flaky_error_rate, **options
+        ),
+    }
+
+
+def run(strategy, messages):
+    """Per-turn results and the router (None when pinned)."""
+    targets = regions(FLAGS.seed)
+    if strategy == "pinned":
+        remote_app, router = targets["near"], None
+    else:
+        router = remote_app = DeploymentRouter(
+            targets, cooldown=FLAGS.cooldown / FLAGS.time_scale, explore=FLAGS.explore, seed=FLAGS.seed
+        )
+    start, end = (float(value) * FLAGS.sessions for value in FLAGS.outage)
+    counter, lock = itertools.count(), threading.Lock()
+    texts = itertools.cycle(messages)
+    results = []
+
+    def user(user_index):
+        user_id = f"user_{user_index}"
+        while True:
+            with lock:
+                index = next(counter)
+                if index >= FLAGS.sessions:
+                    return
+                # Simulated outage by position in the run, so it lasts equally long for both strategies.
+                targets["near"].error_rate = 1.0 if start <= index < end else 0.0
+                turn_messages = [next(texts) for _ in range(FLAGS.turns)]
+            try:
+                session_id = remote_app.create_session(user_id=user_id)["id"]
+            except Exception as error:
+                results.extend({"ok": False, "error": type(error).__name__} for _ in turn_messages)
+                continue
+            for message in turn_messages:
+                timing = TurnTiming()
+                try:
+                    output = collect_output_text(
+                        query_events(remote_app, user_id, session_id, message, streaming_mode="none"), timing
+                    )
+                    results.append({"ok": bool(output), "latency_s": timing.total_latency * FLAGS.time_scale})
+                    if timing.failover:
+                        session_id = timing.failover["session_id"]
+                except Exception as error:
+                    results.append({"ok": False, "error": type(error).__name__})
+
+    with ThreadPoolExecutor(max_workers=FLAGS.users) as pool:
+        list(pool.map(user, range(FLAGS.users)))
+    return results, router
+
+
+def main(argv):
+    del argv
+    messages = load_messages(FLAGS.corpus, 200, seed=FLAGS.seed)
+    print(
+        f"{FLAGS.sessions} sessions x {FLAGS.turns} turns, {FLAGS.users} at once; near down for"
+        f" sessions {FLAGS.outage[0]}-{FLAGS.outage[1]} of the run, flaky fails {FLAGS.flaky_error_rate:.0%}"
+    )
+    print(f"{'strategy':>9} {'turns':>6} {'ok':>7} {'p50_s':>7} {'p95_s':>7} {'wall_s':>7}  sessions / failovers")
+    for strategy in FLAGS.strategies:
+        started = time.perf_counter()
+        results, router = run(strategy, messages)
+        elapsed = time.perf_counter() - started
+        latencies = [result["latency_s"] for result in results if result["ok"]]
+        ok = sum(result["ok"] for result in results)
+        if router:
+            shares = " ".join(
+                f"{name}={stats['sessions']}/{stats['failovers']}" for name, stats in router.snapshot().items()
+            )
+        else:
+            shares = f"near={FLAGS.sessions}/0"
+        print(
+            f"{strategy:>9} {len(results):>6} {ok / len(results):>7.1%} {percentile(latencies, 50):>7.2f}"
+            f" {percentile(latencies, 95):>7.2f} {elapsed:>7.1f}  {shares}"
+        )
+        errors = Counter(result["error"] for result in results if not result["ok"] and "error" in result)
+        if errors:
+            print(f"{'':>9} errors: {dict(errors)}")
+
+
+if __name__ == "__main__":
+    app.run(main)
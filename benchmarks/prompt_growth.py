@@ -0,0 +1,65 @@
+"""Prompt tokens per turn over a long scripted session.
+
+Compares the original shared history ("before"), compact context in state
+("compact") and compact history with the rolling summary and token budget
+("summary").
+
+    python -m benchmarks.prompt_growth --turns=50
+"""
+from absl import app, flags
+
+from benchmarks.corpus import BENIGN_MESSAGES
+from benchmarks.harness import run, run_session
+from proto_1 import history
+from proto_1.main import build_pipeline
+from proto_1.models import stub_model
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer("turns", 50, "Turns in the scripted session.")
+flags.DEFINE_integer("every", 5, "Print every N-th turn.")
+flags.DEFINE_string("context_mode", "parallel", "parallel or fused.")
+
+
+def prompt_tokens_per_turn(compact_history, summarize_history, messages):
+    # Time is irrelevant here; only prompt sizes are measured.
+    stub = stub_model(time_scale=1000)
+    agent = build_pipeline(
+        context_mode=FLAGS.context_mode,
+        model=stub,
+        compact_history=compact_history,
+        summarize_history=summarize_history,
+    )
+    turns = run(run_session(agent, messages, stub=stub))
+    return [sum(call["prompt_tokens"] for call in turn["calls"]) for turn in turns]
+
+
+def main(argv):
+    del argv
+    script = [m for m in BENIGN_MESSAGES if len(m) > 20]
+    messages = [script[i % len(script)] for i in range(FLAGS.turns)]
+    before = prompt_tokens_per_turn(False, False, messages)
+    compact = prompt_tokens_per_turn(True, False, messages)
+    history.STATS.clear()
+    summary = prompt_tokens_per_turn(True, True, messages)
+
+    print(f"{'turn':>5} {'before':>9} {'compact':>9} {'summary':>9} {'saved':>7}")
+    rows = [(str(i + 1), i) for i in range(0, FLAGS.turns, FLAGS.every)] + [("last", -1)]
+    for label, i in rows:
+        print(
+            f"{label:>5} {before[i]:>9,} {compact[i]:>9,} {summary[i]:>9,} "
+            f"{1 - summary[i] / before[i]:>7.0%}"
+        )
+    print(
+        f"{'total':>5} {sum(before):>9,} {sum(compact):>9,} {sum(summary):>9,} "
+        f"{1 - sum(summary) / sum(before):>7.0%}"
+    )
+    stats = history.STATS
+    print(
+        f"\nsummary refreshes: {stats['refreshes']} in {FLAGS.turns} turns "
+        f"({stats['refreshes'] / FLAGS.turns:.0%}), turns folded: {stats['turns_folded']}, "
+        f"budget trims: {stats['budget_trims']}, history tokens kept out of prompts: "
+        f"{stats['tokens_saved']:,}"
+    )
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,74 @@
+"""Records a conversation to a cassette, then replays it offline.
+
+Recording uses the offline ``StubLlm`` unless ``--live`` is given, in which
+case the agents' configured models are called (credentials required). The
+replay runs need neither and report how long loading and replaying take.
+
+    python -m benchmarks.replay --cassette=/tmp/saarthi.cas --turns=500
+    python -m benchmarks.replay --cassette=recorded.cas --skip_record --time_scale=0
+"""
+import os
+import time
+
+from absl import app, flags
+
+from benchmarks.corpus import load_messages
+from benchmarks.harness import run, run_session
+from proto_1.cassette import RECORD, REPLAY, Cassette, use_cassette
+from proto_1.main import build_pipeline
+from proto_1.models import stub_model
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("cassette", "/tmp/saarthi.cas", "Cassette file to write and replay.")
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_integer("turns", 200, "Turns to record.")
+flags.DEFINE_integer("turns_per_session", 10, "Turns per recorded session.")
+flags.DEFINE_bool("live", False, "Record against the configured Gemini models.")
+flags.DEFINE_bool("skip_record", False, "Only replay an existing cassette.")
+flags.DEFINE_float("stub_time_scale", 50.0, "Divides the stub's simulated latency while recording.")
+flags.DEFINE_float("time_scale", 0.0, "Divides recorded delays on replay; 0 replays instantly.")
+flags.DEFINE_integer("seed", 0, "Seed for the synthetic conversation.")
+
+
+def sessions(messages):
+    size = FLAGS.turns_per_session
+    return [messages[start:start + size] for start in range(0, len(messages), size)]
+
+
+def play(mode, messages, model=None):
+    cassette = Cassette(FLAGS.cassette)
+    started = time.perf_counter()
+    turns = []
+    for index, batch in enumerate(sessions(messages)):
+        pipeline = use_cassette(
+            build_pipeline(model=model), cassette, mode, time_scale=FLAGS.time_scale or None
+        )
+        # Same user and session order as the recording, so prompts hash the same.
+        turns += run(run_session(pipeline, batch, user_id=f"user_{index}"))
+    elapsed = time.perf_counter() - started
+    cassette.save()
+    return cassette, turns, elapsed
+
+
+def main(argv):
+    del argv
+    messages = load_messages(FLAGS.corpus, FLAGS.turns, seed=FLAGS.seed)
+    if not FLAGS.skip_record:
+        if os.path.exists(FLAGS.cassette):
+            os.remove(FLAGS.cassette)
+        model = None if FLAGS.live else stub_model(time_scale=FLAGS.stub_time_scale)
+        cassette, turns, elapsed = play(RECORD, messages, model)
+        print(f"recorded {len(cassette)} calls over {len(turns)} turns in {elapsed:.2f}s")
+
+    started = time.perf_counter()
+    cassette = Cassette(FLAGS.cassette)
+    print(
+        f"cassette: {len(cassette)} calls, {os.path.getsize(FLAGS.cassette) / 1024:.1f} KiB, "
+        f"index loaded in {(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+    _, turns, elapsed = play(REPLAY, messages)
+    print(f"replayed {len(turns)} turns in {elapsed:.2f}s ({len(turns) / elapsed:.0f} turns/s)")
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,89 @@
+"""Turn success rate and tail latency against a flaky model, with and without retries/hedging.
+
+Every agent runs on a ``StubLlm`` that fails ``--error_rate`` of calls with
+a 429 or 503 and holds up ``--spike_rate`` of them by ``--spike_latency``
+seconds. Context-stage deadlines are off so the figures isolate the model
+call layer.
+
+    python -m benchmarks.resilience --turns=300
+    python -m benchmarks.resilience --error_rate=0.2 --hedge_percentile=90
+"""
+from absl import app, flags
+
+from benchmarks.corpus import load_messages, percentile
+from benchmarks.harness import run, run_session
+from proto_1 import resilience
+from proto_1.main import build_pipeline
+from proto_1.models import StubLlm
+from proto_1.resilience import use_resilience
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_integer("turns", 300, "Turns to send per configuration.")
+flags.DEFINE_integer("turns_per_session", 10, "Turns per session.")
+flags.DEFINE_float("error_rate", 0.05, "Share of model calls failing with 429/503.")
+flags.DEFINE_float("spike_rate", 0.05, "Share of model calls held up by a latency spike.")
+flags.DEFINE_float("spike_latency", 3.0, "Extra seconds a spiked call takes.")
+flags.DEFINE_integer("attempts", 3, "Tries per model call with retries on.")
+flags.DEFINE_float("hedge_percentile", 90.0, "First-chunk latency percentile that triggers a hedge.")
+flags.DEFINE_float("time_scale", 20.0, "Divides simulated latency; results are scaled back.")
+flags.DEFINE_integer("seed", 0, "Seed for the corpus and the injected faults.")
+
+
+def measure(messages, attempts, hedge_percentile):
+    stub = StubLlm(
+        time_scale=FLAGS.time_scale,
+        spike_rate=FLAGS.spike_rate,
+        spike_latency=FLAGS.spike_latency,
+        error_rate=FLAGS.error_rate,
+        seed=FLAGS.seed,
+        calls=[],
+    )
+    pipeline = use_resilience(
+        build_pipeline(model=stub, context_deadlines={}, resilience=False),
+        attempts=attempts,
+        base_delay=0.25 / FLAGS.time_scale,
+        max_delay=4.0 / FLAGS.time_scale,
+        hedge_percentile=hedge_percentile,
+    )
+    resilience.STATS.clear()
+    turns = []
+    size = FLAGS.turns_per_session
+    for start in range(0, len(messages), size):
+        turns += run(run_session(pipeline, messages[start:start + size], stub=stub, raise_errors=False))
+    stats = {
+        outcome: sum(count for key, count in resilience.STATS.items() if key.endswith("." + outcome))
+        for outcome in ("retried", "hedged", "hedge_won", "failed")
+    }
+    return turns, len(stub.calls), stats
+
+
+def main(argv):
+    del argv
+    messages = load_messages(FLAGS.corpus, FLAGS.turns, seed=FLAGS.seed)
+    configs = [
+        ("none", 1, 0.0),
+        ("retry", FLAGS.attempts, 0.0),
+        ("retry+hedge", FLAGS.attempts, FLAGS.hedge_percentile),
+    ]
+    print(
+        f"{len(messages)} turns, {FLAGS.error_rate:.0%} errors, "
+        f"{FLAGS.spike_rate:.0%} spikes of +{FLAGS.spike_latency}s per model call"
+    )
+    print(
+        f"{'policy':>12} {'success':>8} {'p50_s':>7} {'p95_s':>7} {'p99_s':>7} {'calls':>6} "
+        f"{'retried':>8} {'hedged':>7} {'hedge_won':>9}"
+    )
+    for label, attempts, hedge in configs:
+        turns, calls, stats = measure(messages, attempts, hedge)
+        ok = [turn for turn in turns if not turn["error"]]
+        latencies = [turn["latency_s"] * FLAGS.time_scale for turn in ok]
+        print(
+            f"{label:>12} {len(ok) / len(turns):>8.1%} {percentile(latencies, 50):>7.3f} "
+            f"{percentile(latencies, 95):>7.3f} {percentile(latencies, 99):>7.3f} {calls:>6} "
+            f"{stats['retried']:>8} {stats['hedged']:>7} {stats['hedge_won']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,79 @@
+"""Average model calls per turn with and without the adaptive router.
+
+Both pipelines run against the offline ``StubLlm`` with the cascade on, as
+deployed. A "call" is a model span from ``TracingPlugin`` that was not
+answered by a callback, i.e. a request that actually reached the model. The
+corpus defaults to the synthetic chat mix; pass a JSONL of real messages
+with ``--corpus`` for a realistic plan distribution.
+
+    python -m benchmarks.router --turns=200 --time_scale=20
+    python -m benchmarks.router --corpus=benchmarks/data/cascade_labeled.jsonl
+"""
+import statistics
+from collections import Counter
+
+from absl import app, flags
+
+from benchmarks.corpus import load_messages
+from benchmarks.harness import run, run_session
+from proto_1.main import build_pipeline
+from proto_1.models import stub_model
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_integer("turns", 200, "Turns to send.")
+flags.DEFINE_integer("turns_per_session", 10, "Turns per session.")
+flags.DEFINE_float("time_scale", 20.0, "Divides simulated model latency.")
+flags.DEFINE_integer("seed", 0, "Seed for the synthetic conversation.")
+
+
+def measure(routed, messages):
+    """Per-turn records: plan, model calls by agent and latency in real seconds."""
+    turns = []
+    size = FLAGS.turns_per_session
+    for start in range(0, len(messages), size):
+        stub = stub_model(time_scale=FLAGS.time_scale)
+        pipeline = build_pipeline(model=stub, route_messages=routed)
+        for turn in run(run_session(pipeline, messages[start:start + size], stub=stub)):
+            turns.append(
+                {
+                    "plan": (turn["state"].get("route") or {}).get("plan", "full"),
+                    "calls": Counter(
+                        span["name"].split(":", 1)[1]
+                        for span in turn["trace"]
+                        if span["kind"] == "model" and not span["attributes"].get("short_circuited")
+                    ),
+                    "latency_s": turn["latency_s"] * FLAGS.time_scale,
+                }
+            )
+    return turns
+
+
+def summarize(label, turns):
+    calls = [sum(turn["calls"].values()) for turn in turns]
+    by_agent = sum((turn["calls"] for turn in turns), Counter())
+    agents = " ".join(f"{agent}={count / len(turns):.2f}" for agent, count in sorted(by_agent.items()))
+    print(
+        f"{label:>8} {statistics.mean(calls):>15.2f} {statistics.mean(t['latency_s'] for t in turns):>10.3f}"
+        f"   {agents}"
+    )
+    return statistics.mean(calls)
+
+
+def main(argv):
+    del argv
+    messages = load_messages(FLAGS.corpus, FLAGS.turns, seed=FLAGS.seed)
+    routed = measure(True, messages)
+    baseline = measure(False, messages)
+
+    plans = Counter(turn["plan"] for turn in routed)
+    print(f"{len(messages)} turns; plans: " + ", ".join(f"{plan}={count}" for plan, count in plans.most_common()))
+    print(f"{'pipeline':>8} {'calls_per_turn':>15} {'latency_s':>10}   calls per turn by agent")
+    routed_calls = summarize("routed", routed)
+    baseline_calls = summarize("full", baseline)
+    saved = 1 - routed_calls / baseline_calls if baseline_calls else 0.0
+    print(f"\nrouter saves {baseline_calls - routed_calls:.2f} model calls per turn ({saved:.0%})")
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,115 @@
+"""Quota 429s and per-priority latency with and without the outbound scheduler.
+
+``--users`` virtual users send turns back to back to a stub Agent Engine
+that refuses turns beyond ``--quota`` per second with a 429, as Vertex does
+when a project's quota runs out. "direct" sends every turn straight away
+and relies on the client's retries; "scheduled" first takes a slot from a
+``deployment.scheduler.Scheduler`` paced just under the quota, with crisis
+messages at the front of its queue.
+
+    python -m benchmarks.scheduler --users=40 --quota=6
+    python -m benchmarks.scheduler --crisis_rate=0.1 --max_queue=20
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from absl import app, flags
+
+from benchmarks.corpus import percentile, read_jsonl, synthetic_messages
+from benchmarks.stub_engine import StubAgentEngines
+from deployment.events import collect_output_text, query_events
+from deployment.scheduler import CRISIS, INTERACTIVE, QueueFull, QueueTimeout, Scheduler, priority_for
+from proto_1 import settings
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_integer("turns", 240, "Turns to send per configuration.")
+flags.DEFINE_integer("users", 40, "Concurrent virtual users.")
+flags.DEFINE_float("quota", 6.0, "Turns per second the stub engine accepts.")
+flags.DEFINE_float("headroom", 0.9, "Share of the quota the scheduler paces to.")
+flags.DEFINE_integer("max_queue", 100, "Scheduler queue bound.")
+flags.DEFINE_float("crisis_rate", 0.05, "Share of synthetic messages that are crisis messages.")
+flags.DEFINE_integer("seed", 0, "Seed for the corpus and latency draws.")
+
+
+def measure(messages, scheduler):
+    """Per-turn (priority, latency_s, queued_s, ok) for one configuration."""
+    engine = StubAgentEngines(seed=FLAGS.seed, quota_per_s=FLAGS.quota).get("stub")
+    pending = list(enumerate(messages))
+    results, lock = [], threading.Lock()
+
+    def user(number):
+        user_id = f"load_{number}"
+        session_id = engine.create_session(user_id=user_id)["id"]
+        while True:
+            with lock:
+                if not pending:
+                    return
+                _, message = pending.pop(0)
+            priority = priority_for(message)
+            started, queued, ok = time.perf_counter(), 0.0, False
+            try:
+                if scheduler:
+                    queued = scheduler.acquire(priority).waited
+                ok = bool(collect_output_text(query_events(
+                    engine, user_id, session_id, message, attempts=settings.RETRY_ATTEMPTS
+                )))
+            except (QueueFull, QueueTimeout):
+                pass
+            except Exception as error:
+                if getattr(error, "code", None) != 429:
+                    raise
+            with lock:
+                results.append((priority, time.perf_counter() - started, queued, ok))
+
+    with ThreadPoolExecutor(max_workers=FLAGS.users) as pool:
+        for future in [pool.submit(user, number) for number in range(FLAGS.users)]:
+            future.result()
+    return results, engine.throttled
+
+
+def report(label, results, throttled, scheduler=None):
+    ok = sum(turn[3] for turn in results)
+    row = f"{label:>10} {len(results):>6} {ok / len(results):>7.1%} {throttled:>6}"
+    for priority in (CRISIS, INTERACTIVE):
+        latencies = [turn[1] for turn in results if turn[0] == priority and turn[3]]
+        queued = [turn[2] for turn in results if turn[0] == priority and turn[3]]
+        row += (
+            f" {percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f}"
+            f" {percentile(queued, 95):>9.2f}"
+        )
+    peak = scheduler.snapshot()["peak_queue_depth"] if scheduler else 0
+    print(row + f" {peak:>6}")
+
+
+def main(argv):
+    del argv
+    if FLAGS.corpus:
+        messages = [record["message"] for record in read_jsonl(FLAGS.corpus)][:FLAGS.turns]
+    else:
+        messages = synthetic_messages(FLAGS.turns, seed=FLAGS.seed, crisis_rate=FLAGS.crisis_rate)
+    crisis = sum(priority_for(message) == CRISIS for message in messages)
+    print(
+        f"{len(messages)} turns ({crisis} crisis) from {FLAGS.users} users, "
+        f"engine quota {FLAGS.quota}/s, {settings.RETRY_ATTEMPTS} attempts per turn"
+    )
+    print(
+        f"{'mode':>10} {'turns':>6} {'ok':>7} {'429s':>6}"
+        f" {'crit_p50':>8} {'crit_p95':>8} {'crit_q95':>9}"
+        f" {'int_p50':>8} {'int_p95':>8} {'int_q95':>9} {'peakq':>6}"
+    )
+    results, throttled = measure(messages, None)
+    report("direct", results, throttled)
+    scheduler = Scheduler(
+        limits={"turns": FLAGS.quota * FLAGS.headroom},
+        max_queue=FLAGS.max_queue,
+        max_wait=settings.SCHEDULER_MAX_WAIT,
+    )
+    results, throttled = measure(messages, scheduler)
+    report("scheduled", results, throttled, scheduler)
+    print("\n" + ", ".join(f"{key}={value}" for key, value in sorted(scheduler.stats.items())))
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,72 @@
+"""Commit rate and latency saved by speculative output drafting.
+
+Runs the same conversation through the speculative and the plain
+sequential pipeline on the offline ``StubLlm`` and reports how often drafts
+were made and committed, why the rest were discarded, and time to the
+first output token for both.
+
+    python -m benchmarks.speculation --turns=200 --time_scale=20
+"""
+import statistics
+from collections import Counter
+
+from absl import app, flags
+
+from benchmarks.corpus import load_messages, percentile
+from benchmarks.harness import run, run_session
+from proto_1.main import build_pipeline
+from proto_1.models import stub_model
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("corpus", None, "JSONL with a 'message' field; synthetic when unset.")
+flags.DEFINE_integer("turns", 200, "Turns to send.")
+flags.DEFINE_integer("turns_per_session", 10, "Turns per session.")
+flags.DEFINE_float("time_scale", 20.0, "Divides simulated model latency; results are scaled back.")
+flags.DEFINE_integer("seed", 0, "Seed for the synthetic conversation.")
+
+
+def measure(speculate, messages):
+    turns = []
+    size = FLAGS.turns_per_session
+    for start in range(0, len(messages), size):
+        stub = stub_model(time_scale=FLAGS.time_scale)
+        pipeline = build_pipeline(model=stub, speculate=speculate)
+        turns += run(run_session(pipeline, messages[start:start + size], stream=True, stub=stub))
+    return turns
+
+
+def _seconds(turns, key):
+    return [turn[key] * FLAGS.time_scale for turn in turns if turn[key] is not None]
+
+
+def main(argv):
+    del argv
+    messages = load_messages(FLAGS.corpus, FLAGS.turns, seed=FLAGS.seed)
+    speculative = measure(True, messages)
+    sequential = measure(False, messages)
+
+    outcomes = [turn["state"].get("speculation") or {} for turn in speculative]
+    drafted = [outcome for outcome in outcomes if outcome.get("drafted")]
+    committed = [outcome for outcome in drafted if outcome.get("committed")]
+    reasons = Counter(outcome["reason"] for outcome in outcomes if not outcome.get("committed"))
+    print(f"{len(messages)} turns: {len(drafted)} drafted, {len(committed)} committed")
+    print(f"commit rate {len(committed) / len(drafted) if drafted else 0.0:.1%} of drafts, "
+          f"{len(committed) / len(messages):.1%} of turns")
+    print("not committed: " + ", ".join(f"{reason}={count}" for reason, count in reasons.most_common()))
+    if committed:
+        saved = [outcome["saved_s"] * FLAGS.time_scale for outcome in committed]
+        print(f"latency saved per committed turn: mean {statistics.mean(saved):.3f}s, "
+              f"p50 {percentile(saved, 50):.3f}s")
+
+    print(f"\n{'pipeline':>12} {'ttft_p50':>9} {'ttft_p95':>9} {'total_p50':>10} {'total_p95':>10}")
+    for label, turns in (("speculative", speculative), ("sequential", sequential)):
+        ttft = _seconds(turns, "first_output_s")
+        total = _seconds(turns, "latency_s")
+        print(
+            f"{label:>12} {percentile(ttft, 50):>9.3f} {percentile(ttft, 95):>9.3f} "
+            f"{percentile(total, 50):>10.3f} {percentile(total, 95):>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,54 @@
+"""Per-stage latency from the tracing spans: p50/p95 per agent and how
+parallel the context stage really is.
+
+Runs the pipeline against the offline ``StubLlm`` with ``TracingPlugin``
+attached and summarizes each turn with ``tracing.critical_path``. Spans are
+also exported when ``SAARTHI_TRACE_FILE`` / ``SAARTHI_OTLP_ENDPOINT`` are set.
+
+    python -m benchmarks.stage_latency --turns=30 --time_scale=10
+"""
+from collections import Counter, defaultdict
+
+from absl import app, flags
+
+from benchmarks.corpus import percentile, synthetic_messages
+from benchmarks.harness import run, run_session
+from proto_1.main import build_pipeline
+from proto_1.models import stub_model
+from proto_1.tracing import critical_path
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer("turns", 30, "Turns per session.")
+flags.DEFINE_float("time_scale", 10.0, "Divides simulated model latency.")
+flags.DEFINE_integer("seed", 0, "Seed for the synthetic conversation.")
+flags.DEFINE_enum("context_mode", "parallel", ["parallel", "fused"], "Context stage to trace.")
+
+
+def main(argv):
+    del argv
+    stub = stub_model(time_scale=FLAGS.time_scale)
+    messages = synthetic_messages(FLAGS.turns, seed=FLAGS.seed)
+    turns = run(run_session(build_pipeline(context_mode=FLAGS.context_mode, model=stub), messages))
+
+    durations = defaultdict(list)
+    parallelism = []
+    slowest = Counter()
+    for turn in turns:
+        summary = critical_path(turn["trace"])
+        for name, seconds in summary["durations"].items():
+            # Scaled back to real time so the figures read as seconds of user wait.
+            durations[name].append(seconds * FLAGS.time_scale)
+        if summary["parallelism"] is not None:
+            parallelism.append(summary["parallelism"])
+        if summary["slowest"]:
+            slowest[summary["slowest"]] += 1
+
+    print(f"{'stage':>16} {'p50_s':>8} {'p95_s':>8} {'critical':>9}")
+    for name, values in sorted(durations.items(), key=lambda item: -percentile(item[1], 95)):
+        print(f"{name:>16} {percentile(values, 50):>8.3f} {percentile(values, 95):>8.3f} {slowest[name]:>9}")
+    if parallelism:
+        print(f"\ncontext parallelism: p50 {percentile(parallelism, 50):.2f}x, min {min(parallelism):.2f}x")
+
+
+if __name__ == "__main__":
+    app.run(main)
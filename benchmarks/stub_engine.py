@@ -0,0 +1,281 @@
+"""A network-free stand-in for ``vertexai.agent_engines``.
+
+``StubAgentEngines().get(resource_id)`` returns an object with the same
+``create_session`` / ``delete_session`` / ``stream_query`` surface as a deployed Agent Engine,
+including the ``async_*`` variants, which wait with ``asyncio.sleep``
+instead of holding a thread.
+Its event dicts follow the real pipeline's shape: the three context agents
+finish in parallel and arrive in completion order, then the output agent
+streams ``partial`` chunks (with ``streaming_mode="sse"``) and one final
+event, each model-backed event carrying ``usage_metadata``.
+
+Latencies are drawn from per-agent log-normal distributions given as a
+median and a p95, so tails can be tuned to match production traces. With
+``quota_per_s`` set, turns beyond that rate fail with a 429 before their
+first event, the way Vertex answers when a project runs out of quota.
+``session_latency`` makes ``create_session`` take a round trip too, and
+``error_rate`` fails that share of calls with a 503, like a region in
+trouble.
+"""
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from deployment.scheduler import TokenBucket
+from proto_1.models import ENTITY_REPLY, INTENT_REPLY, OUTPUT_REPLY, TONE_REPLY
+from proto_1.utils import estimate_tokens
+
+# Standard normal quantile at 0.95.
+_Z95 = 1.6449
+
+
+@dataclass(frozen=True)
+class LatencyModel:
+    """Log-normal latency in seconds, parameterized by median and p95."""
+
+    median: float
+    p95: float
+
+    def sample(self, rng: random.Random) -> float:
+        sigma = math.log(self.p95 / self.median) / _Z95 if self.p95 > self.median else 0.0
+        return rng.lognormvariate(math.log(self.median), sigma)
+
+
+# Rough gemini-2.0-flash figures for the prompt sizes each agent sends.
+DEFAULT_LATENCIES = {
+    "entity": LatencyModel(0.9, 1.9),
+    "intent": LatencyModel(0.7, 1.4),
+    "tone": LatencyModel(0.7, 1.4),
+    # Output agent: time to its first token; decoding is added per token.
+    "output_agent": LatencyModel(0.6, 1.3),
+}
+
+CONTEXT_REPLIES = {
+    "entity": (ENTITY_REPLY, 1500),
+    "intent": (INTENT_REPLY, 1400),
+    "tone": (TONE_REPLY, 900),
+}
+
+
+def parse_latencies(spec: str) -> Dict[str, LatencyModel]:
+    """Parses "entity=0.9/1.9,output_agent=0.6/1.3" over the defaults."""
+    latencies = dict(DEFAULT_LATENCIES)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        agent, values = item.split("=", 1)
+        median, p95 = (float(value) for value in values.split("/"))
+        latencies[agent.strip()] = LatencyModel(median, p95)
+    return latencies
+
+
+class QuotaExceeded(Exception):
+    """The stub's stand-in for a 429 RESOURCE_EXHAUSTED."""
+
+    code = 429
+
+
+class Unavailable(Exception):
+    """The stub's stand-in for a 503 from a region having trouble."""
+
+    code = 503
+
+
+def _usage(prompt_tokens: int, output_tokens: int) -> dict:
+    return {
+        "prompt_token_count": prompt_tokens,
+        "candidates_token_count": output_tokens,
+        "total_token_count": prompt_tokens + output_tokens,
+    }
+
+
+def _event(
+    author: str, invocation_id: str, text: str, partial: bool = False, usage=None, role: str = "model"
+) -> dict:
+    event = {
+        "author": author,
+        "invocation_id": invocation_id,
+        "id": uuid.uuid4().hex[:8],
+        "timestamp": time.time(),
+        "content": {"role": role, "parts": [{"text": text}]},
+    }
+    if partial:
+        event["partial"] = True
+    if usage:
+        event["usage_metadata"] = usage
+    return event
+
+
+class StubRemoteApp:
+    """Simulated deployed agent; safe to call from many threads."""
+
+    def __init__(
+        self,
+        latencies: Optional[Dict[str, LatencyModel]] = None,
+        seconds_per_output_token: float = 0.006,
+        time_scale: float = 1.0,
+        seed: int = 0,
+        quota_per_s: Optional[float] = None,
+        session_latency: Optional[LatencyModel] = None,
+        error_rate: float = 0.0,
+    ):
+        self.latencies = latencies or dict(DEFAULT_LATENCIES)
+        self.seconds_per_output_token = seconds_per_output_token
+        # Divides every simulated delay, so load tests can run faster than real time.
+        self.time_scale = time_scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, dict] = {}
+        # Turns per simulated second, banking one second's worth.
+        self._quota = (
+            TokenBucket(quota_per_s * time_scale, quota_per_s)
+            if quota_per_s else None
+        )
+        # Turns refused for quota.
+        self.throttled = 0
+        # create_session round trip; instant when unset.
+        self.session_latency = session_latency
+        # Share of calls refused with a 503; may be changed while running.
+        self.error_rate = error_rate
+        self.failed = 0
+
+    def _sample(self, agent: str) -> float:
+        with self._lock:
+            return self.latencies[agent].sample(self._rng)
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds / self.time_scale)
+
+    async def _asleep(self, seconds: float) -> None:
+        if seconds > 0:
+            await asyncio.sleep(seconds / self.time_scale)
+
+    def _maybe_fail(self) -> None:
+        with self._lock:
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.failed += 1
+                raise Unavailable("The service is currently unavailable.")
+
+    def create_session(self, user_id: str) -> dict:
+        self._maybe_fail()
+        if self.session_latency:
+            self._sleep(self._sample_session())
+        return self._new_session(user_id)
+
+    def _sample_session(self) -> float:
+        with self._lock:
+            return self.session_latency.sample(self._rng)
+
+    def _new_session(self, user_id: str) -> dict:
+        session = {"id": uuid.uuid4().hex, "user_id": user_id, "app_name": "stub", "events": []}
+        with self._lock:
+            self._sessions[session["id"]] = session
+        return {**session, "last_update_time": time.time()}
+
+    def get_session(self, user_id: str, session_id: str) -> dict:
+        return self._sessions[session_id]
+
+    def delete_session(self, user_id: str, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    async def async_create_session(self, user_id: str) -> dict:
+        self._maybe_fail()
+        if self.session_latency:
+            await self._asleep(self._sample_session())
+        return self._new_session(user_id)
+
+    async def async_get_session(self, user_id: str, session_id: str) -> dict:
+        return self.get_session(user_id, session_id)
+
+    async def async_delete_session(self, user_id: str, session_id: str) -> None:
+        self.delete_session(user_id, session_id)
+
+    def stream_query(
+        self, user_id: str, session_id: str, message: str, run_config: Optional[dict] = None
+    ) -> Iterator[dict]:
+        for delay, event in self._turn(session_id, message, run_config):
+            self._sleep(delay)
+            if event is not None:
+                yield event
+
+    async def async_stream_query(
+        self, user_id: str, session_id: str, message: str, run_config: Optional[dict] = None
+    ) -> AsyncIterator[dict]:
+        for delay, event in self._turn(session_id, message, run_config):
+            await self._asleep(delay)
+            if event is not None:
+                yield event
+
+    def _turn(
+        self, session_id: str, message: str, run_config: Optional[dict]
+    ) -> Iterator[Tuple[float, Optional[dict]]]:
+        """Yields (simulated seconds to wait, event or None) pairs for one turn.
+
+        Events are built after the wait, so their timestamps are arrival times.
+        """
+        if self._quota is not None:
+            with self._lock:
+                if not self._quota.take():
+                    self.throttled += 1
+                    raise QuotaExceeded("Quota exceeded for aiplatform.googleapis.com/reasoning_engine")
+        self._maybe_fail()
+        sse = (run_config or {}).get("streaming_mode") == "sse"
+        session = self._sessions[session_id]
+        invocation_id = f"e-{uuid.uuid4().hex[:12]}"
+        # Agents see the user-visible dialogue, so prompts grow with it.
+        history_tokens = sum(
+            estimate_tokens(part.get("text", ""))
+            for event in session["events"]
+            if event["author"] in ("user", "output_agent")
+            for part in event["content"]["parts"]
+        )
+        prompt_tokens = estimate_tokens(message) + history_tokens
+        session["events"].append(_event("user", invocation_id, message, role="user"))
+
+        # The context agents run side by side; each event lands when its agent finishes.
+        finish = sorted((self._sample(agent), agent) for agent in CONTEXT_REPLIES)
+        elapsed = 0.0
+        for finished_at, agent in finish:
+            yield finished_at - elapsed, None
+            elapsed = finished_at
+            reply, instruction_tokens = CONTEXT_REPLIES[agent]
+            text = json.dumps(reply)
+            event = _event(
+                agent, invocation_id, text,
+                usage=_usage(instruction_tokens + prompt_tokens, estimate_tokens(text)),
+            )
+            session["events"].append(event)
+            yield 0.0, event
+
+        yield self._sample("output_agent"), None
+        words = OUTPUT_REPLY.split(" ")
+        usage = _usage(700 + prompt_tokens, estimate_tokens(OUTPUT_REPLY))
+        if sse:
+            chunk = max(1, len(words) // 4)
+            for start in range(0, len(words), chunk):
+                text = " ".join(words[start:start + chunk])
+                if start + chunk < len(words):
+                    text += " "
+                yield self.seconds_per_output_token * estimate_tokens(text), None
+                yield 0.0, _event("output_agent", invocation_id, text, partial=True)
+        else:
+            yield self.seconds_per_output_token * usage["candidates_token_count"], None
+        event = _event("output_agent", invocation_id, OUTPUT_REPLY, usage=usage)
+        session["events"].append(event)
+        yield 0.0, event
+
+
+class StubAgentEngines:
+    """Drop-in for the ``agent_engines`` module: ``get`` returns a stub app."""
+
+    def __init__(self, **options):
+        self._app = StubRemoteApp(**options)
+
+    def get(self, resource_id: str) -> StubRemoteApp:
+        return self._app
@@ -0,0 +1,167 @@
+"""Sends many turns through one app handle, for regression and capacity runs.
+
+``remote.py --send_file`` reads JSONL records of the form
+``{"message", "user_id"?, "session_id"?, "id"?}`` and hands them to
+``run_batch``, which runs them on a bounded thread pool and yields one
+result dict per record as they finish:
+
+- a record without ``session_id``, or with ``"auto"``, gets a session of
+  its own; any retryable failure (429, 5xx) retries the whole turn in a
+  fresh session with jittered backoff, up to ``attempts`` tries, after
+  deleting the one that failed. The session is deleted once the turn is
+  done too, unless ``keep_sessions`` is set (its result then names it)
+- records naming the same session run one after another, in file order;
+  they are only retried before their first event, as ``query_events``
+  does, since a half-finished turn is already in the session's history
+
+Every turn first takes a ``BACKGROUND`` slot from the scheduler, if one is
+given, so a batch paces itself to the configured quota. Each result holds
+the output agent's text, the time spent queued and then sending, per-agent
+event timings (seconds from sending) and token usage.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from deployment.events import TurnTiming, collect_output_text, query_events
+from deployment.scheduler import BACKGROUND, Scheduler
+from proto_1 import settings
+from proto_1.resilience import backoff_delay, is_retryable
+
+logger = logging.getLogger(__name__)
+
+AUTO_SESSION = "auto"
+
+
+def _delete_session(remote_app, user_id: str, session_id: str) -> None:
+    try:
+        remote_app.delete_session(user_id=user_id, session_id=session_id)
+    except Exception:
+        logger.warning("Could not delete batch session %s", session_id, exc_info=True)
+
+
+def _groups(records: Iterable[dict], user_id: str) -> List[List[Tuple[int, dict]]]:
+    """Turns that must run in order: one per auto-session record, one per named session."""
+    groups, by_session = [], {}
+    for index, record in enumerate(records):
+        session_id = record.get("session_id") or AUTO_SESSION
+        if session_id == AUTO_SESSION:
+            groups.append([(index, record)])
+            continue
+        key = (record.get("user_id") or user_id, session_id)
+        if key not in by_session:
+            by_session[key] = []
+            groups.append(by_session[key])
+        by_session[key].append((index, record))
+    return groups
+
+
+def run_turn(
+    remote_app,
+    index: int,
+    record: dict,
+    user_id: str,
+    attempts: int = 1,
+    scheduler: Optional[Scheduler] = None,
+    keep_sessions: bool = False,
+) -> dict:
+    """Sends one record and returns its result; failures are reported, not raised."""
+    user_id = record.get("user_id") or user_id
+    session_id = record.get("session_id") or AUTO_SESSION
+    auto = session_id == AUTO_SESSION
+    output, error = "", None
+    for attempt in range(max(1, attempts)):
+        timing, error, queued = TurnTiming(), None, 0.0
+        try:
+            if scheduler:
+                queued = scheduler.acquire(BACKGROUND).waited
+                timing = TurnTiming()
+            if auto:
+                session_id = remote_app.create_session(user_id=user_id)["id"]
+            output = collect_output_text(
+                query_events(
+                    remote_app, user_id, session_id, record["message"],
+                    streaming_mode="none", attempts=1 if auto else attempts,
+                ),
+                timing,
+            )
+            break
+        except Exception as exception:
+            error = exception
+            if not auto or not is_retryable(exception) or attempt == attempts - 1:
+                break
+            if session_id != AUTO_SESSION:
+                _delete_session(remote_app, user_id, session_id)
+                session_id = AUTO_SESSION
+            time.sleep(backoff_delay(attempt, settings.RETRY_BASE_DELAY, settings.RETRY_MAX_DELAY))
+    if auto and not keep_sessions and session_id != AUTO_SESSION:
+        _delete_session(remote_app, user_id, session_id)
+        session_id = AUTO_SESSION
+    result = {"index": index}
+    if "id" in record:
+        result["id"] = record["id"]
+    result.update({
+        "user_id": user_id,
+        "session_id": None if session_id == AUTO_SESSION else session_id,
+        "message": record["message"],
+        "ok": error is None and bool(output),
+        "output": output,
+        "error": f"{type(error).__name__}: {error}" if error else None,
+        "attempts": attempt + 1,
+        "queued_s": round(queued, 4),
+        "latency_s": timing.total_latency,
+        "agents": {
+            author: {"first_s": round(first, 4), "last_s": round(last, 4)}
+            for author, (first, last) in timing.stages.items()
+        },
+        "usage": {author: usage.as_dict() for author, usage in timing.usage.items()},
+        "tokens": sum(usage.total_tokens for usage in timing.usage.values()),
+    })
+    return result
+
+
+def run_batch(
+    remote_app,
+    records: List[dict],
+    user_id: str,
+    workers: int = 8,
+    attempts: int = 1,
+    scheduler: Optional[Scheduler] = None,
+    keep_sessions: bool = False,
+) -> Iterator[dict]:
+    """Runs ``records`` with at most ``workers`` turns at once; yields results as they finish."""
+
+    def run_group(group):
+        return [
+            run_turn(remote_app, index, record, user_id, attempts, scheduler, keep_sessions)
+            for index, record in group
+        ]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="saarthi-batch") as pool:
+        for future in as_completed([pool.submit(run_group, group) for group in _groups(records, user_id)]):
+            yield from future.result()
+
+
+def summarize(results: List[dict], elapsed: float) -> Dict[str, float]:
+    """Totals for a finished batch."""
+    latencies = sorted(result["latency_s"] for result in results if result["ok"])
+
+    def at(pct):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(round(pct / 100 * (len(latencies) - 1))))]
+
+    return {
+        "turns": len(results),
+        "ok": sum(result["ok"] for result in results),
+        "failed": sum(not result["ok"] for result in results),
+        "retried": sum(result["attempts"] > 1 for result in results),
+        "turns_per_s": round(len(results) / elapsed, 3) if elapsed else 0.0,
+        "latency_p50_s": round(at(50), 3),
+        "latency_p95_s": round(at(95), 3),
+        "tokens": sum(result["tokens"] for result in results),
+        "cost_usd": round(
+            sum(usage["cost_usd"] for result in results for usage in result["usage"].values()), 6
+        ),
+    }
@@ -0,0 +1,73 @@
+"""Merges a user's rapid consecutive messages into one pipeline turn.
+
+People in distress often send one thought as several short messages. Sent
+one by one, each runs the full pipeline, and every reply but the last
+answers a message the user has already moved past. A ``Coalescer`` holds
+messages until ``window`` seconds pass without another (or ``max_wait``
+seconds since the first), then releases them as one turn. Urgent messages,
+such as the ones the crisis screen flags, release the turn at once.
+
+A turn still running when the next message arrives is superseded: the app
+abandons it and reports it with ``supersede``. Messages it had not yet sent
+to the engine go back to the front of the queue; ones it had sent stay in
+the session's history, so the next turn sees them anyway. If nothing newer
+is waiting (the run was cut short by something else), they are requeued
+either way so the user still gets a reply.
+
+``app.py`` keeps one per session when ``SAARTHI_COALESCE_WINDOW`` is set;
+``benchmarks/coalesce.py`` replays chat logs through it.
+"""
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from proto_1 import settings
+
+
+class Coalescer:
+    """Pending messages of one chat. Times are ``time.monotonic()`` unless given."""
+
+    def __init__(self, window: Optional[float] = None, max_wait: Optional[float] = None):
+        self.window = settings.COALESCE_WINDOW if window is None else window
+        self.max_wait = settings.COALESCE_MAX_WAIT if max_wait is None else max_wait
+        self.pending: List[Tuple[str, float]] = []
+        self.urgent = False
+        self.stats: Counter = Counter()
+
+    def add(self, message: str, now: Optional[float] = None, urgent: bool = False) -> None:
+        self.pending.append((message, time.monotonic() if now is None else now))
+        self.urgent = self.urgent or urgent
+        self.stats["messages"] += 1
+
+    def due_at(self) -> Optional[float]:
+        """When the pending messages are released; None when there are none."""
+        if not self.pending:
+            return None
+        if self.urgent:
+            return self.pending[-1][1]
+        return min(self.pending[-1][1] + self.window, self.pending[0][1] + self.max_wait)
+
+    def due(self, now: Optional[float] = None) -> bool:
+        due_at = self.due_at()
+        return due_at is not None and (time.monotonic() if now is None else now) >= due_at
+
+    def flush(self) -> List[str]:
+        """Releases the pending messages as one turn."""
+        messages = [message for message, _ in self.pending]
+        self.pending, self.urgent = [], False
+        if messages:
+            self.stats["turns"] += 1
+            self.stats["merged"] += len(messages) - 1
+        return messages
+
+    def supersede(self, messages: List[str], sent: bool, now: Optional[float] = None) -> None:
+        """Records an abandoned turn; requeues it when never sent or when nothing replaces it."""
+        self.stats["superseded"] += 1
+        if not sent or not self.pending:
+            at = time.monotonic() if now is None else now
+            self.pending[:0] = [(message, at) for message in messages]
+
+
+def merge(messages: List[str]) -> str:
+    """One turn's text from its messages, in the order they were sent."""
+    return "\n".join(messages)
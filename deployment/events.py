@@ -0,0 +1,288 @@
+"""Helpers for reading the event dicts returned by ``stream_query``."""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+from deployment.usage import Usage, event_usage
+from proto_1 import settings
+from proto_1.resilience import is_retryable, retry_delay
+
+OUTPUT_AUTHOR = "output_agent"
+TRACE_METADATA_KEY = "trace"
+# Set by deployment.routing on the first event of a turn whose session moved.
+FAILOVER_METADATA_KEY = "failover"
+
+
+def event_text(event: dict) -> str:
+    """Returns the concatenated text parts of an event."""
+    parts = (event.get("content") or {}).get("parts") or []
+    return "".join(part["text"] for part in parts if part.get("text"))
+
+
+def is_output_event(event: dict) -> bool:
+    """True for events authored by the user-facing output agent."""
+    return event.get("author") == OUTPUT_AUTHOR
+
+
+def _close(events) -> None:
+    close = getattr(events, "close", None)
+    if close:
+        close()
+
+
+async def _aclose(events) -> None:
+    aclose = getattr(events, "aclose", None)
+    if aclose:
+        await aclose()
+
+
+def is_rejected(error: BaseException) -> bool:
+    """True when a ``stream_query`` call was refused before the engine accepted the turn.
+
+    Only such a call is safe to send again. Once the turn is accepted the
+    user message is in the session, even if no event has arrived yet (without
+    SSE the first one comes after a whole context agent), and a resend would
+    add it twice; model calls inside the turn have their own retries in
+    ``proto_1.resilience``. Connection failures and retryable HTTP statuses
+    count, unless the client marked the error ``accepted`` because the
+    engine reported it from a running turn.
+    """
+    if getattr(error, "accepted", False):
+        return False
+    return isinstance(error, ConnectionError) or is_retryable(error)
+
+
+def _retry_delay(error: BaseException, attempt: int, attempts: int) -> Optional[float]:
+    if not is_rejected(error) or attempt == attempts - 1:
+        return None
+    return retry_delay(error, attempt, settings.RETRY_BASE_DELAY, settings.RETRY_MAX_DELAY)
+
+
+def _query_kwargs(streaming_mode: str) -> dict:
+    if streaming_mode == "sse":
+        return {"run_config": {"streaming_mode": "sse"}}
+    return {}
+
+
+def query_events(
+    remote_app,
+    user_id: str,
+    session_id: str,
+    message: str,
+    streaming_mode: str = "sse",
+    attempts: int = 1,
+) -> Iterator[dict]:
+    """Starts a ``stream_query`` call and yields its raw event dicts.
+
+    ``streaming_mode="sse"`` asks for output_agent tokens as they are
+    generated; anything else leaves the deployment's default (one event per
+    agent). The underlying stream is closed when the caller stops early.
+
+    With ``attempts`` > 1, a call the engine refused before accepting the
+    turn (see ``is_rejected``) is retried with jittered backoff, or after
+    the ``Retry-After`` the engine asked for. Any other error is raised as
+    is, since the turn is already under way on the server.
+    """
+    kwargs = _query_kwargs(streaming_mode)
+    for attempt in range(attempts):
+        events = None
+        try:
+            events = remote_app.stream_query(
+                user_id=user_id, session_id=session_id, message=message, **kwargs
+            )
+            iterator = iter(events)
+            first = next(iterator, None)
+        except Exception as error:
+            if events is not None:
+                _close(events)
+            delay = _retry_delay(error, attempt, attempts)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        try:
+            if first is not None:
+                yield first
+                yield from iterator
+        finally:
+            _close(events)
+        return
+
+
+async def aquery_events(
+    remote_app,
+    user_id: str,
+    session_id: str,
+    message: str,
+    streaming_mode: str = "sse",
+    attempts: int = 1,
+) -> AsyncIterator[dict]:
+    """``query_events`` over ``async_stream_query``, for callers on an event loop."""
+    kwargs = _query_kwargs(streaming_mode)
+    for attempt in range(attempts):
+        events = None
+        try:
+            events = remote_app.async_stream_query(
+                user_id=user_id, session_id=session_id, message=message, **kwargs
+            )
+            iterator = aiter(events)
+            first = await anext(iterator, None)
+        except Exception as error:
+            if events is not None:
+                await _aclose(events)
+            delay = _retry_delay(error, attempt, attempts)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        try:
+            if first is not None:
+                yield first
+                async for event in iterator:
+                    yield event
+        finally:
+            await _aclose(events)
+        return
+
+
+def event_trace(event: dict) -> List[dict]:
+    """Server-side spans attached to an event by ``proto_1.tracing``."""
+    return (event.get("custom_metadata") or {}).get(TRACE_METADATA_KEY) or []
+
+
+def event_failover(event: dict) -> Optional[dict]:
+    """``{"session_id", "target"}`` when the router moved the turn to a new session."""
+    return (event.get("custom_metadata") or {}).get(FAILOVER_METADATA_KEY)
+
+
+@dataclass
+class TurnTiming:
+    """Wall-clock timings of a single streamed turn, in seconds."""
+
+    started_at: float = field(default_factory=time.perf_counter)
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # author -> [first, last] arrival of its events, relative to started_at.
+    stages: Dict[str, List[float]] = field(default_factory=dict)
+    # Server-side spans, when the deployment runs the tracing plugin.
+    trace: List[dict] = field(default_factory=list)
+    # author -> tokens used by its model calls this turn.
+    usage: Dict[str, Usage] = field(default_factory=dict)
+    # The new session, when the router failed the turn over (event_failover).
+    failover: Optional[dict] = None
+
+    def observe(self, event: dict) -> None:
+        """Records when an event arrived and picks up any attached trace."""
+        offset = time.perf_counter() - self.started_at
+        author = event.get("author", "unknown")
+        self.stages.setdefault(author, [offset, offset])[1] = offset
+        self.trace = event_trace(event) or self.trace
+        self.failover = event_failover(event) or self.failover
+        usage = event_usage(event)
+        if usage:
+            self.usage.setdefault(author, Usage()).add(usage)
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total_latency(self) -> Optional[float]:
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def as_dict(self) -> dict:
+        return {
+            "ttft_s": self.time_to_first_token,
+            "total_s": self.total_latency,
+            "tokens": sum(usage.total_tokens for usage in self.usage.values()),
+        }
+
+
+def stream_output_text(
+    events: Iterable[dict], timing: Optional[TurnTiming] = None
+) -> Iterator[str]:
+    """Yields output_agent text deltas and stops after the final output event.
+
+    With SSE streaming the agent emits ``partial`` chunks followed by one
+    aggregated final event; without it only the final event arrives. Either
+    way each piece of text is yielded once, and the underlying stream is
+    closed as soon as the final output event lands instead of being drained.
+    """
+    timing = timing or TurnTiming()
+    iterator = iter(events)
+    streamed = ""
+    try:
+        for event in iterator:
+            timing.observe(event)
+            if not is_output_event(event):
+                continue
+            text = event_text(event)
+            if not text:
+                continue
+            if event.get("partial"):
+                delta = text
+                streamed += text
+            elif not streamed:
+                delta = text
+            else:
+                # The final event repeats everything already sent as partials.
+                delta = text[len(streamed):] if text.startswith(streamed) else ""
+            if delta:
+                if timing.first_token_at is None:
+                    timing.first_token_at = time.perf_counter()
+                yield delta
+            if not event.get("partial"):
+                break
+    finally:
+        timing.finished_at = time.perf_counter()
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+
+
+def collect_output_text(
+    events: Iterable[dict], timing: Optional[TurnTiming] = None
+) -> str:
+    """Buffers the whole output_agent reply into a single string."""
+    return "".join(stream_output_text(events, timing)).strip()
+
+
+def waterfall_rows(timing: TurnTiming) -> List[dict]:
+    """Bars for a latency waterfall of one turn, offsets in seconds.
+
+    Uses the server-side spans when the deployment attached them; otherwise
+    falls back to when each author's events reached the client, which still
+    shows which stage the turn waited on but folds queueing and network time
+    into the bars.
+    """
+    if timing.trace:
+        origin = min(span["start"] for span in timing.trace)
+        end_default = max(span.get("end") or span["start"] for span in timing.trace)
+        return [
+            {
+                "name": span["name"],
+                "kind": span["kind"],
+                "start_s": span["start"] - origin,
+                "end_s": (span.get("end") or end_default) - origin,
+            }
+            for span in timing.trace
+        ]
+    context_done = max(
+        (last for author, (_, last) in timing.stages.items() if author != OUTPUT_AUTHOR),
+        default=0.0,
+    )
+    return [
+        {
+            "name": author,
+            "kind": "client",
+            # Context agents start with the turn; the output agent after them.
+            "start_s": min(first, context_done) if author == OUTPUT_AUTHOR else 0.0,
+            "end_s": last,
+        }
+        for author, (first, last) in timing.stages.items()
+    ]
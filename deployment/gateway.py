@@ -0,0 +1,260 @@
+"""Asyncio gateway between chat clients and the agent.
+
+``app.py`` used to call the blocking ``stream_query`` from Streamlit's
+script thread, so every user in a turn held a server thread for the whole
+multi-second pipeline. The gateway is an ASGI app that drives the engine's
+``async_*`` API instead: one process holds one engine handle (and with it
+the client's pooled connections) and serves any number of user sessions as
+coroutines, each waiting on the network rather than on a thread.
+
+Routes:
+
+- ``POST /sessions`` ``{"user_id"}``: creates a session
+- ``GET /sessions/{user_id}/{session_id}``: the session as the engine returns it
+- ``DELETE /sessions/{user_id}/{session_id}``: deletes the session
+- ``POST /sessions/{user_id}/{session_id}/messages`` ``{"message", "streaming_mode"}``:
+  one turn as Server-Sent Events, a ``data:`` line per event dict, then
+  ``event: end`` (or ``event: error`` with ``{"error", "status", "busy"}``,
+  ``busy`` when the turn timed out in the queue); while the turn waits for
+  the scheduler, ``event: queued`` with ``{"position", "waited_s"}`` every
+  half second. A full queue refuses the turn before the stream starts, with
+  HTTP 429 and ``Retry-After``
+- ``WS /sessions/{user_id}/{session_id}/ws``: send ``{"message", "streaming_mode"}``
+  per turn; receives ``{"queued": ...}`` and ``{"event": ...}`` frames then
+  ``{"end": true}`` (or ``{"error": ...}``)
+- ``GET /healthz``: turns in flight and sessions with a turn running
+- ``GET /metrics``: the scheduler's queue depth, waits and counts
+
+Turns on the same session run one at a time, in arrival order, since both
+would append to the same event history. Each turn then waits for a slot from
+``deployment.scheduler``, which paces all of the process's turns to the
+configured quota and lets crisis messages go first. ``GatewayClient`` in
+``deployment/gateway_client.py`` is the matching blocking client.
+
+    SAARTHI_RUNTIME=local python -m deployment.gateway --model_backend=stub
+    python -m deployment.gateway --resource_id=... --gateway_port=8080
+"""
+import asyncio
+import contextlib
+import json
+import math
+import os
+import sys
+from collections import Counter
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import uvicorn
+import vertexai
+from absl import app, flags
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from deployment import remote
+from deployment.events import aquery_events
+from deployment.scheduler import (
+    QueueFull, QueueTimeout, Scheduler, Ticket, default_scheduler, priority_for,
+)
+from proto_1 import settings
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("gateway_host", settings.GATEWAY_HOST, "Interface the gateway listens on.")
+flags.DEFINE_integer("gateway_port", settings.GATEWAY_PORT, "Port the gateway listens on.")
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class SessionRequest(BaseModel):
+    user_id: str
+
+
+class MessageRequest(BaseModel):
+    message: str
+    streaming_mode: str = "sse"
+
+
+def _status(error: Exception) -> int:
+    """HTTP status to report for an engine error; 502 when it carries none."""
+    if isinstance(error, LookupError):
+        # LocalApp and the stub engine for an unknown session.
+        return 404
+    for attribute in ("code", "status_code"):
+        code = getattr(error, attribute, None)
+        code = getattr(code, "value", code)
+        if isinstance(code, int) and 400 <= code < 600:
+            return code
+    return 502
+
+
+def _sse(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+class SessionLocks:
+    """One lock per session with a turn running or queued."""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._waiting: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, session_id: str):
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        self._waiting[session_id] += 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._waiting[session_id] -= 1
+            if not self._waiting[session_id]:
+                del self._waiting[session_id]
+                del self._locks[session_id]
+
+
+def create_gateway(remote_app, scheduler: Optional[Scheduler] = None) -> FastAPI:
+    """The gateway app over ``remote_app``, anything with the engine's ``async_*`` API.
+
+    Turns are admitted by ``scheduler``, the process-wide one by default.
+    """
+    gateway = FastAPI(title="Saarthi gateway")
+    scheduler = scheduler or default_scheduler()
+    locks = SessionLocks()
+    inflight = {"turns": 0}
+
+    async def turn(
+        user_id, session_id, request: MessageRequest, ticket: Optional[Ticket] = None
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """Yields ("queued", position) while waiting for a slot, then ("event", event dict)s.
+
+        Waits on ``ticket`` when the caller already queued the turn.
+        """
+        async with locks.hold(session_id):
+            async for position in scheduler.queued(priority_for(request.message), ticket=ticket):
+                yield "queued", position
+            inflight["turns"] += 1
+            try:
+                async for event in aquery_events(
+                    remote_app,
+                    user_id,
+                    session_id,
+                    request.message,
+                    request.streaming_mode,
+                    attempts=settings.RETRY_ATTEMPTS,
+                ):
+                    yield "event", event
+            finally:
+                inflight["turns"] -= 1
+
+    @gateway.get("/healthz")
+    async def healthz():
+        return {
+            "ok": True,
+            "turns_in_flight": inflight["turns"],
+            "busy_sessions": len(locks),
+            "queue_depth": scheduler.snapshot()["queue_depth"],
+        }
+
+    @gateway.get("/metrics")
+    async def metrics():
+        return scheduler.snapshot()
+
+    @gateway.post("/sessions")
+    async def create_session(request: SessionRequest):
+        try:
+            return await remote_app.async_create_session(user_id=request.user_id)
+        except Exception as error:
+            raise HTTPException(_status(error), str(error))
+
+    @gateway.get("/sessions/{user_id}/{session_id}")
+    async def get_session(user_id: str, session_id: str):
+        try:
+            return await remote_app.async_get_session(user_id=user_id, session_id=session_id)
+        except Exception as error:
+            raise HTTPException(_status(error), str(error))
+
+    @gateway.delete("/sessions/{user_id}/{session_id}", status_code=204)
+    async def delete_session(user_id: str, session_id: str):
+        try:
+            await remote_app.async_delete_session(user_id=user_id, session_id=session_id)
+        except Exception as error:
+            raise HTTPException(_status(error), str(error))
+
+    @gateway.post("/sessions/{user_id}/{session_id}/messages")
+    async def send_message(user_id: str, session_id: str, request: MessageRequest):
+        # Queued before the response starts, so a full queue is an HTTP 429
+        # the client can retry rather than an error inside a 200 stream.
+        try:
+            ticket = scheduler.submit(priority_for(request.message))
+        except QueueFull as error:
+            raise HTTPException(
+                429, str(error), headers={"Retry-After": str(max(1, math.ceil(error.retry_after or 0)))}
+            )
+
+        async def stream():
+            try:
+                async for kind, payload in turn(user_id, session_id, request, ticket):
+                    yield _sse(payload, event="queued" if kind == "queued" else None)
+            except Exception as error:
+                yield _sse(
+                    {
+                        "error": str(error),
+                        "status": _status(error),
+                        "busy": isinstance(error, (QueueFull, QueueTimeout)),
+                    },
+                    event="error",
+                )
+                return
+            yield _sse({}, event="end")
+
+        return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    @gateway.websocket("/sessions/{user_id}/{session_id}/ws")
+    async def session_socket(websocket: WebSocket, user_id: str, session_id: str):
+        await websocket.accept()
+        try:
+            while True:
+                request = MessageRequest(**await websocket.receive_json())
+                try:
+                    async for kind, payload in turn(user_id, session_id, request):
+                        await websocket.send_json({kind: payload})
+                except WebSocketDisconnect:
+                    raise
+                except Exception as error:
+                    await websocket.send_json({"error": str(error), "status": _status(error)})
+                    continue
+                await websocket.send_json({"end": True})
+        except WebSocketDisconnect:
+            return
+
+    return gateway
+
+
+def main(argv=None):
+    """Serves the gateway over the engine ``remote.py`` would use."""
+    if argv is None:
+        argv = FLAGS(sys.argv)
+    load_dotenv(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "proto_1", ".env")))
+    resource_id = FLAGS.resource_id
+    if settings.RUNTIME == "local":
+        resource_id = resource_id or "local"
+    else:
+        project_id = FLAGS.project_id or os.getenv("GOOGLE_CLOUD_PROJECT")
+        location = FLAGS.location or os.getenv("GOOGLE_CLOUD_LOCATION")
+        if not project_id or not location or not resource_id:
+            print("--resource_id, GOOGLE_CLOUD_PROJECT and GOOGLE_CLOUD_LOCATION are required")
+            return
+        vertexai.init(project=project_id, location=location)
+    uvicorn.run(
+        create_gateway(remote.get_app(resource_id)),
+        host=FLAGS.gateway_host,
+        port=FLAGS.gateway_port,
+    )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,114 @@
+"""Blocking client for ``deployment.gateway``.
+
+``GatewayClient(url)`` has the ``create_session`` / ``get_session`` /
+``delete_session`` / ``stream_query`` surface of ``agent_engines.get(...)``, so ``app.py`` and
+``deployment.events`` use it unchanged. Each turn is one Server-Sent Events
+response, whose queue-position updates are skipped. A refused request
+(connection failure, or a 429/5xx status with any ``Retry-After``) raises
+``GatewayError``, which ``query_events`` retries; an error the gateway
+reports in the stream is raised as an ``accepted`` ``GatewayError`` with the
+engine's status code and is not retried, since the turn had started.
+A full gateway queue (HTTP 429) or a turn that timed out in it raises
+``GatewayBusy``, which callers show like the local ``QueueFull``.
+"""
+import json
+from typing import Iterator, Optional
+
+import httpx
+
+
+class GatewayError(Exception):
+    def __init__(
+        self,
+        message: str,
+        status_code: int,
+        accepted: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        # Whether the gateway had taken the turn when it failed.
+        self.accepted = accepted
+        self.retry_after = retry_after
+
+
+class GatewayBusy(GatewayError):
+    """The gateway's scheduler refused the turn or gave up waiting for a slot."""
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _raise_for_status(response: httpx.Response) -> None:
+    if response.is_error:
+        response.read()
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        error = GatewayBusy if response.status_code == 429 else GatewayError
+        raise error(str(detail), response.status_code, retry_after=_retry_after(response))
+
+
+class GatewayClient:
+    """One pooled HTTP client per gateway; safe to share between threads."""
+
+    def __init__(self, url: str, timeout: float = 120.0):
+        self.url = url.rstrip("/")
+        self._http = httpx.Client(base_url=self.url, timeout=timeout)
+
+    def close(self) -> None:
+        self._http.close()
+
+    def create_session(self, user_id: str) -> dict:
+        response = self._http.post("/sessions", json={"user_id": user_id})
+        _raise_for_status(response)
+        return response.json()
+
+    def get_session(self, user_id: str, session_id: str) -> dict:
+        response = self._http.get(f"/sessions/{user_id}/{session_id}")
+        _raise_for_status(response)
+        return response.json()
+
+    def delete_session(self, user_id: str, session_id: str) -> None:
+        _raise_for_status(self._http.delete(f"/sessions/{user_id}/{session_id}"))
+
+    def stream_query(
+        self, user_id: str, session_id: str, message: str, run_config: Optional[dict] = None
+    ) -> Iterator[dict]:
+        body = {
+            "message": message,
+            "streaming_mode": (run_config or {}).get("streaming_mode", "none"),
+        }
+        request = self._http.build_request(
+            "POST", f"/sessions/{user_id}/{session_id}/messages", json=body
+        )
+        try:
+            response = self._http.send(request, stream=True)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as error:
+            raise GatewayError(str(error), 503) from error
+        try:
+            _raise_for_status(response)
+            event = None
+            for line in response.iter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "end":
+                        return
+                    if event == "error":
+                        # A queue timeout is not resent either: it already
+                        # waited as long as the gateway allows.
+                        error = GatewayBusy if data.get("busy") else GatewayError
+                        raise error(data["error"], data["status"], accepted=True)
+                    if event != "queued":
+                        yield data
+                elif not line:
+                    event = None
+        finally:
+            response.close()
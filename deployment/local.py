@@ -0,0 +1,289 @@
+"""Runs ``proto_1``'s pipeline in-process instead of on Agent Engine.
+
+``LocalApp`` exposes the same ``create_session`` / ``get_session`` /
+``delete_session`` / ``list_sessions`` / ``stream_query`` surface as ``agent_engines.get(...)``,
+plus the ``async_*`` variants ``deployment.gateway`` uses, and yields the
+same event dicts, so ``app.py`` and ``remote.py`` switch to it with
+``SAARTHI_RUNTIME=local`` and nothing else changes. The pipeline runs
+on an ADK ``Runner`` driven from one background event loop, with sessions in
+memory or in ``SAARTHI_SESSION_DB``.
+
+The model behind every agent comes from ``BACKENDS``:
+
+- ``gemini``: the configured ``SAARTHI_MODEL`` (needs credentials)
+- ``stub``: ``StubLlm`` with simulated prefill/decode latency
+- ``fake``: ``StubLlm`` with no latency, for deterministic runs
+- ``flaky``: ``stub`` plus latency spikes and injected 429/503 errors, to
+  exercise the retries and hedging in ``proto_1.resilience``
+- ``cassette``: replays (or with ``SAARTHI_CASSETTE_MODE=auto``, records)
+  ``SAARTHI_CASSETTE_PATH``; what it recorded is saved when the process
+  exits normally
+
+Chat from a terminal, printing per-turn timings:
+
+    SAARTHI_MODEL_BACKEND=fake deploy-local
+    python -m deployment.local --model_backend=stub --local_message="I failed my exam"
+"""
+import asyncio
+import atexit
+import queue
+import sys
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional
+
+from absl import app, flags
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+from google.genai import types
+
+from deployment.events import TurnTiming, query_events, stream_output_text
+from proto_1 import settings
+from proto_1.cassette import REPLAY, Cassette, use_cassette
+from proto_1.main import build_pipeline
+from proto_1.models import StubLlm, stub_model
+from proto_1.tracing import TracingPlugin
+
+APP_NAME = "saarthi_local"
+
+_END = object()
+
+
+def _gemini():
+    return build_pipeline()
+
+
+def _stub():
+    return build_pipeline(model=stub_model())
+
+
+def _fake():
+    return build_pipeline(
+        model=StubLlm(
+            first_token_latency=0.0,
+            seconds_per_1k_prompt_tokens=0.0,
+            seconds_per_output_token=0.0,
+            calls=[],
+        )
+    )
+
+
+def _flaky():
+    return build_pipeline(
+        model=StubLlm(spike_rate=0.05, spike_latency=3.0, error_rate=0.1, calls=[])
+    )
+
+
+def _cassette():
+    if not settings.CASSETTE_PATH:
+        raise ValueError("SAARTHI_CASSETTE_PATH is required for the cassette backend")
+    cassette = Cassette(settings.CASSETTE_PATH)
+    if settings.CASSETTE_MODE != REPLAY:
+        # Rewriting the file after every turn would grow with the cassette.
+        atexit.register(cassette.save)
+    return use_cassette(build_pipeline(), cassette, settings.CASSETTE_MODE)
+
+
+# Backend name -> factory returning a freshly built pipeline.
+BACKENDS: Dict[str, Callable] = {
+    "gemini": _gemini,
+    "stub": _stub,
+    "fake": _fake,
+    "flaky": _flaky,
+    "cassette": _cassette,
+}
+
+
+def register_backend(name: str, factory: Callable) -> None:
+    """Adds a model backend selectable through ``SAARTHI_MODEL_BACKEND``."""
+    BACKENDS[name] = factory
+
+
+def _run_config(run_config: Optional[dict]) -> RunConfig:
+    mode = (run_config or {}).get("streaming_mode")
+    return RunConfig(streaming_mode=StreamingMode.SSE if mode == "sse" else StreamingMode.NONE)
+
+
+def _session_dict(session_id: str, session) -> dict:
+    if session is None:
+        raise KeyError(f"Session not found: {session_id}")
+    return session.model_dump(mode="json", exclude_none=True)
+
+
+class LocalApp:
+    """In-process stand-in for a deployed Agent Engine."""
+
+    def __init__(self, agent=None, backend: Optional[str] = None, session_db: Optional[str] = None):
+        self.backend = backend or settings.MODEL_BACKEND
+        if agent is None:
+            if self.backend not in BACKENDS:
+                raise ValueError(f"Unknown model backend: {self.backend}")
+            agent = BACKENDS[self.backend]()
+        session_db = settings.SESSION_DB if session_db is None else session_db
+        self.tracer = TracingPlugin()
+        self.runner = Runner(
+            app_name=APP_NAME,
+            agent=agent,
+            session_service=DatabaseSessionService(session_db) if session_db else InMemorySessionService(),
+            plugins=[self.tracer],
+        )
+        # One loop for every call, so sessions and clients stay on one thread.
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="saarthi-local", daemon=True).start()
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _acall(self, coro):
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    def create_session(self, user_id: str) -> dict:
+        session = self._call(
+            self.runner.session_service.create_session(app_name=APP_NAME, user_id=user_id)
+        )
+        return session.model_dump(mode="json")
+
+    def get_session(self, user_id: str, session_id: str) -> dict:
+        return _session_dict(
+            session_id,
+            self._call(
+                self.runner.session_service.get_session(
+                    app_name=APP_NAME, user_id=user_id, session_id=session_id
+                )
+            ),
+        )
+
+    async def async_create_session(self, user_id: str) -> dict:
+        session = await self._acall(
+            self.runner.session_service.create_session(app_name=APP_NAME, user_id=user_id)
+        )
+        return session.model_dump(mode="json")
+
+    async def async_get_session(self, user_id: str, session_id: str) -> dict:
+        return _session_dict(
+            session_id,
+            await self._acall(
+                self.runner.session_service.get_session(
+                    app_name=APP_NAME, user_id=user_id, session_id=session_id
+                )
+            ),
+        )
+
+    def delete_session(self, user_id: str, session_id: str) -> None:
+        self._call(
+            self.runner.session_service.delete_session(
+                app_name=APP_NAME, user_id=user_id, session_id=session_id
+            )
+        )
+
+    async def async_delete_session(self, user_id: str, session_id: str) -> None:
+        await self._acall(
+            self.runner.session_service.delete_session(
+                app_name=APP_NAME, user_id=user_id, session_id=session_id
+            )
+        )
+
+    def list_sessions(self, user_id: str) -> list:
+        response = self._call(
+            self.runner.session_service.list_sessions(app_name=APP_NAME, user_id=user_id)
+        )
+        return [session.model_dump(mode="json") for session in response.sessions]
+
+    def stream_query(
+        self, user_id: str, session_id: str, message: str, run_config: Optional[dict] = None
+    ) -> Iterator[dict]:
+        """Yields event dicts as the runner produces them.
+
+        Like a deployed engine, the turn runs to completion (after-run
+        callbacks, trace export) even when the caller stops reading early.
+        """
+        events: queue.Queue = queue.Queue()
+        self._start_turn(user_id, session_id, message, run_config, events.put)
+        while True:
+            item = events.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def async_stream_query(
+        self, user_id: str, session_id: str, message: str, run_config: Optional[dict] = None
+    ) -> AsyncIterator[dict]:
+        """``stream_query`` for callers running their own event loop."""
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        self._start_turn(
+            user_id, session_id, message, run_config,
+            lambda item: loop.call_soon_threadsafe(events.put_nowait, item),
+        )
+        while True:
+            item = await events.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def _start_turn(self, user_id, session_id, message, run_config, put: Callable) -> None:
+        """Runs one turn on the runner's loop, handing each event dict to ``put``."""
+
+        async def produce():
+            try:
+                async for event in self.runner.run_async(
+                    user_id=user_id,
+                    session_id=session_id,
+                    new_message=types.Content(role="user", parts=[types.Part(text=message)]),
+                    run_config=_run_config(run_config),
+                ):
+                    put(event.model_dump(mode="json", exclude_none=True))
+            except Exception as error:  # Re-raised on the caller's side.
+                # The user message is already in the session; see events.is_rejected.
+                error.accepted = True
+                put(error)
+            finally:
+                put(_END)
+
+        asyncio.run_coroutine_threadsafe(produce(), self._loop)
+
+
+FLAGS = flags.FLAGS
+if "model_backend" not in FLAGS:
+    # deployment/remote.py defines it too, for its local runtime.
+    flags.DEFINE_string("model_backend", None, "Model backend; defaults to SAARTHI_MODEL_BACKEND.")
+flags.DEFINE_string("local_user_id", "local_user", "User ID for the local session.")
+flags.DEFINE_string("local_message", None, "Send one message and exit instead of chatting.")
+
+
+def chat(local_app: LocalApp, user_id: str, messages: Iterator[str]) -> None:
+    session_id = local_app.create_session(user_id=user_id)["id"]
+    for message in messages:
+        timing = TurnTiming()
+        print("Saarthi: ", end="", flush=True)
+        for delta in stream_output_text(query_events(local_app, user_id, session_id, message), timing):
+            print(delta, end="", flush=True)
+        print(f"\n  [ttft {timing.time_to_first_token or 0:.3f}s, total {timing.total_latency:.3f}s]")
+
+
+def _prompt() -> Iterator[str]:
+    while True:
+        try:
+            line = input("You: ").strip()
+        except EOFError:
+            return
+        if line:
+            yield line
+
+
+def main(argv=None):
+    """Entry point for ``deploy-local``."""
+    if argv is None:
+        argv = FLAGS(sys.argv)
+    local_app = LocalApp(backend=FLAGS.model_backend)
+    print(f"Running Saarthi locally on the '{local_app.backend}' backend.")
+    messages = [FLAGS.local_message] if FLAGS.local_message else _prompt()
+    chat(local_app, FLAGS.local_user_id, messages)
+
+
+if __name__ == "__main__":
+    app.run(main)
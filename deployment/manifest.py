@@ -0,0 +1,142 @@
+"""Content hashes of what ``remote.py`` deploys, and a local record of them.
+
+``fingerprint`` hashes every file of the packages shipped as
+``extra_packages`` (agent code, and with it every prompt, which live in the
+agents' modules), the pip requirements and the forwarded ``SAARTHI_*``
+environment into one digest. Caches, bytecode and ``.env`` files are left
+out: they differ between machines without changing what runs.
+
+``ManifestStore`` keeps one JSON file per deployed engine, named after the
+engine's id, holding the manifest that is live and a short history of
+earlier deploys. ``remote.py --deploy`` compares against it to skip deploys
+that would change nothing and to print which files did change.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+IGNORED_DIRS = frozenset({"__pycache__", ".pytest_cache", ".mypy_cache", ".ruff_cache"})
+IGNORED_SUFFIXES = (".pyc", ".pyo")
+IGNORED_NAMES = frozenset({".env", ".DS_Store"})
+# Earlier deploys kept per engine.
+HISTORY_LIMIT = 20
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def package_files(paths: Iterable[str]) -> Dict[str, str]:
+    """Relative path -> SHA-256 of every file that ships, in a stable order."""
+    files = {}
+    for root_path in paths:
+        base = os.path.dirname(os.path.normpath(root_path))
+        if os.path.isfile(root_path):
+            walked = [(base, [], [os.path.basename(root_path)])]
+        else:
+            walked = os.walk(root_path)
+        for directory, dirs, names in walked:
+            dirs[:] = sorted(name for name in dirs if name not in IGNORED_DIRS)
+            for name in sorted(names):
+                if name in IGNORED_NAMES or name.endswith(IGNORED_SUFFIXES):
+                    continue
+                path = os.path.join(directory, name)
+                with open(path, "rb") as handle:
+                    # Line endings depend on the checkout, not on the code.
+                    content = handle.read().replace(b"\r\n", b"\n")
+                files[os.path.relpath(path, base).replace(os.sep, "/")] = _sha256(content)
+    return dict(sorted(files.items()))
+
+
+def fingerprint(extra_packages: List[str], requirements: List[str], env_vars: Dict[str, str]) -> dict:
+    """The manifest of one deploy; ``manifest["hash"]`` changes whenever anything shipped does."""
+    manifest = {
+        "files": package_files(extra_packages),
+        "requirements": sorted(requirements),
+        "env_vars": dict(sorted(env_vars.items())),
+    }
+    manifest["hash"] = _sha256(json.dumps(manifest, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def changes(old: Optional[dict], new: dict) -> List[str]:
+    """What differs between two manifests, one line per file or setting."""
+    if not old:
+        return ["(no earlier deploy recorded)"]
+    lines = []
+    old_files, new_files = old.get("files", {}), new["files"]
+    for path in sorted(set(old_files) | set(new_files)):
+        if path not in old_files:
+            lines.append(f"added     {path}")
+        elif path not in new_files:
+            lines.append(f"removed   {path}")
+        elif old_files[path] != new_files[path]:
+            lines.append(f"modified  {path}")
+    if old.get("requirements") != new["requirements"]:
+        lines.append("modified  requirements")
+    old_env, new_env = old.get("env_vars", {}), new["env_vars"]
+    for key in sorted(set(old_env) | set(new_env)):
+        if old_env.get(key) != new_env.get(key):
+            lines.append(f"modified  {key}")
+    return lines
+
+
+class ManifestStore:
+    """One ``<engine id>.json`` per deployed engine under ``directory``."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, resource_name: str) -> str:
+        return os.path.join(self.directory, resource_name.rstrip("/").rsplit("/", 1)[-1] + ".json")
+
+    def load(self, resource_name: str) -> Optional[dict]:
+        """The record of an engine: ``resource_name``, ``live`` and ``history``."""
+        try:
+            with open(self._path(resource_name), encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def live(self, resource_name: str) -> Optional[dict]:
+        record = self.load(resource_name)
+        return record["live"] if record else None
+
+    def records(self) -> List[dict]:
+        """Every engine recorded, most recently deployed first."""
+        if not os.path.isdir(self.directory):
+            return []
+        records = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name), encoding="utf-8") as handle:
+                    records.append(json.load(handle))
+        return sorted(records, key=lambda record: record["live"]["deployed_at"], reverse=True)
+
+    def record(self, resource_name: str, manifest: dict, action: str) -> dict:
+        """Makes ``manifest`` the live one of ``resource_name``; ``action`` is "create" or "update"."""
+        manifest = {**manifest, "action": action, "deployed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        previous = self.load(resource_name)
+        history = []
+        if previous:
+            live = previous["live"]
+            history = [
+                {key: live[key] for key in ("hash", "action", "deployed_at")}
+            ] + previous.get("history", [])
+        record = {"resource_name": resource_name, "live": manifest, "history": history[:HISTORY_LIMIT]}
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(resource_name)
+        # Written whole and renamed, so an interrupted deploy never leaves half a manifest.
+        with open(path + ".tmp", "w", encoding="utf-8") as handle:
+            json.dump(record, handle, indent=2)
+            handle.write("\n")
+        os.replace(path + ".tmp", path)
+        return record
+
+    def forget(self, resource_name: str) -> None:
+        try:
+            os.remove(self._path(resource_name))
+        except FileNotFoundError:
+            pass
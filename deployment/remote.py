@@ -1,5 +1,8 @@
+import functools
+import json
 import os
 import sys
+import time
 
 import vertexai
 from absl import app, flags
@@ -7,7 +10,14 @@ from dotenv import load_dotenv
 from vertexai import agent_engines
 from vertexai.preview import reasoning_engines
 
-from proto_1 import root_agent
+from deployment.batch import run_batch, summarize
+from deployment.events import query_events
+from deployment.manifest import ManifestStore, changes, fingerprint
+from deployment.routing import DeploymentRouter
+from deployment.scheduler import default_scheduler
+from deployment.usage import UsageLedger
+from proto_1 import root_agent, settings
+from proto_1.tracing import TracingPlugin
 
 FLAGS = flags.FLAGS
 flags.DEFINE_string("project_id", None, "GCP project ID.")
@@ -17,53 +27,149 @@ flags.DEFINE_string("resource_id", None, "ReasoningEngine resource ID.")
 flags.DEFINE_string("user_id", "test_user", "User ID for session operations.")
 flags.DEFINE_string("session_id", None, "Session ID for operations.")
 flags.DEFINE_bool("create", False, "Creates a new deployment.")
+flags.DEFINE_bool(
+    "deploy",
+    False,
+    "Deploys only what changed: updates --resource_id (or the engine recorded in --manifest_dir) in place, "
+    "or creates one if none is recorded.",
+)
+flags.DEFINE_bool("force", False, "With --deploy, deploys even when the package hash is unchanged.")
+flags.DEFINE_string(
+    "manifest_dir",
+    os.path.join(os.path.dirname(__file__), "manifests"),
+    "Where deploys record the content hash that is live on each engine.",
+)
 flags.DEFINE_bool("delete", False, "Deletes an existing deployment.")
 flags.DEFINE_bool("list", False, "Lists all deployments.")
 flags.DEFINE_bool("create_session", False, "Creates a new session.")
 flags.DEFINE_bool("list_sessions", False, "Lists all sessions for a user.")
 flags.DEFINE_bool("get_session", False, "Gets a specific session.")
 flags.DEFINE_bool("send", False, "Sends a message to the deployed agent.")
+flags.DEFINE_string(
+    "send_file",
+    None,
+    'Sends every record of a JSONL file of {"message", "user_id"?, "session_id"? (or "auto"), "id"?}.',
+)
+flags.DEFINE_string("results_file", "-", "Where --send_file writes one JSONL result per record; - for stdout.")
+flags.DEFINE_integer("workers", 8, "Turns --send_file runs at once.")
+flags.DEFINE_bool(
+    "keep_sessions", False, "Keeps the sessions --send_file creates for auto-session records."
+)
+flags.DEFINE_bool(
+    "usage",
+    False,
+    "Reports token usage and estimated cost per agent for --session_id, or for all of --user_id's sessions.",
+)
 flags.DEFINE_string(
     "message",
     "Shorten this message: Hello, how are you doing today?",
     "Message to send to the agent.",
 )
-flags.mark_bool_flags_as_mutual_exclusive(
-    [
-        "create",
-        "delete",
-        "list",
-        "create_session",
-        "list_sessions",
-        "get_session",
-        "send",
-    ]
+if "model_backend" not in FLAGS:
+    # Also defined by deployment/local.py, which this module only imports
+    # when it runs the pipeline in-process.
+    flags.DEFINE_string("model_backend", None, "Model backend; defaults to SAARTHI_MODEL_BACKEND.")
+MODES = [
+    "create",
+    "deploy",
+    "delete",
+    "list",
+    "create_session",
+    "list_sessions",
+    "get_session",
+    "send",
+    "usage",
+]
+flags.mark_bool_flags_as_mutual_exclusive(MODES)
+flags.register_multi_flags_validator(
+    ["send_file", *MODES],
+    lambda values: not values["send_file"] or not any(values[mode] for mode in MODES),
+    message="--send_file can't be combined with another mode such as --send.",
 )
 
+# --resource_id stand-in for the router over SAARTHI_DEPLOYMENTS.
+ROUTED = "routed"
 
-def create() -> None:
-    """Creates a new deployment."""
-    # First wrap the agent in AdkApp
-    app = reasoning_engines.AdkApp(
+
+REQUIREMENTS = [
+    "google-cloud-aiplatform[adk,agent_engines]",
+    "numpy",
+]
+EXTRA_PACKAGES = ["./proto_1"]
+
+
+def adk_app() -> reasoning_engines.AdkApp:
+    """The agent wrapped for Agent Engine."""
+    return reasoning_engines.AdkApp(
         agent=root_agent,
+        plugins=[TracingPlugin()],
         enable_tracing=True,
     )
 
-    # Now deploy to Agent Engine
-    remote_app = agent_engines.create(
-        agent_engine=app,
-        requirements=[
-            "google-cloud-aiplatform[adk,agent_engines]",
-        ],
-        extra_packages=["./proto_1"],
-    )
+
+def package_manifest() -> dict:
+    """Content hash of everything a deploy ships."""
+    return fingerprint(EXTRA_PACKAGES, REQUIREMENTS, settings.deployment_env())
+
+
+def _deploy_options(manifest: dict) -> dict:
+    return {
+        "agent_engine": adk_app(),
+        "requirements": REQUIREMENTS,
+        "extra_packages": EXTRA_PACKAGES,
+        "env_vars": settings.deployment_env() or None,
+        # Also visible in the console, next to the engine.
+        "description": f"saarthi package {manifest['hash']}",
+    }
+
+
+def create() -> None:
+    """Creates a new deployment."""
+    manifest = package_manifest()
+    remote_app = agent_engines.create(**_deploy_options(manifest))
+    ManifestStore(FLAGS.manifest_dir).record(remote_app.resource_name, manifest, "create")
     print(f"Created remote app: {remote_app.resource_name}")
+    print(f"Package hash: {manifest['hash'][:12]}")
+
+
+def deploy(resource_id: str = None, force: bool = False) -> None:
+    """Deploys the agent if it changed since the live deploy, updating the engine in place."""
+    store = ManifestStore(FLAGS.manifest_dir)
+    if not resource_id:
+        records = store.records()
+        if len(records) > 1:
+            print(f"{len(records)} engines are recorded in {store.directory}; pass --resource_id:")
+            for record in records:
+                print(f"- {record['resource_name']} ({record['live']['hash'][:12]})")
+            return
+        resource_id = records[0]["resource_name"] if records else None
+
+    started = time.perf_counter()
+    manifest = package_manifest()
+    live = store.live(resource_id) if resource_id else None
+    print(f"Package hash: {manifest['hash'][:12]} ({len(manifest['files'])} files, {time.perf_counter() - started:.2f}s)")
+    if live and live["hash"] == manifest["hash"] and not force:
+        print(f"{resource_id} already runs this package ({live['deployed_at']}); nothing to deploy.")
+        return
+    for line in changes(live, manifest):
+        print(f"  {line}")
+
+    if resource_id:
+        remote_app = agent_engines.update(resource_name=resource_id, **_deploy_options(manifest))
+        action = "update"
+    else:
+        remote_app = agent_engines.create(**_deploy_options(manifest))
+        action = "create"
+    store.record(remote_app.resource_name, manifest, action)
+    verb = "Updated" if action == "update" else "Created"
+    print(f"{verb} remote app: {remote_app.resource_name} in {time.perf_counter() - started:.0f}s")
 
 
 def delete(resource_id: str) -> None:
     """Deletes an existing deployment."""
     remote_app = agent_engines.get(resource_id)
     remote_app.delete(force=True)
+    ManifestStore(FLAGS.manifest_dir).forget(resource_id)
     print(f"Deleted remote app: {resource_id}")
 
 
@@ -73,14 +179,37 @@ def list_deployments() -> None:
     if not deployments:
         print("No deployments found.")
         return
+    store = ManifestStore(FLAGS.manifest_dir)
     print("Deployments:")
     for deployment in deployments:
-        print(f"- {deployment.resource_name}")
+        live = store.live(deployment.resource_name)
+        if live:
+            print(f"- {deployment.resource_name} (package {live['hash'][:12]}, {live['deployed_at']})")
+        else:
+            print(f"- {deployment.resource_name}")
+
+
+@functools.lru_cache(maxsize=None)
+def local_app():
+    """An in-process ``LocalApp``; imported here so the engine runtimes never load it."""
+    from deployment.local import LocalApp
+
+    return LocalApp(backend=FLAGS.model_backend)
+
+
+@functools.lru_cache(maxsize=None)
+def get_app(resource_id: str):
+    """The deployed engine, a router over SAARTHI_DEPLOYMENTS, or an in-process ``LocalApp``."""
+    if settings.RUNTIME == "local":
+        return local_app()
+    if resource_id == ROUTED:
+        return DeploymentRouter.from_resources(settings.DEPLOYMENTS, agent_engines.get)
+    return agent_engines.get(resource_id)
 
 
 def create_session(resource_id: str, user_id: str) -> None:
     """Creates a new session for the specified user."""
-    remote_app = agent_engines.get(resource_id)
+    remote_app = get_app(resource_id)
     remote_session = remote_app.create_session(user_id=user_id)
     print("Created session:")
     print(f"  Session ID: {remote_session['id']}")
@@ -92,7 +221,7 @@ def create_session(resource_id: str, user_id: str) -> None:
 
 def list_sessions(resource_id: str, user_id: str) -> None:
     """Lists all sessions for the specified user."""
-    remote_app = agent_engines.get(resource_id)
+    remote_app = get_app(resource_id)
     sessions = remote_app.list_sessions(user_id=user_id)
     print(f"Sessions for user '{user_id}':")
     for session in sessions:
@@ -101,7 +230,7 @@ def list_sessions(resource_id: str, user_id: str) -> None:
 
 def get_session(resource_id: str, user_id: str, session_id: str) -> None:
     """Gets a specific session."""
-    remote_app = agent_engines.get(resource_id)
+    remote_app = get_app(resource_id)
     session = remote_app.get_session(user_id=user_id, session_id=session_id)
     print("Session details:")
     print(f"  ID: {session['id']}")
@@ -112,19 +241,91 @@ def get_session(resource_id: str, user_id: str, session_id: str) -> None:
 
 def send_message(resource_id: str, user_id: str, session_id: str, message: str) -> None:
     """Sends a message to the deployed agent."""
-    remote_app = agent_engines.get(resource_id)
+    remote_app = get_app(resource_id)
 
     print(f"Sending message to session {session_id}:")
     print(f"Message: {message}")
     print("\nResponse:")
-    for event in remote_app.stream_query(
-        user_id=user_id,
-        session_id=session_id,
-        message=message,
-    ):
+    for event in query_events(remote_app, user_id, session_id, message, streaming_mode="none"):
         print(event)
 
 
+def read_records(path: str) -> list:
+    """The records of a --send_file input; every one needs a message."""
+    records = []
+    with open(path, encoding="utf-8") as handle:
+        for number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict) or not record.get("message"):
+                raise ValueError(f"{path}:{number}: expected an object with a message")
+            records.append(record)
+    return records
+
+
+def send_file(
+    resource_id: str,
+    user_id: str,
+    path: str,
+    results_path: str,
+    workers: int,
+    keep_sessions: bool = False,
+) -> None:
+    """Sends every record of a JSONL file and writes one JSONL result per record."""
+    remote_app = get_app(resource_id)
+    records = read_records(path)
+    print(f"Sending {len(records)} message(s) from {path} with {workers} worker(s)", file=sys.stderr)
+    out = sys.stdout if results_path == "-" else open(results_path, "w", encoding="utf-8")
+    results, started = [], time.perf_counter()
+    try:
+        for result in run_batch(
+            remote_app, records, user_id, workers, settings.RETRY_ATTEMPTS, default_scheduler(),
+            keep_sessions,
+        ):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            results.append(result)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(summarize(results, time.perf_counter() - started)), file=sys.stderr)
+
+
+def usage_report(resource_id: str, user_id: str, session_id: str = None) -> None:
+    """Prints token usage per agent, per session and for the user."""
+    remote_app = get_app(resource_id)
+    if session_id:
+        session_ids = [session_id]
+    else:
+        session_ids = [session["id"] for session in remote_app.list_sessions(user_id=user_id)]
+    ledger = UsageLedger()
+    for sid in session_ids:
+        session = remote_app.get_session(user_id=user_id, session_id=sid)
+        ledger.record_events(user_id, sid, session.get("events") or [])
+
+    columns = ("calls", "prompt_tokens", "candidates_tokens", "total_tokens", "cost_usd")
+    header = f"{'':>24} " + " ".join(f"{column:>18}" for column in columns)
+
+    def table(title, totals):
+        print(f"\n{title}")
+        print(header)
+        for key, usage in sorted(totals.items(), key=lambda item: -item[1].total_tokens):
+            row = usage.as_dict()
+            print(
+                f"{key[:24]:>24} "
+                + " ".join(
+                    f"{row[column]:>18.6f}" if isinstance(row[column], float) else f"{row[column]:>18}"
+                    for column in columns
+                )
+            )
+
+    print(f"Usage for user '{user_id}' across {len(session_ids)} session(s), model {settings.MODEL}:")
+    table("Per agent:", ledger.by_agent())
+    table("Per session:", ledger.by_session())
+    table("Per user:", ledger.by_user())
+
+
 def main(argv=None):
     """Main function that can be called directly or through app.run()."""
     # Parse flags first
@@ -145,8 +346,15 @@ def main(argv=None):
     location = FLAGS.location if FLAGS.location else os.getenv("GOOGLE_CLOUD_LOCATION")
     bucket = FLAGS.bucket if FLAGS.bucket else os.getenv("GOOGLE_CLOUD_STAGING_BUCKET")
     user_id = FLAGS.user_id
+    resource_id = FLAGS.resource_id
 
-    if not project_id:
+    if settings.RUNTIME == "local":
+        # Sessions only outlive this process when SAARTHI_SESSION_DB is set.
+        if FLAGS.create or FLAGS.deploy or FLAGS.delete or FLAGS.list:
+            print("--create, --deploy, --delete and --list manage deployments; unset SAARTHI_RUNTIME=local")
+            return
+        resource_id = resource_id or "local"
+    elif not project_id:
         print("Missing required environment variable: GOOGLE_CLOUD_PROJECT")
         return
     elif not location:
@@ -155,51 +363,69 @@ def main(argv=None):
     elif not bucket:
         print("Missing required environment variable: GOOGLE_CLOUD_STAGING_BUCKET")
         return
-
-    vertexai.init(
-        project=project_id,
-        location=location,
-        staging_bucket=bucket,
-    )
+    else:
+        vertexai.init(
+            project=project_id,
+            location=location,
+            staging_bucket=bucket,
+        )
+        if settings.DEPLOYMENTS and not resource_id and not (FLAGS.create or FLAGS.deploy or FLAGS.delete or FLAGS.list):
+            # Session commands without --resource_id go through the router.
+            resource_id = ROUTED
 
     if FLAGS.create:
         create()
+    elif FLAGS.deploy:
+        deploy(resource_id, FLAGS.force)
     elif FLAGS.delete:
-        if not FLAGS.resource_id:
+        if not resource_id:
             print("resource_id is required for delete")
             return
-        delete(FLAGS.resource_id)
+        delete(resource_id)
     elif FLAGS.list:
         list_deployments()
     elif FLAGS.create_session:
-        if not FLAGS.resource_id:
+        if not resource_id:
             print("resource_id is required for create_session")
             return
-        create_session(FLAGS.resource_id, user_id)
+        create_session(resource_id, user_id)
     elif FLAGS.list_sessions:
-        if not FLAGS.resource_id:
+        if not resource_id:
             print("resource_id is required for list_sessions")
             return
-        list_sessions(FLAGS.resource_id, user_id)
+        list_sessions(resource_id, user_id)
     elif FLAGS.get_session:
-        if not FLAGS.resource_id:
+        if not resource_id:
             print("resource_id is required for get_session")
             return
         if not FLAGS.session_id:
             print("session_id is required for get_session")
             return
-        get_session(FLAGS.resource_id, user_id, FLAGS.session_id)
+        get_session(resource_id, user_id, FLAGS.session_id)
     elif FLAGS.send:
-        if not FLAGS.resource_id:
+        if not resource_id:
             print("resource_id is required for send")
             return
         if not FLAGS.session_id:
             print("session_id is required for send")
             return
-        send_message(FLAGS.resource_id, user_id, FLAGS.session_id, FLAGS.message)
+        send_message(resource_id, user_id, FLAGS.session_id, FLAGS.message)
+    elif FLAGS.send_file:
+        if not resource_id:
+            print("resource_id is required for send_file")
+            return
+        send_file(
+            resource_id, user_id, FLAGS.send_file, FLAGS.results_file, FLAGS.workers,
+            FLAGS.keep_sessions,
+        )
+    elif FLAGS.usage:
+        if not resource_id:
+            print("resource_id is required for usage")
+            return
+        usage_report(resource_id, user_id, FLAGS.session_id)
     else:
         print(
-            "Please specify one of: --create, --delete, --list, --create_session, --list_sessions, --get_session, or --send"
+            "Please specify one of: --create, --deploy, --delete, --list, --create_session, --list_sessions, --get_session, --send, --send_file, or --usage"
         )
 
 
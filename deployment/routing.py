@@ -0,0 +1,387 @@
+"""Client-side routing across several Agent Engine deployments.
+
+``DeploymentRouter`` holds one app handle per deployment (a region, or a
+resource in it) and has the same ``create_session`` / ``get_session`` /
+``delete_session`` / ``list_sessions`` / ``stream_query`` surface, with
+``async_*`` variants, as ``agent_engines.get(...)``, so ``app.py``,
+``remote.py`` and the gateway use it unchanged.
+
+- every call to a target updates its EWMA latency (time to the first
+  event of a turn) and EWMA error rate; only rate limits, server errors and
+  connection failures count as errors, not a 404 or a bad request
+- a new session goes to the available target with the lowest latency,
+  weighted up by its error rate; targets without samples yet come first,
+  and ``explore`` of new sessions pick at random so recovered targets are
+  noticed
+- a session's turns stay on the target that created it: its id is returned
+  as ``"<target>:<session id>"``, so affinity needs no router state and
+  survives restarts, as long as the caller keeps the id it was last given
+- a target with ``ROUTER_EJECT_AFTER`` consecutive failures, or whose error
+  rate passes ``ROUTER_EJECT_ERROR_RATE``, is skipped for
+  ``ROUTER_COOLDOWN`` seconds and then tried again
+- a turn for a session on a skipped target, or whose target fails with a
+  retryable error before the first event, fails over: a new session is
+  created for the user on the best other target. The new session does not
+  have the old one's history, so the turn's first event carries its routed
+  id under ``custom_metadata["failover"]`` (``events.event_failover``): the
+  caller should switch to it, and can warn the user or replay the
+  conversation. The router maps the old id to the new session too, but only
+  in memory, until the process restarts.
+
+Deployments come from ``SAARTHI_DEPLOYMENTS``, e.g.
+``us=projects/p/locations/us-central1/reasoningEngines/1,eu=projects/p/locations/europe-west4/reasoningEngines/2``.
+``benchmarks/multi_region.py`` exercises the router against stub
+engines that are slow or failing.
+"""
+import logging
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from deployment.events import FAILOVER_METADATA_KEY, _aclose, _close
+from proto_1 import settings
+from proto_1.resilience import is_retryable
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = ":"
+
+
+def _counts_against(error: BaseException) -> bool:
+    """Whether an error says the target is unhealthy, rather than that the request was wrong."""
+    return isinstance(error, (ConnectionError, TimeoutError)) or is_retryable(error)
+
+
+class Target:
+    """One deployment and what the router has seen of it."""
+
+    def __init__(self, name: str, load: Callable[[], Any]):
+        self.name = name
+        self._load = load
+        self._app = None
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.sessions = 0
+        self.failovers = 0
+
+    @property
+    def app(self):
+        # Loaded on first use, so an unreachable region counts as a failure
+        # instead of failing the whole router.
+        if self._app is None:
+            self._app = self._load()
+        return self._app
+
+
+class DeploymentRouter:
+    """Routes sessions across deployments by latency and error rate."""
+
+    def __init__(
+        self,
+        targets: Dict[str, Any],
+        alpha: Optional[float] = None,
+        eject_after: Optional[int] = None,
+        eject_error_rate: Optional[float] = None,
+        cooldown: Optional[float] = None,
+        explore: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        seed: Optional[int] = None,
+    ):
+        """``targets`` maps names to app handles; see ``from_resources`` to load them lazily."""
+        self.targets = {
+            name: target if isinstance(target, Target) else Target(name, lambda app=target: app)
+            for name, target in targets.items()
+        }
+        if not self.targets:
+            raise ValueError("DeploymentRouter needs at least one target")
+        self.alpha = settings.ROUTER_ALPHA if alpha is None else alpha
+        self.eject_after = settings.ROUTER_EJECT_AFTER if eject_after is None else eject_after
+        self.eject_error_rate = (
+            settings.ROUTER_EJECT_ERROR_RATE if eject_error_rate is None else eject_error_rate
+        )
+        self.cooldown = settings.ROUTER_COOLDOWN if cooldown is None else cooldown
+        self.explore = settings.ROUTER_EXPLORE if explore is None else explore
+        self.clock = clock
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # Routed session id -> (target name, session id) after a failover.
+        self._moved: Dict[str, Tuple[str, str]] = {}
+
+    @classmethod
+    def from_resources(cls, resources: Dict[str, str], get: Callable[[str], Any], **options):
+        """A router over resource names, each fetched with ``get`` (e.g. ``agent_engines.get``) on first use."""
+        return cls(
+            {name: Target(name, lambda resource=resource: get(resource)) for name, resource in resources.items()},
+            **options,
+        )
+
+    # -- health ------------------------------------------------------------
+
+    def _available(self, target: Target) -> bool:
+        return target.ejected_until <= self.clock()
+
+    def _record(self, target: Target, latency: Optional[float] = None, error: bool = False) -> None:
+        with self._lock:
+            target.samples += 1
+            target.error_rate += self.alpha * (float(error) - target.error_rate)
+            if error:
+                target.failures += 1
+                unhealthy = target.failures >= self.eject_after or (
+                    target.samples >= self.eject_after and target.error_rate > self.eject_error_rate
+                )
+                if unhealthy and self._available(target):
+                    target.ejected_until = self.clock() + self.cooldown
+                    logger.warning(
+                        "Skipping deployment %s for %.0fs (error rate %.2f, %d failures in a row)",
+                        target.name, self.cooldown, target.error_rate, target.failures,
+                    )
+                return
+            target.failures = 0
+            target.ejected_until = 0.0
+            if latency is not None:
+                target.latency = latency if target.latency is None else (
+                    target.latency + self.alpha * (latency - target.latency)
+                )
+
+    def _failed(self, target: Target, error: BaseException) -> None:
+        if _counts_against(error):
+            self._record(target, error=True)
+
+    def _score(self, target: Target) -> float:
+        return (target.latency or 0.0) * (1.0 + 4.0 * target.error_rate)
+
+    def _choose(self, exclude: Optional[str] = None) -> Target:
+        """The target for a new session."""
+        with self._lock:
+            candidates = [target for name, target in self.targets.items() if name != exclude] or list(
+                self.targets.values()
+            )
+            available = [target for target in candidates if self._available(target)]
+            if not available:
+                # Everything is cooling down: use whichever comes back first.
+                return min(candidates, key=lambda target: target.ejected_until)
+            if len(available) > 1 and self._rng.random() < self.explore:
+                return self._rng.choice(available)
+            return min(available, key=self._score)
+
+    # -- session ids -------------------------------------------------------
+
+    def _routed_id(self, target: Target, session_id: str) -> str:
+        return f"{target.name}{SEPARATOR}{session_id}"
+
+    def _resolve(self, session_id: str) -> Tuple[Target, str]:
+        """The target and engine session id behind a routed session id."""
+        with self._lock:
+            moved = self._moved.get(session_id)
+        if moved:
+            return self.targets[moved[0]], moved[1]
+        name, separator, raw = session_id.partition(SEPARATOR)
+        if separator and name in self.targets:
+            return self.targets[name], raw
+        raise KeyError(f"Session not found: {session_id}")
+
+    def _mark_moved(self, event, session_id: str, target: Target, raw: str):
+        """Adds the new routed id to ``event`` when ``session_id`` now lives elsewhere."""
+        routed = self._routed_id(target, raw)
+        if routed == session_id or not isinstance(event, dict):
+            return event
+        metadata = {
+            **(event.get("custom_metadata") or {}),
+            FAILOVER_METADATA_KEY: {"session_id": routed, "target": target.name},
+        }
+        return {**event, "custom_metadata": metadata}
+
+    def _session_dict(self, target: Target, session: dict, session_id: Optional[str] = None) -> dict:
+        return {**session, "id": session_id or self._routed_id(target, session["id"])}
+
+    # -- sessions ----------------------------------------------------------
+
+    def _create_on(self, target: Target, user_id: str) -> dict:
+        started = self.clock()
+        try:
+            session = target.app.create_session(user_id=user_id)
+        except Exception as error:
+            self._failed(target, error)
+            raise
+        self._record(target)
+        with self._lock:
+            target.sessions += 1
+        logger.debug("Session for %s on %s in %.3fs", user_id, target.name, self.clock() - started)
+        return session
+
+    def create_session(self, user_id: str) -> dict:
+        target = self._choose()
+        try:
+            session = self._create_on(target, user_id)
+        except Exception as error:
+            if not is_retryable(error) or len(self.targets) == 1:
+                raise
+            target = self._choose(exclude=target.name)
+            session = self._create_on(target, user_id)
+        return self._session_dict(target, session)
+
+    def get_session(self, user_id: str, session_id: str) -> dict:
+        target, raw = self._resolve(session_id)
+        return self._session_dict(target, target.app.get_session(user_id=user_id, session_id=raw), session_id)
+
+    def delete_session(self, user_id: str, session_id: str) -> None:
+        target, raw = self._resolve(session_id)
+        target.app.delete_session(user_id=user_id, session_id=raw)
+        with self._lock:
+            self._moved.pop(session_id, None)
+
+    def list_sessions(self, user_id: str) -> List[dict]:
+        sessions = []
+        for target in self.targets.values():
+            try:
+                listed = target.app.list_sessions(user_id=user_id)
+            except Exception:
+                logger.warning("Could not list sessions on %s", target.name, exc_info=True)
+                continue
+            sessions += [self._session_dict(target, session) for session in listed]
+        return sessions
+
+    def _fail_over(self, user_id: str, session_id: str, failed: Target) -> Tuple[Target, str]:
+        """Moves a session to a new one on another target."""
+        target = self._choose(exclude=failed.name)
+        session = self._create_on(target, user_id)
+        with self._lock:
+            self._moved[session_id] = (target.name, session["id"])
+            failed.failovers += 1
+        logger.warning("Session %s moved from %s to %s", session_id, failed.name, target.name)
+        return target, session["id"]
+
+    # -- turns -------------------------------------------------------------
+
+    def _open(self, user_id: str, session_id: str) -> Tuple[Target, str]:
+        target, raw = self._resolve(session_id)
+        if not self._available(target) and len(self.targets) > 1:
+            target, raw = self._fail_over(user_id, session_id, target)
+        return target, raw
+
+    def stream_query(self, user_id: str, session_id: str, message: str, **kwargs) -> Iterator[dict]:
+        target, raw = self._open(user_id, session_id)
+        for attempt in range(2):
+            started = self.clock()
+            events = None
+            try:
+                events = target.app.stream_query(user_id=user_id, session_id=raw, message=message, **kwargs)
+                iterator = iter(events)
+                first = next(iterator, None)
+            except Exception as error:
+                _close(events)
+                self._failed(target, error)
+                if attempt or not is_retryable(error) or len(self.targets) == 1:
+                    raise
+                target, raw = self._fail_over(user_id, session_id, target)
+                continue
+            self._record(target, latency=self.clock() - started)
+            try:
+                if first is not None:
+                    yield self._mark_moved(first, session_id, target, raw)
+                    yield from iterator
+            except Exception as error:
+                self._failed(target, error)
+                raise
+            finally:
+                _close(events)
+            return
+
+    # -- async -------------------------------------------------------------
+
+    async def async_create_session(self, user_id: str) -> dict:
+        target = self._choose()
+        try:
+            session = await self._async_create_on(target, user_id)
+        except Exception as error:
+            if not is_retryable(error) or len(self.targets) == 1:
+                raise
+            target = self._choose(exclude=target.name)
+            session = await self._async_create_on(target, user_id)
+        return self._session_dict(target, session)
+
+    async def _async_create_on(self, target: Target, user_id: str) -> dict:
+        try:
+            session = await target.app.async_create_session(user_id=user_id)
+        except Exception as error:
+            self._failed(target, error)
+            raise
+        self._record(target)
+        with self._lock:
+            target.sessions += 1
+        return session
+
+    async def async_get_session(self, user_id: str, session_id: str) -> dict:
+        target, raw = self._resolve(session_id)
+        session = await target.app.async_get_session(user_id=user_id, session_id=raw)
+        return self._session_dict(target, session, session_id)
+
+    async def async_delete_session(self, user_id: str, session_id: str) -> None:
+        target, raw = self._resolve(session_id)
+        await target.app.async_delete_session(user_id=user_id, session_id=raw)
+        with self._lock:
+            self._moved.pop(session_id, None)
+
+    async def _async_fail_over(self, user_id: str, session_id: str, failed: Target) -> Tuple[Target, str]:
+        target = self._choose(exclude=failed.name)
+        session = await self._async_create_on(target, user_id)
+        with self._lock:
+            self._moved[session_id] = (target.name, session["id"])
+            failed.failovers += 1
+        logger.warning("Session %s moved from %s to %s", session_id, failed.name, target.name)
+        return target, session["id"]
+
+    async def async_stream_query(self, user_id: str, session_id: str, message: str, **kwargs) -> AsyncIterator[dict]:
+        target, raw = self._resolve(session_id)
+        if not self._available(target) and len(self.targets) > 1:
+            target, raw = await self._async_fail_over(user_id, session_id, target)
+        for attempt in range(2):
+            started = self.clock()
+            events = None
+            try:
+                events = target.app.async_stream_query(
+                    user_id=user_id, session_id=raw, message=message, **kwargs
+                )
+                iterator = aiter(events)
+                first = await anext(iterator, None)
+            except Exception as error:
+                await _aclose(events)
+                self._failed(target, error)
+                if attempt or not is_retryable(error) or len(self.targets) == 1:
+                    raise
+                target, raw = await self._async_fail_over(user_id, session_id, target)
+                continue
+            self._record(target, latency=self.clock() - started)
+            try:
+                if first is not None:
+                    yield self._mark_moved(first, session_id, target, raw)
+                    async for event in iterator:
+                        yield event
+            except Exception as error:
+                self._failed(target, error)
+                raise
+            finally:
+                await _aclose(events)
+            return
+
+    # -- metrics -----------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        now = self.clock()
+        with self._lock:
+            return {
+                name: {
+                    "latency_s": round(target.latency, 4) if target.latency is not None else None,
+                    "error_rate": round(target.error_rate, 4),
+                    "samples": target.samples,
+                    "sessions": target.sessions,
+                    "failovers": target.failovers,
+                    "ejected_for_s": round(max(0.0, target.ejected_until - now), 1),
+                }
+                for name, target in self.targets.items()
+            }
+
@@ -0,0 +1,371 @@
+"""Shared admission control for outbound ``stream_query`` calls.
+
+Every turn sent from this process, whether from a Streamlit session in
+``app.py`` or from ``deployment.gateway``, asks one ``Scheduler`` for a slot
+first. Slots are paced by a token bucket per quota dimension (``turns`` for
+the engine, a model name for its per-model quota, ...), so bursts queue here
+instead of coming back as 429s and degrading everyone equally.
+
+- waiting turns form one bounded queue, served by priority class and then
+  in arrival order; once it is full new turns are refused with
+  ``QueueFull`` (backpressure the UI shows as "busy, try again")
+- messages the crisis lexicon flags, or whose local intent is a safety
+  intent such as ``crisis_help``, are ``CRISIS`` priority: they go ahead of
+  every waiting turn and are never refused for a full queue
+- a turn still waiting after ``max_wait`` seconds gives up with
+  ``QueueTimeout``; one abandoned while waiting (an exception from
+  ``on_wait``, a closed or cancelled ``queued``) leaves the queue, so no
+  slot is ever granted to a turn nobody will send
+
+``snapshot()`` reports queue depth, wait-time percentiles and outcome counts
+per priority class; the gateway serves it at ``/metrics`` and Debug Mode in
+``app.py`` shows it.
+
+Rates come from ``SAARTHI_RATE_LIMITS`` (units per minute per dimension) and
+``SAARTHI_RATE_COSTS`` (units one turn takes from a dimension, default 1);
+with no limits configured every turn is admitted at once.
+"""
+import asyncio
+import functools
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter, deque
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from proto_1 import settings
+from proto_1.cascade import SAFETY_INTENTS, intent_payloads
+from proto_1.crisis import assess
+
+CRISIS, INTERACTIVE, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {CRISIS: "crisis", INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class QueueFull(Exception):
+    """The queue is at capacity. Carries 429 so callers treat it like quota.
+
+    ``retry_after`` is how long the queue would take to drain at the
+    configured rates.
+    """
+
+    code = 429
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueTimeout(Exception):
+    """A turn waited longer than the scheduler's ``max_wait``."""
+
+    code = 503
+
+
+def priority_for(message: str) -> int:
+    """``CRISIS`` for messages the local screens flag, else ``INTERACTIVE``."""
+    if assess(message).is_crisis:
+        return CRISIS
+    payload, _ = intent_payloads([message])[0]
+    if payload["primary_intent"] in SAFETY_INTENTS:
+        return CRISIS
+    return INTERACTIVE
+
+
+class TokenBucket:
+    """``rate`` units per second, banking at most ``burst`` units. Not thread-safe."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, cost: float = 1.0) -> bool:
+        self._refill()
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+    def eta(self, cost: float = 1.0) -> float:
+        """Seconds until ``cost`` units are available."""
+        self._refill()
+        return max(0.0, (cost - self.tokens) / self.rate)
+
+
+class Ticket:
+    """A turn's place in the queue."""
+
+    def __init__(self, scheduler: "Scheduler", priority: int, costs: Dict[str, float]):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.costs = costs
+        self.seq = next(scheduler._order)
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.cancelled = False
+        self._granted = threading.Event()
+        self._callbacks = []
+
+    @property
+    def granted(self) -> bool:
+        return self._granted.is_set()
+
+    @property
+    def waited(self) -> float:
+        return (self.granted_at or time.monotonic()) - self.enqueued_at
+
+    def _grant(self) -> None:
+        self.granted_at = time.monotonic()
+        self._granted.set()
+        for callback in self._callbacks:
+            callback()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until granted or ``timeout``; True when granted."""
+        return self._granted.wait(timeout)
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        """``wait`` for callers on an event loop."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self.scheduler._lock:
+            if self.granted:
+                return True
+            self._callbacks.append(wake)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self.granted
+        finally:
+            with self.scheduler._lock:
+                if wake in self._callbacks:
+                    self._callbacks.remove(wake)
+
+    def cancel(self) -> bool:
+        """Leaves the queue; False when the slot was already granted or given up."""
+        return self.scheduler._cancel(self)
+
+
+class Scheduler:
+    """Priority queue in front of token buckets, shared by threads and event loops."""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, float]] = None,
+        costs: Optional[Dict[str, float]] = None,
+        burst_seconds: float = 1.0,
+        max_queue: int = 100,
+        max_wait: float = 30.0,
+    ):
+        # limits: units per second per dimension.
+        self.buckets = {
+            name: TokenBucket(rate, max(rate * burst_seconds, (costs or {}).get(name, 1.0)))
+            for name, rate in (limits or {}).items()
+        }
+        self.costs = {name: (costs or {}).get(name, 1.0) for name in self.buckets}
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._queue = []
+        self._order = itertools.count()
+        self._waits = {priority: deque(maxlen=1000) for priority in PRIORITY_NAMES}
+        self._peak_depth = 0
+        self.stats: Counter = Counter()
+        self._dispatcher = None
+
+    # -- admission ---------------------------------------------------------
+
+    def _affordable(self, costs) -> bool:
+        return all(self.buckets[name].tokens >= cost for name, cost in costs.items())
+
+    def _try_take(self, costs) -> bool:
+        for name in costs:
+            self.buckets[name]._refill()
+        if not self._affordable(costs):
+            return False
+        for name, cost in costs.items():
+            self.buckets[name].tokens -= cost
+        return True
+
+    def _admit(self, ticket: Ticket) -> None:
+        name = PRIORITY_NAMES[ticket.priority]
+        self.stats[f"{name}.admitted"] += 1
+        ticket._grant()
+        self._waits[ticket.priority].append(ticket.waited)
+
+    def submit(self, priority: int = INTERACTIVE) -> Ticket:
+        """Queues a turn; the returned ticket is granted once quota allows.
+
+        Raises ``QueueFull`` for non-crisis turns when ``max_queue`` turns are
+        already waiting.
+        """
+        ticket = Ticket(self, priority, dict(self.costs))
+        name = PRIORITY_NAMES[priority]
+        with self._lock:
+            self.stats[f"{name}.submitted"] += 1
+            if not self._queue and self._try_take(ticket.costs):
+                self._admit(ticket)
+                return ticket
+            if priority != CRISIS and len(self._queue) >= self.max_queue:
+                self.stats[f"{name}.rejected"] += 1
+                raise QueueFull(f"{len(self._queue)} turns already waiting", self._drain_eta())
+            heapq.heappush(self._queue, (priority, ticket.seq, ticket))
+            self._peak_depth = max(self._peak_depth, len(self._queue))
+            self._start_dispatcher()
+            self._wake.notify()
+        return ticket
+
+    def _drain_eta(self) -> float:
+        """Seconds until the buckets have paid for every queued turn. Call with the lock held."""
+        turns = len(self._queue) + 1
+        return max(
+            (bucket.eta(turns * self.costs[name]) for name, bucket in self.buckets.items()),
+            default=0.0,
+        )
+
+    def _cancel(self, ticket: Ticket) -> bool:
+        with self._lock:
+            if ticket.granted or ticket.cancelled:
+                return False
+            ticket.cancelled = True
+            self._queue = [entry for entry in self._queue if entry[2] is not ticket]
+            heapq.heapify(self._queue)
+            self.stats[f"{PRIORITY_NAMES[ticket.priority]}.cancelled"] += 1
+            self._wake.notify()
+            return True
+
+    def _start_dispatcher(self) -> None:
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(
+                target=self._dispatch, name="saarthi-scheduler", daemon=True
+            )
+            self._dispatcher.start()
+
+    def _dispatch(self) -> None:
+        """Grants queued tickets in order as the buckets refill."""
+        with self._lock:
+            while True:
+                if not self._queue:
+                    self._wake.wait()
+                    continue
+                _, _, ticket = self._queue[0]
+                if self._try_take(ticket.costs):
+                    heapq.heappop(self._queue)
+                    self._admit(ticket)
+                    continue
+                # Strict priority: nothing overtakes the head, so a crisis
+                # turn is never starved by cheaper turns behind it.
+                self._wake.wait(
+                    max(self.buckets[name].eta(cost) for name, cost in ticket.costs.items())
+                )
+
+    def position(self, ticket: Ticket) -> int:
+        """Turns ahead of ``ticket`` in the queue; 0 once granted."""
+        with self._lock:
+            if ticket.granted:
+                return 0
+            key = (ticket.priority, ticket.seq)
+            return sum(1 for priority, seq, _ in self._queue if (priority, seq) < key)
+
+    # -- waiting -----------------------------------------------------------
+
+    def _give_up(self, ticket: Ticket) -> None:
+        if ticket.cancel():
+            self.stats[f"{PRIORITY_NAMES[ticket.priority]}.timed_out"] += 1
+            raise QueueTimeout(f"no slot within {self.max_wait:.0f}s")
+
+    def acquire(
+        self,
+        priority: int = INTERACTIVE,
+        on_wait: Optional[Callable[[int, float], None]] = None,
+        interval: float = 0.5,
+    ) -> Ticket:
+        """Blocks until a slot is granted, calling ``on_wait(position, waited_s)`` meanwhile."""
+        ticket = self.submit(priority)
+        try:
+            while not ticket.wait(interval):
+                if ticket.waited > self.max_wait:
+                    self._give_up(ticket)
+                    break
+                if on_wait:
+                    on_wait(self.position(ticket), ticket.waited)
+        finally:
+            if not ticket.granted:
+                ticket.cancel()
+        return ticket
+
+    async def queued(
+        self, priority: int = INTERACTIVE, interval: float = 0.5, ticket: Optional[Ticket] = None
+    ) -> AsyncIterator[dict]:
+        """Waits for a slot on an event loop, yielding ``{"position", "waited_s"}`` meanwhile.
+
+        Waits on ``ticket`` when the caller already called ``submit``.
+        """
+        ticket = ticket or self.submit(priority)
+        try:
+            while not await ticket.wait_async(interval):
+                if ticket.waited > self.max_wait:
+                    self._give_up(ticket)
+                    break
+                yield {"position": self.position(ticket), "waited_s": round(ticket.waited, 3)}
+        finally:
+            # Also on aclose(), e.g. an SSE client that disconnected while queued.
+            if not ticket.granted:
+                ticket.cancel()
+
+    # -- metrics -----------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            depth = Counter(PRIORITY_NAMES[priority] for priority, _, _ in self._queue)
+            waits = {
+                PRIORITY_NAMES[priority]: _percentiles(values)
+                for priority, values in self._waits.items()
+                if values
+            }
+            return {
+                "queue_depth": len(self._queue),
+                "queue_depth_by_priority": dict(depth),
+                "peak_queue_depth": self._peak_depth,
+                "max_queue": self.max_queue,
+                "wait_s": waits,
+                "tokens": {name: round(bucket.tokens, 2) for name, bucket in self.buckets.items()},
+                "counts": dict(self.stats),
+            }
+
+
+def _percentiles(values) -> dict:
+    ordered = sorted(values)
+
+    def at(pct):
+        return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 4)
+
+    return {"p50": at(50), "p95": at(95), "max": round(ordered[-1], 4)}
+
+
+@functools.lru_cache(maxsize=None)
+def default_scheduler() -> Scheduler:
+    """The process-wide scheduler configured from ``settings``."""
+    return Scheduler(
+        limits={
+            name: per_minute / 60.0 for name, per_minute in settings.RATE_LIMITS.items() if per_minute > 0
+        },
+        costs=settings.RATE_COSTS,
+        burst_seconds=settings.RATE_BURST_SECONDS,
+        max_queue=settings.SCHEDULER_MAX_QUEUE,
+        max_wait=settings.SCHEDULER_MAX_WAIT,
+    )
@@ -0,0 +1,181 @@
+"""Pre-created sessions, so starting a conversation never waits on ``create_session``.
+
+``SessionPool`` keeps ``size`` sessions ready for new visitors, each under a
+fresh user id, and after a user takes a session it prepares ``spares`` more
+for that user so "Start New Session" is instant too. ``take()`` hands one
+out at once and a background thread refills the pool. Sessions left unused
+for ``ttl`` seconds are deleted (where the app supports ``delete_session``)
+and, for the shared pool, replaced. A ``take()`` that finds nothing ready
+creates the session on the spot, as before.
+
+``app.py`` keeps one pool per connection, i.e. per resource.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple
+
+from proto_1 import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before trying again after create_session failed.
+_RETRY_AFTER = 5.0
+
+# The refill thread has nothing to create.
+_IDLE = object()
+
+
+@dataclass
+class PooledSession:
+    user_id: str
+    session_id: str
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class SessionPool:
+    """Sessions created ahead of time for one app handle."""
+
+    def __init__(
+        self,
+        remote_app,
+        size: Optional[int] = None,
+        spares: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        self.remote_app = remote_app
+        self.size = settings.SESSION_POOL_SIZE if size is None else size
+        self.spares = settings.SESSION_POOL_SPARES if spares is None else spares
+        self.ttl = settings.SESSION_POOL_TTL if ttl is None else ttl
+        self.stats: Counter = Counter()
+        self._ready: Deque[PooledSession] = deque()
+        # user_id -> sessions prepared for that user's next "Start New Session".
+        self._by_user: Dict[str, Deque[PooledSession]] = {}
+        # Users owed spare sessions, and creations in progress per user (None: shared pool).
+        self._owed: Counter = Counter()
+        self._creating: Counter = Counter()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._thread = threading.Thread(target=self._refill, name="saarthi-session-pool", daemon=True)
+        self._thread.start()
+
+    def take(self, user_id: Optional[str] = None, create: bool = True) -> Optional[Tuple[str, str]]:
+        """Returns ``(user_id, session_id)``: a ready session, or a new one if none is.
+
+        Without ``user_id`` the session comes from the shared pool and brings
+        its own user id; with it, from the spares prepared for that user.
+        With ``create=False`` a miss returns None instead of calling the app.
+        """
+        with self._lock:
+            ready = self._ready if user_id is None else self._by_user.get(user_id)
+            pooled = ready.popleft() if ready else None
+            if user_id is not None and ready is not None and not ready:
+                del self._by_user[user_id]
+            # Lets the refill thread top the shared pool back up.
+            self._wake.notify()
+        if pooled is None:
+            if not create:
+                return None
+            self.stats["miss"] += 1
+            pooled = self._create(user_id or str(uuid.uuid4()))
+        else:
+            self.stats["hit"] += 1
+        with self._lock:
+            owed = self.spares - len(self._by_user.get(pooled.user_id, ())) - self._creating[pooled.user_id]
+            if owed > 0:
+                self._owed[pooled.user_id] = owed
+                self._wake.notify()
+        return pooled.user_id, pooled.session_id
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ready": len(self._ready),
+                "spares": sum(len(sessions) for sessions in self._by_user.values()),
+                **self.stats,
+            }
+
+    def close(self) -> None:
+        """Stops refilling; sessions already created are left as they are."""
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+
+    def _create(self, user_id: str) -> PooledSession:
+        session = self.remote_app.create_session(user_id=user_id)
+        self.stats["created"] += 1
+        return PooledSession(user_id, session["id"])
+
+    def _delete(self, pooled: PooledSession) -> None:
+        self.stats["expired"] += 1
+        delete = getattr(self.remote_app, "delete_session", None)
+        if delete is None:
+            return
+        try:
+            delete(user_id=pooled.user_id, session_id=pooled.session_id)
+        except Exception:
+            logger.warning("Could not delete expired session %s", pooled.session_id, exc_info=True)
+
+    def _expired(self) -> list:
+        """Removes and returns sessions older than ``ttl``. Call with the lock held."""
+        cutoff = time.monotonic() - self.ttl
+        stale = [pooled for pooled in self._ready if pooled.created_at < cutoff]
+        self._ready = deque(pooled for pooled in self._ready if pooled.created_at >= cutoff)
+        for user_id in list(self._by_user):
+            sessions = self._by_user[user_id]
+            stale += [pooled for pooled in sessions if pooled.created_at < cutoff]
+            kept = deque(pooled for pooled in sessions if pooled.created_at >= cutoff)
+            if kept:
+                self._by_user[user_id] = kept
+            else:
+                del self._by_user[user_id]
+        return stale
+
+    def _next_job(self):
+        """The user id to create a session for (None for the shared pool), or ``_IDLE``."""
+        if len(self._ready) + self._creating[None] < self.size:
+            return None
+        return next(iter(self._owed), _IDLE)
+
+    def _refill(self) -> None:
+        while True:
+            with self._lock:
+                while True:
+                    if self._closed:
+                        return
+                    stale = self._expired()
+                    job = self._next_job()
+                    if stale or job is not _IDLE:
+                        break
+                    self._wake.wait(self.ttl / 4)
+                if job is not _IDLE:
+                    self._creating[job] += 1
+                if job is not _IDLE and job is not None:
+                    self._owed[job] -= 1
+                    if self._owed[job] <= 0:
+                        del self._owed[job]
+            for pooled in stale:
+                self._delete(pooled)
+            if job is _IDLE:
+                continue
+            try:
+                pooled = self._create(job or str(uuid.uuid4()))
+            except Exception:
+                logger.warning("Could not pre-create a session", exc_info=True)
+                self.stats["errors"] += 1
+                with self._lock:
+                    self._creating[job] -= 1
+                    if job:
+                        self._owed[job] += 1
+                    self._wake.wait(_RETRY_AFTER)
+                continue
+            with self._lock:
+                self._creating[job] -= 1
+                if job:
+                    self._by_user.setdefault(job, deque()).append(pooled)
+                else:
+                    self._ready.append(pooled)
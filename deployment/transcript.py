@@ -0,0 +1,126 @@
+"""Chat history with a bounded in-memory window.
+
+``app.py`` used to keep every message of a conversation in
+``st.session_state`` and draw all of them on every rerun, so a session's
+memory and the cost of each click grew with its length. A ``Transcript``
+keeps only the newest ``window`` messages in memory and moves older ones to
+a ``TranscriptStore``: one SQLite file per process, rows keyed by transcript
+id and position, from which ``slice`` reads them back when the user pages
+up. A transcript's rows are deleted when it is cleared or garbage collected
+along with its Streamlit session.
+
+The file holds users' conversations, so it is created readable by its owner
+only, by default in a private ``mkdtemp`` directory that is removed when the
+store is closed or the process exits.
+"""
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import deque
+from typing import Deque, Iterable, List, Optional, Tuple
+
+from proto_1 import settings
+
+
+def _close(db: sqlite3.Connection, directory: Optional[str]) -> None:
+    db.close()
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TranscriptStore:
+    """Spilled messages of every transcript in the process; safe to share between threads."""
+
+    def __init__(self, path: Optional[str] = None):
+        path = path or settings.TRANSCRIPT_PATH
+        # Only a directory the store made itself is removed on close.
+        directory = None if path else tempfile.mkdtemp(prefix="saarthi-transcripts-")
+        self.path = path or os.path.join(directory, "transcripts.sqlite3")
+        # Owner-only from the start; SQLite gives its journal files the same mode.
+        os.close(os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o600))
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._finalizer = weakref.finalize(self, _close, self._db, directory)
+        # WAL with NORMAL sync never corrupts the file and spares an fsync per spill.
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " transcript TEXT, seq INTEGER, body TEXT, PRIMARY KEY (transcript, seq)"
+            ") WITHOUT ROWID"
+        )
+
+    def put(self, transcript_id: str, rows: Iterable[Tuple[int, dict]]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?)",
+                [
+                    (transcript_id, seq, json.dumps(message, separators=(",", ":")))
+                    for seq, message in rows
+                ],
+            )
+
+    def get(self, transcript_id: str, start: int, stop: int) -> List[dict]:
+        """Messages ``start`` (inclusive) to ``stop`` (exclusive), in order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT body FROM messages WHERE transcript = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (transcript_id, start, stop),
+            ).fetchall()
+        return [json.loads(body) for body, in rows]
+
+    def delete(self, transcript_id: str) -> None:
+        with self._lock:
+            if self._finalizer.alive:
+                self._db.execute("DELETE FROM messages WHERE transcript = ?", (transcript_id,))
+
+    def close(self) -> None:
+        """Closes the database and removes the private directory it was created in."""
+        with self._lock:
+            self._finalizer()
+
+
+class Transcript:
+    """One conversation's messages; the newest ``window`` stay in memory."""
+
+    def __init__(self, store: TranscriptStore, window: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.store = store
+        self.window = max(1, settings.TRANSCRIPT_WINDOW if window is None else window)
+        self._recent: Deque[dict] = deque()
+        # Messages already moved to the store; they are the first ``_spilled``.
+        self._spilled = 0
+        weakref.finalize(self, store.delete, self.id)
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._recent)
+
+    def append(self, message: dict) -> None:
+        self._recent.append(message)
+        overflow = len(self._recent) - self.window
+        if overflow > 0:
+            self.store.put(
+                self.id, [(self._spilled + offset, self._recent.popleft()) for offset in range(overflow)]
+            )
+            self._spilled += overflow
+
+    def slice(self, start: int, stop: Optional[int] = None) -> List[dict]:
+        """Messages ``start`` to ``stop`` (default: the end), reading spilled ones back."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        start = max(0, start)
+        older = self.store.get(self.id, start, min(stop, self._spilled)) if start < self._spilled else []
+        recent = itertools.islice(
+            self._recent, max(0, start - self._spilled), max(0, stop - self._spilled)
+        )
+        return older + list(recent)
+
+    def clear(self) -> None:
+        self._recent.clear()
+        self._spilled = 0
+        self.store.delete(self.id)
@@ -0,0 +1,136 @@
+"""Token and cost accounting over the event dicts returned by ``stream_query``.
+
+Every model-backed event carries ``usage_metadata``; this module attributes
+it to the authoring agent (``entity``, ``intent``, ``tone``, ``context_agent``
+in fused mode, ``output_agent``) and rolls it up per session and per user.
+Intent and tone turns answered by the local cascade carry no usage and cost
+nothing, so they simply do not appear.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from proto_1 import settings
+
+# custom_metadata key under which proto_1.tracing copies each call's usage;
+# session services persist custom_metadata but drop usage_metadata.
+USAGE_METADATA_KEY = "usage"
+
+# USD per million (prompt, output) tokens, standard paid tier.
+PRICES_PER_MILLION = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+
+@dataclass
+class Usage:
+    """Token counts for one or more model calls."""
+
+    calls: int = 0
+    prompt_tokens: int = 0
+    candidates_tokens: int = 0
+    total_tokens: int = 0
+
+    def add(self, other: "Usage") -> "Usage":
+        self.calls += other.calls
+        self.prompt_tokens += other.prompt_tokens
+        self.candidates_tokens += other.candidates_tokens
+        self.total_tokens += other.total_tokens
+        return self
+
+    def cost(self, model: Optional[str] = None) -> float:
+        """Estimated USD cost; 0.0 for models missing from the price table."""
+        prompt_price, output_price = PRICES_PER_MILLION.get(model or settings.MODEL, (0.0, 0.0))
+        return (self.prompt_tokens * prompt_price + self.candidates_tokens * output_price) / 1e6
+
+    def as_dict(self, model: Optional[str] = None) -> dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "candidates_tokens": self.candidates_tokens,
+            "total_tokens": self.total_tokens,
+            "cost_usd": round(self.cost(model), 6),
+        }
+
+
+def event_usage(event: dict) -> Optional[Usage]:
+    """Usage of the model call behind an event, if it reports any.
+
+    Streamed partial chunks are skipped: the final aggregated event repeats
+    the call's usage, and counting both would double it.
+    """
+    if event.get("partial"):
+        return None
+    # Live events carry usage_metadata; stored session events only keep the
+    # copy the tracing plugin puts in custom_metadata.
+    metadata = event.get("usage_metadata") or (event.get("custom_metadata") or {}).get(
+        USAGE_METADATA_KEY
+    )
+    if not metadata:
+        return None
+    prompt = metadata.get("prompt_token_count") or 0
+    candidates = metadata.get("candidates_token_count") or 0
+    return Usage(
+        calls=1,
+        prompt_tokens=prompt,
+        candidates_tokens=candidates,
+        total_tokens=metadata.get("total_token_count") or prompt + candidates,
+    )
+
+
+def usage_by_agent(events: Iterable[dict]) -> Dict[str, Usage]:
+    """Sums the usage of ``events`` per authoring agent."""
+    totals: Dict[str, Usage] = defaultdict(Usage)
+    for event in events:
+        usage = event_usage(event)
+        if usage:
+            totals[event.get("author", "unknown")].add(usage)
+    return dict(totals)
+
+
+class UsageLedger:
+    """Usage keyed by ``(user_id, session_id, agent)`` with roll-ups."""
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str, str], Usage] = defaultdict(Usage)
+
+    def record(self, user_id: str, session_id: str, agent: str, usage: Usage) -> None:
+        self._entries[(user_id, session_id, agent)].add(usage)
+
+    def record_events(self, user_id: str, session_id: str, events: Iterable[dict]) -> None:
+        for agent, usage in usage_by_agent(events).items():
+            self.record(user_id, session_id, agent, usage)
+
+    def _rollup(self, key) -> Dict[str, Usage]:
+        totals: Dict[str, Usage] = defaultdict(Usage)
+        for entry, usage in self._entries.items():
+            totals[key(entry)].add(usage)
+        return dict(totals)
+
+    def by_agent(self) -> Dict[str, Usage]:
+        return self._rollup(lambda entry: entry[2])
+
+    def by_session(self) -> Dict[str, Usage]:
+        return self._rollup(lambda entry: entry[1])
+
+    def by_user(self) -> Dict[str, Usage]:
+        return self._rollup(lambda entry: entry[0])
+
+    def total(self) -> Usage:
+        total = Usage()
+        for usage in self._entries.values():
+            total.add(usage)
+        return total
+
+    def rows(self) -> List[dict]:
+        """One row per (user, session, agent), heaviest first."""
+        return [
+            {"user_id": user_id, "session_id": session_id, "agent": agent, **usage.as_dict()}
+            for (user_id, session_id, agent), usage in sorted(
+                self._entries.items(), key=lambda item: -item[1].total_tokens
+            )
+        ]
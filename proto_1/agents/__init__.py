@@ -1,5 +1,6 @@
 from .entity import root_agent as entity_agent
 from .intent import root_agent as intent_agent
 from .tone import root_agent as tone_agent
+from .context import root_agent as fused_context_agent
 
 
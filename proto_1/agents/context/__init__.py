@@ -0,0 +1 @@
+from .agent import root_agent
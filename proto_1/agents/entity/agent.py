@@ -1,5 +1,8 @@
 from google.adk.agents import Agent
 
+from ...schemas import EntityReport
+from ...structured import StructuredOutput
+
 root_agent = Agent(
     name="entity",
     model="gemini-2.0-flash",
@@ -124,5 +127,6 @@ Instruction (detailed):
     }
   ]
 }
-"""
+""",
+    before_model_callback=StructuredOutput(EntityReport),
 )
\ No newline at end of file
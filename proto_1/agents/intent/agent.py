@@ -1,5 +1,9 @@
 from google.adk.agents import Agent
 
+from ...cascade import cascade_intent
+from ...schemas import IntentReport
+from ...structured import StructuredOutput
+
 root_agent = Agent(
     name="intent",
     model="gemini-2.0-flash",
@@ -98,5 +102,6 @@ Instruction (detailed):
   "confidence_score": 1.0,
   "rationale": "The user states they are trying to 'learn guitar' and asks for an explanation of a technique and for 'tips', which is a clear request for instruction and advice."
 }
-"""
+""",
+    before_model_callback=[StructuredOutput(IntentReport), cascade_intent],
 )
\ No newline at end of file
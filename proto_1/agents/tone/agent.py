@@ -1,5 +1,9 @@
 from google.adk.agents import Agent
 
+from ...cascade import cascade_tone
+from ...schemas import ToneReport
+from ...structured import StructuredOutput
+
 root_agent = Agent(
     name="tone",
     model="gemini-2.0-flash",
@@ -67,5 +71,6 @@ Instruction (detailed):
 - If Entity context is available (e.g., exam, parents), use it to nuance emotion (e.g., stress, guilt).
 - If Intent indicates crisis_help or safety signals, conservatively increase the intensity_score and flag for urgency in the rationale.
 - The structured JSON output is designed for direct consumption by a downstream 'Output' agent to modulate its empathy and response style.
-"""
+""",
+    before_model_callback=[StructuredOutput(ToneReport), cascade_tone],
 )
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""Cheap-first cascade stage for the intent and tone agents.
+
+A small lexicon-backed linear model scores short messages locally and
+answers with the same JSON schema the LLM agents produce. The LLM is only
+called when the local confidence is below ``settings.CASCADE_THRESHOLD``,
+the message is long enough that a handful of cue words can't be trusted,
+or a safety class is involved.
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from . import settings
+from .crisis import assess as assess_crisis
+from .utils import content_text, json_response
+
+INTENT_LABELS = [
+    "small_talk",
+    "gratitude_expression",
+    "sharing_feelings",
+    "venting",
+    "seeking_comfort",
+    "seeking_companionship",
+    "seeking_advice",
+    "factual_query",
+    "explanation_seeking",
+    "celebrating_success",
+    "crisis_help",
+    "seeking_safety",
+]
+
+EMOTION_LABELS = [
+    "contentment",
+    "gratitude",
+    "joy",
+    "excitement",
+    "relief",
+    "curiosity",
+    "sadness",
+    "loneliness",
+    "anxiety",
+    "fear",
+    "anger",
+    "frustration",
+]
+
+EMOTION_SENTIMENT = {
+    "contentment": "positive",
+    "gratitude": "positive",
+    "joy": "positive",
+    "excitement": "positive",
+    "relief": "positive",
+    "curiosity": "neutral",
+    "sadness": "negative",
+    "loneliness": "negative",
+    "anxiety": "negative",
+    "fear": "negative",
+    "anger": "negative",
+    "frustration": "negative",
+}
+
+SAFETY_INTENTS = frozenset({"crisis_help", "seeking_safety"})
+
+# cue -> {label: weight}. Cues are 1-3 word lowercase n-grams.
+INTENT_CUES: Dict[str, Dict[str, float]] = {
+    **{cue: {"small_talk": 5.0} for cue in (
+        "hi", "hello", "hey", "hii", "namaste", "good morning", "good night",
+        "good evening", "how are you", "ok", "okay", "k", "cool", "hmm", "sure",
+        "alright", "bye", "see you", "yo", "sup",
+    )},
+    **{cue: {"gratitude_expression": 6.0} for cue in (
+        "thanks", "thank you", "thank u", "thx", "ty", "appreciate it",
+        "grateful", "shukriya", "dhanyavaad", "dhanyavad", "gracias",
+    )},
+    **{cue: {"factual_query": 4.0} for cue in (
+        "what is", "what are", "define", "meaning of", "is it normal",
+    )},
+    **{cue: {"explanation_seeking": 4.0} for cue in (
+        "explain", "why do", "why does", "how does",
+    )},
+    **{cue: {"seeking_advice": 4.0} for cue in (
+        "should i", "what should", "how do i", "how can i", "advice", "tips",
+        "help me", "what do i do",
+    )},
+    **{cue: {"celebrating_success": 4.5} for cue in (
+        "finally", "i passed", "got the job", "we won", "i won", "promoted",
+        "so happy", "cleared",
+    )},
+    **{cue: {"seeking_companionship": 4.5} for cue in (
+        "lonely", "alone", "no friends", "no one to talk",
+    )},
+    **{cue: {"sharing_feelings": 3.0} for cue in (
+        "i feel", "feeling", "i'm so", "im so", "sad", "upset", "tired",
+    )},
+    **{cue: {"venting": 4.0} for cue in (
+        "hate", "annoyed", "sick of", "fed up", "so unfair", "ugh",
+    )},
+    **{cue: {"seeking_comfort": 3.5} for cue in (
+        "reassure", "comfort", "calm me", "scared",
+    )},
+}
+
+EMOTION_CUES: Dict[str, Dict[str, float]] = {
+    **{cue: {"contentment": 4.5} for cue in (
+        "ok", "okay", "k", "cool", "fine", "alright", "sure", "hi", "hello",
+        "hey", "namaste", "good morning", "good night",
+    )},
+    **{cue: {"gratitude": 6.0} for cue in (
+        "thanks", "thank you", "thank u", "thx", "ty", "appreciate it",
+        "grateful", "shukriya", "dhanyavaad", "dhanyavad", "gracias",
+    )},
+    **{cue: {"joy": 4.5} for cue in ("happy", "so happy", "yay", "great", "amazing")},
+    **{cue: {"excitement": 4.5} for cue in ("excited", "can't wait", "we won", "i won")},
+    **{cue: {"relief": 4.5} for cue in ("relieved", "finally", "phew")},
+    **{cue: {"curiosity": 3.5} for cue in (
+        "what is", "what are", "explain", "how does", "why does", "curious",
+    )},
+    **{cue: {"sadness": 4.0} for cue in ("sad", "cry", "crying", "heartbroken", "down")},
+    **{cue: {"loneliness": 4.5} for cue in ("lonely", "alone", "no friends")},
+    **{cue: {"anxiety": 4.5} for cue in (
+        "anxious", "anxiety", "worried", "nervous", "stressed", "tension", "panic",
+    )},
+    **{cue: {"fear": 4.0} for cue in ("scared", "afraid", "terrified")},
+    **{cue: {"anger": 4.5} for cue in ("angry", "hate", "furious", "pissed")},
+    **{cue: {"frustration": 4.0} for cue in ("annoyed", "fed up", "sick of", "ugh", "so unfair")},
+}
+
+# Messages longer than this are scaled down in confidence: a few cue words
+# say little about a paragraph.
+SHORT_MESSAGE_TOKENS = 8
+MAX_NGRAM = 3
+
+_TOKEN = re.compile(r"[\w']+")
+
+
+def _ngrams(text: str) -> List[str]:
+    tokens = _TOKEN.findall(text.lower())
+    grams = list(tokens)
+    for size in range(2, MAX_NGRAM + 1):
+        grams.extend(" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+    return grams
+
+
+@dataclass(frozen=True)
+class Prediction:
+    label: str
+    confidence: float
+    cues: tuple
+    probabilities: np.ndarray
+
+
+class LexiconClassifier:
+    """Linear model whose weights come from a cue lexicon.
+
+    ``predict`` vectorizes a batch: every cue hit becomes one (row, cue)
+    pair and the class scores are a scatter-add of the cue weight rows.
+    """
+
+    def __init__(self, labels: Sequence[str], cues: Dict[str, Dict[str, float]]):
+        self.labels = list(labels)
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        self.vocabulary = {cue: i for i, cue in enumerate(cues)}
+        self.weights = np.zeros((len(cues), len(self.labels)), dtype=np.float32)
+        for cue, row in self.vocabulary.items():
+            for label, weight in cues[cue].items():
+                self.weights[row, label_index[label]] = weight
+
+    def predict(self, texts: Sequence[str]) -> List[Prediction]:
+        rows, cue_ids, lengths, hits = [], [], [], []
+        for row, text in enumerate(texts):
+            grams = _ngrams(text)
+            lengths.append(sum(1 for gram in grams if " " not in gram))
+            matched = [gram for gram in grams if gram in self.vocabulary]
+            hits.append(tuple(matched))
+            rows.extend([row] * len(matched))
+            cue_ids.extend(self.vocabulary[gram] for gram in matched)
+
+        scores = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        if cue_ids:
+            np.add.at(scores, np.asarray(rows), self.weights[np.asarray(cue_ids)])
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        best = probabilities.argmax(axis=1)
+        confidence = probabilities[np.arange(len(texts)), best]
+        length_factor = np.minimum(1.0, SHORT_MESSAGE_TOKENS / np.maximum(lengths, 1))
+        confidence = confidence * length_factor
+        return [
+            Prediction(self.labels[best[i]], float(confidence[i]), hits[i], probabilities[i])
+            for i in range(len(texts))
+        ]
+
+
+INTENT_MODEL = LexiconClassifier(INTENT_LABELS, INTENT_CUES)
+TONE_MODEL = LexiconClassifier(EMOTION_LABELS, EMOTION_CUES)
+
+
+def _secondary(prediction: Prediction, labels: Sequence[str], floor: float = 0.2) -> List[str]:
+    order = np.argsort(prediction.probabilities)[::-1][1:3]
+    return [labels[i] for i in order if prediction.probabilities[i] >= floor]
+
+
+def _rationale(prediction: Prediction) -> str:
+    cues = ", ".join(f"'{cue}'" for cue in dict.fromkeys(prediction.cues))
+    return f"Local classifier (confidence {prediction.confidence:.2f}) matched {cues}."
+
+
+def intensity(text: str, prediction: Prediction) -> float:
+    """Heuristic 0-1 intensity from punctuation, capitals and cue strength."""
+    letters = [char for char in text if char.isalpha()]
+    caps = sum(char.isupper() for char in letters) / len(letters) if letters else 0.0
+    score = 0.2 + 0.1 * min(text.count("!"), 3) + (0.2 if caps > 0.6 and len(letters) > 3 else 0.0)
+    score += 0.1 * min(len(prediction.cues), 2)
+    return round(min(score, 1.0), 2)
+
+
+def intent_payloads(texts: Sequence[str]) -> List[tuple]:
+    """Returns ``(payload, confidence)`` pairs in the intent agent's schema."""
+    results = []
+    for prediction in INTENT_MODEL.predict(texts):
+        payload = {
+            "primary_intent": prediction.label,
+            "secondary_intents": _secondary(prediction, INTENT_LABELS),
+            "confidence_score": round(prediction.confidence, 2),
+            "rationale": _rationale(prediction),
+        }
+        results.append((payload, prediction.confidence))
+    return results
+
+
+def tone_payloads(texts: Sequence[str]) -> List[tuple]:
+    """Returns ``(payload, confidence)`` pairs in the tone agent's schema."""
+    results = []
+    for text, prediction in zip(texts, TONE_MODEL.predict(texts)):
+        payload = {
+            "primary_emotion": prediction.label,
+            "secondary_emotions": _secondary(prediction, EMOTION_LABELS),
+            "sentiment": EMOTION_SENTIMENT[prediction.label],
+            "intensity_score": intensity(text, prediction),
+            "rationale": _rationale(prediction),
+        }
+        results.append((payload, prediction.confidence))
+    return results
+
+
+def accept(text: str, payload: dict, confidence: float, threshold: float) -> bool:
+    """True when the local answer may stand in for the LLM agent."""
+    if confidence < threshold:
+        return False
+    if payload.get("primary_intent") in SAFETY_INTENTS:
+        return False
+    return not assess_crisis(text).matches
+
+
+# Per-agent counts of answers served locally vs. passed to the LLM.
+STATS: Counter = Counter()
+
+
+def _cascade(agent: str, payloads, callback_context):
+    if not settings.CASCADE_ENABLED:
+        return None
+    text = content_text(callback_context.user_content)
+    if not text:
+        return None
+    payload, confidence = payloads([text])[0]
+    if not accept(text, payload, confidence, settings.CASCADE_THRESHOLD):
+        STATS[f"{agent}.llm"] += 1
+        return None
+    STATS[f"{agent}.local"] += 1
+    return json_response(payload)
+
+
+def cascade_intent(callback_context, llm_request):
+    """before_model_callback: answers the intent agent locally when confident."""
+    return _cascade("intent", intent_payloads, callback_context)
+
+
+def cascade_tone(callback_context, llm_request):
+    """before_model_callback: answers the tone agent locally when confident."""
+    return _cascade("tone", tone_payloads, callback_context)
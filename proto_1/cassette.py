@@ -0,0 +1,232 @@
+"""Record/replay of model calls, for deterministic offline runs.
+
+``use_cassette`` swaps every LlmAgent's model in a freshly built pipeline
+for a ``CassetteLlm`` that wraps the original. In ``record`` mode calls go
+to the real model and each response (streamed chunks included) is stored
+with its timing; in ``replay`` mode the stored response is returned
+instead, with the original timing divided by ``time_scale`` (``None``
+replays without any delay).
+
+Calls are keyed on the agent name plus a hash of the normalized prompt
+(system instruction and contents, with whitespace collapsed and ids and
+timestamps masked). Agent callbacks run before the wrapper, so cascade
+answers and history trimming behave exactly as they did when recording.
+
+On disk a cassette is a single file: zlib-compressed JSON records followed
+by an index of ``key -> [(offset, length), ...]`` and a fixed-size footer.
+Opening a cassette reads only the footer and index; records are read and
+decompressed on first use.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from .models import request_text
+
+MAGIC = b"SCAS1\0"
+# Footer: index offset, index length, magic.
+_FOOTER = struct.Struct("<QQ6s")
+
+RECORD = "record"
+REPLAY = "replay"
+# Replays what is on the cassette and records what is missing.
+AUTO = "auto"
+
+_VOLATILE = re.compile(
+    r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"
+    r"|\b\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?\b"
+)
+_SPACES = re.compile(r"\s+")
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a call was never recorded."""
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercases, masks ids/timestamps and collapses whitespace."""
+    return _SPACES.sub(" ", _VOLATILE.sub("<v>", text.lower())).strip()
+
+
+def call_key(agent_name: str, llm_request: LlmRequest) -> str:
+    digest = hashlib.sha256(normalize_prompt(request_text(llm_request)).encode()).hexdigest()
+    return f"{agent_name}:{digest[:32]}"
+
+
+class Cassette:
+    """Indexed, compressed store of recorded model calls."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._cache: Dict[Tuple[int, int], dict] = {}
+        self._pending: Dict[str, List[dict]] = defaultdict(list)
+        # Per-key replay position, so repeated prompts replay in recorded order.
+        self._cursor: Dict[str, int] = defaultdict(int)
+        if os.path.exists(path):
+            self._load_index()
+
+    def _load_index(self) -> None:
+        with open(self.path, "rb") as handle:
+            handle.seek(-_FOOTER.size, os.SEEK_END)
+            index_offset, index_length, magic = _FOOTER.unpack(handle.read(_FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} is not a cassette file")
+            handle.seek(index_offset)
+            index = json.loads(zlib.decompress(handle.read(index_length)))
+        for key, spans in index.items():
+            self._index[key] = [tuple(span) for span in spans]
+
+    def _read(self, span: Tuple[int, int]) -> dict:
+        if span not in self._cache:
+            with open(self.path, "rb") as handle:
+                handle.seek(span[0])
+                self._cache[span] = json.loads(zlib.decompress(handle.read(span[1])))
+        return self._cache[span]
+
+    def __len__(self) -> int:
+        return sum(len(spans) for spans in self._index.values()) + sum(
+            len(records) for records in self._pending.values()
+        )
+
+    def __contains__(self, key: str) -> bool:
+        return bool(self._index.get(key) or self._pending.get(key))
+
+    def get(self, key: str) -> Optional[dict]:
+        """Next recording for ``key``; cycles when a prompt recurs more often than recorded."""
+        with self._lock:
+            spans = self._index.get(key, [])
+            pending = self._pending.get(key, [])
+            total = len(spans) + len(pending)
+            if not total:
+                return None
+            position = self._cursor[key] % total
+            self._cursor[key] += 1
+        if position < len(spans):
+            return self._read(spans[position])
+        return pending[position - len(spans)]
+
+    def put(self, key: str, record: dict) -> None:
+        with self._lock:
+            self._pending[key].append(record)
+
+    def save(self) -> None:
+        """Writes existing and newly recorded calls to ``path`` atomically."""
+        with self._lock:
+            if not self._pending:
+                return
+            records = [
+                (key, json.dumps(self._read(span), separators=(",", ":")))
+                for key, spans in self._index.items()
+                for span in spans
+            ]
+            records += [
+                (key, json.dumps(record, separators=(",", ":")))
+                for key, pending in self._pending.items()
+                for record in pending
+            ]
+            index: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+            temp = f"{self.path}.tmp"
+            with open(temp, "wb") as handle:
+                handle.write(MAGIC)
+                for key, payload in records:
+                    blob = zlib.compress(payload.encode(), 6)
+                    index[key].append((handle.tell(), len(blob)))
+                    handle.write(blob)
+                index_blob = zlib.compress(json.dumps(index, separators=(",", ":")).encode(), 6)
+                index_offset = handle.tell()
+                handle.write(index_blob)
+                handle.write(_FOOTER.pack(index_offset, len(index_blob), MAGIC))
+            os.replace(temp, self.path)
+            self._index, self._pending, self._cache = index, defaultdict(list), {}
+
+
+class CassetteLlm(BaseLlm):
+    """Model wrapper that records to or replays from a ``Cassette``."""
+
+    model: str = "cassette"
+    agent_name: str
+    inner: Optional[BaseLlm] = None
+    cassette: Cassette
+    mode: str = REPLAY
+    # Divides recorded delays on replay; None replays instantly.
+    time_scale: Optional[float] = 1.0
+
+    async def _pause(self, seconds: float) -> None:
+        if self.time_scale and seconds > 0:
+            await asyncio.sleep(seconds / self.time_scale)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        key = call_key(self.agent_name, llm_request)
+        record = self.cassette.get(key) if self.mode in (REPLAY, AUTO) else None
+        if record is not None:
+            elapsed = 0.0
+            for offset, chunk in record["chunks"]:
+                response = LlmResponse.model_validate(chunk)
+                if response.partial and not stream:
+                    continue
+                await self._pause(offset - elapsed)
+                elapsed = offset
+                yield response
+            return
+        if self.mode == REPLAY:
+            raise CassetteMiss(f"No recording for {key}")
+
+        if self.inner is None:
+            raise ValueError(f"{self.agent_name}: recording needs the wrapped model")
+        started = time.perf_counter()
+        chunks = []
+        async for response in self.inner.generate_content_async(llm_request, stream=stream):
+            chunks.append(
+                (
+                    round(time.perf_counter() - started, 4),
+                    response.model_dump(mode="json", exclude_none=True),
+                )
+            )
+            yield response
+        self.cassette.put(key, {"agent": self.agent_name, "chunks": chunks})
+
+
+def _llm_agents(agent):
+    if hasattr(agent, "canonical_model"):
+        yield agent
+    for sub_agent in agent.sub_agents:
+        yield from _llm_agents(sub_agent)
+
+
+def use_cassette(agent, cassette: Cassette, mode: str = REPLAY, time_scale: Optional[float] = 1.0):
+    """Wraps every LlmAgent's model under ``agent`` in place and returns ``agent``.
+
+    Call it on a pipeline from ``build_pipeline`` rather than the shared
+    module-level ``root_agent``.
+    """
+    if mode not in (RECORD, REPLAY, AUTO):
+        raise ValueError(f"Unknown cassette mode: {mode}")
+    for llm_agent in _llm_agents(agent):
+        inner = llm_agent.canonical_model
+        llm_agent.model = CassetteLlm(
+            # Keeps the wrapped model's name: built-in tools such as
+            # google_search check it.
+            model=inner.model,
+            agent_name=llm_agent.name,
+            inner=None if mode == REPLAY else inner,
+            cassette=cassette,
+            mode=mode,
+            time_scale=time_scale,
+        )
+    return agent
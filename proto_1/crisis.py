@@ -0,0 +1,364 @@
+"""Deterministic crisis screen that runs in-process before any model call.
+
+A single Aho-Corasick automaton is compiled from a small multilingual
+lexicon at import time, so screening a message costs one pass over its
+characters. A match is marked negated, and does not trigger the fast
+path, only when a negation cue directly governs it ("I would never kill
+myself", "I don't want to die", "I'm not suicidal"). A cue further away, or
+a bare "no"/"not" before a first-person intent ("No, I want to die", "I'll
+try not to kill myself"), does not count: when in doubt, the screen flags.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SUICIDE = "suicide_or_self_harm"
+DANGER = "immediate_danger"
+
+# Intent labels used by the intent agent for the same situations.
+CATEGORY_INTENTS = {
+    SUICIDE: "crisis_help",
+    DANGER: "seeking_safety",
+}
+
+# (language, category) -> phrases. A trailing "*" matches any word ending,
+# e.g. "suicid*" covers suicide, suicidal and suicidality.
+CRISIS_LEXICON: Dict[Tuple[str, str], List[str]] = {
+    ("en", SUICIDE): [
+        "suicid*",
+        "kill myself",
+        "killing myself",
+        "end my life",
+        "ending my life",
+        "end it all",
+        "take my own life",
+        "taking my own life",
+        "want to die",
+        "wanna die",
+        "wish i was dead",
+        "wish i were dead",
+        "better off dead",
+        "don't want to live",
+        "dont want to live",
+        "don't want to be alive",
+        "no reason to live",
+        "not worth living",
+        "self harm*",
+        "self-harm*",
+        "hurt myself",
+        "hurting myself",
+        "cut myself",
+        "cutting myself",
+        "overdose",
+        "hang myself",
+        "jump off a bridge",
+    ],
+    ("en", DANGER): [
+        "he is going to hurt me",
+        "she is going to hurt me",
+        "they are going to hurt me",
+        "he is going to kill me",
+        "she is going to kill me",
+        "threatening to kill me",
+        "i am not safe",
+        "i'm not safe",
+        "im not safe",
+        "he hits me",
+        "she hits me",
+        "being abused",
+        "abusing me",
+    ],
+    ("hi", SUICIDE): [
+        "आत्महत्या",
+        "खुदकुशी",
+        "मरना चाहता",
+        "मरना चाहती",
+        "जीना नहीं चाहता",
+        "जीना नहीं चाहती",
+        "खुद को मार",
+        "खुद को नुकसान",
+    ],
+    ("hi-latn", SUICIDE): [
+        "khudkushi",
+        "aatmhatya",
+        "atmahatya",
+        "marna chahta",
+        "marna chahti",
+        "mar jana chahta",
+        "mar jana chahti",
+        "jeena nahi chahta",
+        "jeena nahi chahti",
+        "jina nahi chahta",
+        "jina nahi chahti",
+        "khud ko maar",
+    ],
+    ("hi-latn", DANGER): [
+        "mujhe maar dega",
+        "mujhe maarta hai",
+        "mujhe maarti hai",
+    ],
+    ("es", SUICIDE): [
+        "suicidarme",
+        "matarme",
+        "quitarme la vida",
+        "quiero morir",
+        "quiero morirme",
+        "no quiero vivir",
+        "hacerme daño",
+        "cortarme",
+    ],
+    ("es", DANGER): [
+        "me va a matar",
+        "me quiere matar",
+        "no estoy a salvo",
+    ],
+}
+
+# Cues that negate any phrase they directly precede: "never kill myself",
+# "don't want to die", "nunca ...".
+NEGATION_CUES = frozenset(
+    {
+        "never",
+        "don't",
+        "dont",
+        "won't",
+        "wont",
+        "wouldn't",
+        "wouldnt",
+        "nunca",
+        "jamás",
+        "jamas",
+    }
+)
+
+# Cues that only negate a word-prefix phrase, i.e. a noun or adjective such
+# as "not suicidal" or "no self-harm". Before an intent ("not to kill
+# myself", "no i want to die") they do not deny it.
+NOMINAL_NEGATION_CUES = frozenset({"not", "no", "isn't", "nahi", "nahin", "नहीं"})
+
+# "not" negates any phrase when it follows one of these ("do not want to
+# die", "will not hurt myself"), but not after a verb ("try not to ...").
+NEGATED_AUXILIARIES = frozenset({"do", "does", "did", "will", "would", "shall"})
+
+# Cues that negate any phrase of one language only: Spanish "no" is the
+# verb negator ("no quiero morir").
+LANGUAGE_NEGATION_CUES = {"es": frozenset({"no"})}
+
+# Words allowed between a cue and the phrase it governs ("never ever",
+# "don't really want to die").
+NEGATION_FILLERS = frozenset({"ever", "really", "even", "actually"})
+
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "`": "'"})
+# Clause punctuation becomes a "," token so negation never crosses it.
+_CLAUSE = re.compile(r"[.!?;:,।|\n]+")
+# Devanagari is listed explicitly because \w drops its vowel signs.
+_NON_WORD = re.compile(r"[^\w\s',\-\u0900-\u097F]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercases, unifies apostrophes and collapses punctuation to spaces."""
+    text = _CLAUSE.sub(" , ", text.lower().translate(_APOSTROPHES))
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text)).strip()
+
+
+@dataclass(frozen=True)
+class CrisisMatch:
+    phrase: str
+    category: str
+    language: str
+    start: int
+    end: int
+    negated: bool
+
+
+@dataclass(frozen=True)
+class CrisisAssessment:
+    matches: Tuple[CrisisMatch, ...] = ()
+
+    @property
+    def active(self) -> Tuple[CrisisMatch, ...]:
+        return tuple(match for match in self.matches if not match.negated)
+
+    @property
+    def is_crisis(self) -> bool:
+        return bool(self.active)
+
+    @property
+    def category(self) -> Optional[str]:
+        active = self.active
+        if not active:
+            return None
+        categories = {match.category for match in active}
+        return SUICIDE if SUICIDE in categories else DANGER
+
+    @property
+    def language(self) -> Optional[str]:
+        active = self.active
+        return active[0].language if active else None
+
+    def as_state(self) -> dict:
+        """Compact form stored in session state for the output agent."""
+        return {
+            "category": self.category,
+            "intent": CATEGORY_INTENTS.get(self.category),
+            "phrases": sorted({match.phrase for match in self.active}),
+        }
+
+
+class CrisisMatcher:
+    """Aho-Corasick automaton over a ``(language, category) -> phrases`` lexicon."""
+
+    def __init__(
+        self,
+        lexicon: Dict[Tuple[str, str], Iterable[str]],
+        negation_cues: Iterable[str] = NEGATION_CUES,
+        nominal_negation_cues: Iterable[str] = NOMINAL_NEGATION_CUES,
+        language_negation_cues: Optional[Dict[str, Iterable[str]]] = None,
+    ):
+        self._negation_cues = frozenset(negation_cues)
+        self._nominal_negation_cues = frozenset(nominal_negation_cues)
+        self._language_negation_cues = {
+            language: frozenset(cues)
+            for language, cues in (
+                LANGUAGE_NEGATION_CUES if language_negation_cues is None else language_negation_cues
+            ).items()
+        }
+        self._patterns: List[Tuple[str, str, str, bool]] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for (language, category), phrases in lexicon.items():
+            for phrase in phrases:
+                prefix = phrase.endswith("*")
+                phrase = normalize(phrase.rstrip("*"))
+                self._add(phrase, len(self._patterns))
+                self._patterns.append((phrase, category, language, prefix))
+        self._link()
+
+    def _add(self, phrase: str, pattern_id: int) -> None:
+        node = 0
+        for char in phrase:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] += (pattern_id,)
+
+    def _link(self) -> None:
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] += self._out[self._fail[child]]
+
+    def _negated(self, text: str, start: int, language: str, prefix: bool) -> bool:
+        """Whether the word governing the match at ``start`` negates it."""
+        words = text[:start].split()
+        while words and words[-1] in NEGATION_FILLERS:
+            words.pop()
+        if not words:
+            return False
+        cue = words[-1]
+        return (
+            cue in self._negation_cues
+            or (cue == "not" and len(words) > 1 and words[-2] in NEGATED_AUXILIARIES)
+            or cue in self._language_negation_cues.get(language, ())
+            or (prefix and cue in self._nominal_negation_cues)
+        )
+
+    def assess(self, text: str) -> CrisisAssessment:
+        text = normalize(text)
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        matches = []
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for pattern_id in out[node]:
+                phrase, category, language, prefix = patterns[pattern_id]
+                start = index + 1 - len(phrase)
+                end = index + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if not prefix and end < len(text) and text[end].isalnum():
+                    continue
+                matches.append(
+                    CrisisMatch(
+                        phrase=phrase,
+                        category=category,
+                        language=language,
+                        start=start,
+                        end=end,
+                        negated=self._negated(text, start, language, prefix),
+                    )
+                )
+        return CrisisAssessment(tuple(matches))
+
+
+MATCHER = CrisisMatcher(CRISIS_LEXICON)
+
+
+def assess(text: str) -> CrisisAssessment:
+    """Screens a message with the default multilingual lexicon."""
+    return MATCHER.assess(text)
+
+
+CRISIS_RESPONSES = {
+    "en": (
+        "I'm really sorry you're going through this, and I'm glad you told me. "
+        "Your safety matters most right now. Please reach out to someone who can "
+        "help immediately:\n\n"
+        "- India: Tele-MANAS 14416 or KIRAN 1800-599-0019 (24x7, free)\n"
+        "- US: call or text 988 (Suicide & Crisis Lifeline)\n"
+        "- Emergency: call 112 (India) or 911 (US)\n\n"
+        "If you can, reach out to someone you trust and let them know how you're "
+        "feeling. I'm still here with you."
+    ),
+    "hi": (
+        "मुझे बहुत दुख है कि आप इससे गुज़र रहे हैं, और मुझे खुशी है कि आपने मुझे बताया। "
+        "अभी आपकी सुरक्षा सबसे ज़रूरी है। कृपया तुरंत मदद लें:\n\n"
+        "- Tele-MANAS 14416 या KIRAN 1800-599-0019 (24x7, निःशुल्क)\n"
+        "- आपातकाल: 112\n\n"
+        "किसी भरोसेमंद व्यक्ति से बात करें। मैं आपके साथ हूँ।"
+    ),
+    "es": (
+        "Siento mucho que estés pasando por esto, y me alegra que me lo hayas contado. "
+        "Tu seguridad es lo más importante ahora. Por favor busca ayuda de inmediato:\n\n"
+        "- EE. UU.: llama o envía un texto al 988 (opción en español)\n"
+        "- Emergencias: 911 (EE. UU.) o 112 (India/Europa)\n\n"
+        "Si puedes, habla con alguien de confianza. Sigo aquí contigo."
+    ),
+}
+
+
+def crisis_response(assessment: CrisisAssessment) -> str:
+    """Returns the helpline message in the language that triggered the screen."""
+    language = (assessment.language or "en").split("-")[0]
+    if language == "hi" and assessment.language == "hi-latn":
+        language = "en"
+    return CRISIS_RESPONSES.get(language, CRISIS_RESPONSES["en"])
+
+
+def flag_crisis(callback_context):
+    """before_agent_callback that records the local screen result in state."""
+    if not callback_context.user_content:
+        return None
+    text = "".join(
+        part.text for part in callback_context.user_content.parts or [] if part.text
+    )
+    assessment = assess(text)
+    callback_context.state["crisis_flag"] = (
+        assessment.as_state() if assessment.is_crisis else "none"
+    )
+    return None
@@ -0,0 +1,215 @@
+"""Per-agent deadlines for the parallel context stage.
+
+``ParallelAgent`` waits for the slowest of entity/intent/tone, so one slow
+model call sets the latency of the whole turn. ``DeadlineParallelAgent``
+gives each sub-agent a budget measured from the start of the stage. When a
+budget runs out the stage stops waiting for that agent:
+
+- its state key gets a fallback so ``output_agent`` can proceed: the last
+  known entity context (topics carry over between turns), or the local
+  lexicon's intent/tone for the current message (the crisis screen's intent
+  when it fired)
+- ``state["context_deadline"]`` lists the agents that missed
+- the agent keeps running in the background and its compact result is
+  staged in this process for the session; the next turn's stage writes it
+  into the context key, in its own invocation, before its own agents start,
+  so it is the last known context should that turn's agent be late as well.
+  Nothing is appended to the session from outside an invocation, which
+  could race the next turn and fail its stale-session check
+
+A context agent that fails outright (after ``proto_1.resilience`` retries)
+gets the same fallback and is listed under ``failed``, so the turn still
+gets a reply.
+
+A late result is only stored if its agent finishes while the event loop
+that served the turn is still running. ``deployment/local.py`` and
+``async_stream_query`` keep theirs; a one-shot ``asyncio.run`` (the sync
+``stream_query``) cancels the detached agent when the request returns, and
+the next turn simply has no late result to carry. Neither does a next turn
+served by another process.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import AsyncGenerator, Dict, Optional, Set, Tuple
+
+from google.adk.agents import ParallelAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.agents.parallel_agent import _create_branch_ctx_for_sub_agent
+from google.adk.events import Event, EventActions
+
+from .cascade import intent_payloads, tone_payloads
+from .history import CONTEXT_KEYS, compact, compact_reply
+from .schemas import EntityReport
+from .utils import content_text
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_KEY = "context_deadline"
+
+# "<agent>.on_time", ".missed", ".failed" and ".late_staged" per agent.
+STATS: Counter = Counter()
+
+# Sessions whose late results wait for a next turn; the oldest are dropped
+# past this many.
+LATE_SESSIONS = 10_000
+
+# (app_name, user_id, session_id) -> {context agent: compact result that
+# arrived after its turn}.
+_LATE: Dict[Tuple[str, str, str], Dict[str, dict]] = {}
+
+_DONE = object()
+
+# Detached agents outlive the stage that started them; the loop itself only
+# keeps weak references to tasks.
+_DETACHED: Set[asyncio.Task] = set()
+
+
+def fallback(agent_name: str, text: str, state) -> dict:
+    """Compact context standing in for an agent that missed its deadline."""
+    if agent_name == "entity":
+        previous = state.get(CONTEXT_KEYS["entity"])
+        if isinstance(previous, dict):
+            return previous
+        return compact("entity", EntityReport().model_dump())
+    if agent_name == "intent":
+        payload, _ = intent_payloads([text])[0]
+        crisis = state.get("crisis_flag")
+        if isinstance(crisis, dict) and crisis.get("intent"):
+            payload = {**payload, "primary_intent": crisis["intent"]}
+        return compact("intent", payload)
+    payload, _ = tone_payloads([text])[0]
+    return compact("tone", payload)
+
+
+class DeadlineParallelAgent(ParallelAgent):
+    """ParallelAgent that stops waiting for sub-agents past their deadline."""
+
+    # Sub-agent name -> budget in seconds; agents without one are awaited.
+    deadlines: Dict[str, float] = {}
+
+    def _event(self, ctx: InvocationContext, state_delta: dict) -> Event:
+        return Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta=state_delta),
+        )
+
+    @staticmethod
+    def _session_key(ctx: InvocationContext) -> Tuple[str, str, str]:
+        return ctx.app_name, ctx.user_id, ctx.session.id
+
+    def _stage_late(self, ctx: InvocationContext, name: str, value: dict) -> None:
+        """Keeps a late result for the session's next turn to write."""
+        key = self._session_key(ctx)
+        _LATE.setdefault(key, {})[name] = value
+        while len(_LATE) > LATE_SESSIONS:
+            del _LATE[next(iter(_LATE))]
+        STATS[f"{name}.late_staged"] += 1
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        session_id = ctx.session.id
+        state = ctx.session.state
+        carried = {
+            CONTEXT_KEYS[name]: value
+            for name, value in _LATE.pop(self._session_key(ctx), {}).items()
+        }
+        if carried or state.get(DEADLINE_KEY):
+            yield self._event(ctx, {**carried, DEADLINE_KEY: None})
+
+        started = time.monotonic()
+        queue: asyncio.Queue = asyncio.Queue()
+        detached = set()
+        failed = set()
+        waiting: Dict[str, asyncio.Event] = {}
+
+        async def drive(sub_agent):
+            name = sub_agent.name
+            reply: Optional[str] = None
+            try:
+                async for event in sub_agent.run_async(
+                    _create_branch_ctx_for_sub_agent(self, sub_agent, ctx)
+                ):
+                    if event.content and not event.partial:
+                        reply = content_text(event.content) or reply
+                    if name in detached:
+                        continue
+                    resume = asyncio.Event()
+                    waiting[name] = resume
+                    await queue.put((name, event, resume))
+                    await resume.wait()
+            except Exception as error:
+                if name not in detached:
+                    await queue.put((name, error, None))
+                    return
+                logger.warning("late %s for session %s failed: %s", name, session_id, error)
+                return
+            if name not in detached:
+                await queue.put((name, _DONE, None))
+            elif reply and name in CONTEXT_KEYS:
+                self._stage_late(ctx, name, compact_reply(name, reply))
+
+        tasks = {sub_agent.name: asyncio.create_task(drive(sub_agent)) for sub_agent in self.sub_agents}
+        pending = set(tasks)
+        try:
+            while pending:
+                budgets = [
+                    started + self.deadlines[name] for name in pending if name in self.deadlines
+                ]
+                timeout = max(0.0, min(budgets) - time.monotonic()) if budgets else None
+                try:
+                    name, event, resume = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    now = time.monotonic()
+                    for name in [n for n in pending if n in self.deadlines]:
+                        if started + self.deadlines[name] <= now:
+                            detached.add(name)
+                            pending.discard(name)
+                            _DETACHED.add(tasks[name])
+                            tasks[name].add_done_callback(_DETACHED.discard)
+                            if name in waiting:
+                                waiting[name].set()
+                    continue
+                if name in detached:
+                    if resume:
+                        resume.set()
+                    continue
+                if isinstance(event, Exception):
+                    logger.warning("context agent %s failed: %s", name, event)
+                    failed.add(name)
+                    pending.discard(name)
+                    STATS[f"{name}.failed"] += 1
+                    continue
+                if event is _DONE:
+                    pending.discard(name)
+                    STATS[f"{name}.on_time"] += 1
+                    continue
+                yield event
+                resume.set()
+        finally:
+            # Detached agents run on; anything else still going was abandoned
+            # by an error or by the caller closing the stream.
+            for name, task in tasks.items():
+                if name not in detached and not task.done():
+                    task.cancel()
+
+        if detached or failed:
+            text = content_text(ctx.user_content)
+            missed = sorted(detached)
+            for name in missed:
+                STATS[f"{name}.missed"] += 1
+            if missed:
+                logger.info("context deadline missed by %s (session %s)", ",".join(missed), session_id)
+            state_delta = {
+                CONTEXT_KEYS[name]: fallback(name, text, ctx.session.state)
+                for name in detached | failed
+                if name in CONTEXT_KEYS
+            }
+            state_delta[DEADLINE_KEY] = {
+                "missed": missed,
+                "failed": sorted(failed),
+                "budgets_s": {name: self.deadlines[name] for name in missed},
+            }
+            yield self._event(ctx, state_delta)
@@ -0,0 +1,69 @@
+"""Intent-gated google_search for the output agent.
+
+The output agent carries the ``google_search`` tool, but a search round trip
+only pays off when the user asks for information. ``gate_search`` runs as
+a before_model_callback: it reads this turn's intent and, unless the
+primary intent is in ``settings.GROUNDED_INTENTS``, removes the search tool
+from the request, giving the ungrounded variant of the agent for that call.
+The decision is written to ``state["grounding"]`` so each turn's choice is
+visible in the session and in the event stream.
+"""
+from collections import Counter
+from typing import Optional
+
+from . import settings
+from .history import CONTEXT_KEYS, FUSED_AGENT, session_events
+from .structured import decode
+from .utils import content_text
+
+GROUNDING_KEY = "grounding"
+
+# "<intent>.grounded" / "<intent>.ungrounded" decisions, plus
+# "<intent>.searched" for grounded calls where the model actually searched.
+STATS: Counter = Counter()
+
+
+def _is_search(tool) -> bool:
+    return bool(tool.google_search or tool.google_search_retrieval)
+
+
+def turn_intent(callback_context) -> Optional[str]:
+    """Primary intent of the message being answered, if the context stage found one."""
+    intent = callback_context.state.get(CONTEXT_KEYS["intent"])
+    if isinstance(intent, dict) and intent.get("primary_intent"):
+        return intent["primary_intent"]
+    # Without compact history the intent only exists as this turn's event.
+    for event in reversed(session_events(callback_context)):
+        if event.invocation_id != callback_context.invocation_id:
+            break
+        if event.author not in ("intent", FUSED_AGENT) or not event.content:
+            continue
+        decoded = decode(event.author, content_text(event.content))
+        if decoded.ok:
+            report = decoded.value.intent if event.author == FUSED_AGENT else decoded.value
+            return report.primary_intent
+    return None
+
+
+def gate_search(callback_context, llm_request):
+    """before_model_callback: drops google_search unless the intent needs grounding."""
+    intent = turn_intent(callback_context) or "unknown"
+    grounded = intent in settings.GROUNDED_INTENTS
+    if not grounded and llm_request.config and llm_request.config.tools:
+        llm_request.config.tools = [
+            tool for tool in llm_request.config.tools if not _is_search(tool)
+        ] or None
+    STATS[f"{intent}.{'grounded' if grounded else 'ungrounded'}"] += 1
+    callback_context.state[GROUNDING_KEY] = {"intent": intent, "search_enabled": grounded}
+    return None
+
+
+def record_search(callback_context, llm_response):
+    """after_model_callback: counts grounded calls where the model ran a search."""
+    metadata = llm_response.grounding_metadata
+    if llm_response.partial or not metadata or not metadata.web_search_queries:
+        return None
+    grounding = callback_context.state.get(GROUNDING_KEY) or {}
+    STATS[f"{grounding.get('intent', 'unknown')}.searched"] += 1
+    callback_context.state[GROUNDING_KEY] = {**grounding, "searched": True}
+    return None
@@ -0,0 +1,293 @@
+"""Keeps internal context-agent output out of the conversation history.
+
+The context agents write compact results into session state (via
+``output_key`` plus ``store_compact_context``) and agents that need earlier
+turns see only the user-visible dialogue: user messages and output_agent
+replies. Prompt size then grows with the dialogue, not with every JSON
+blob the context stage has ever produced.
+
+On top of that, the dialogue is bounded: the last few turns are sent
+verbatim, older turns are folded into a rolling summary kept in state (only
+newly aged-out turns are summarized each time), and every agent's prompt is
+trimmed to its token budget.
+"""
+import re
+from collections import Counter
+from typing import Callable, Iterable, List, Optional
+
+from google.genai import types
+
+from . import settings
+from .structured import decode
+from .utils import content_text, estimate_tokens
+
+# Context agent name -> session state key holding its compact result.
+CONTEXT_KEYS = {
+    "entity": "entity_context",
+    "intent": "intent_context",
+    "tone": "tone_context",
+}
+FUSED_KEY = "context"
+
+OUTPUT_PREFIX = "output_agent"
+
+SUMMARY_KEY = "history_summary"
+SUMMARY_UPTO_KEY = "history_summary_upto"
+SUMMARY_HEADER = "Summary of the earlier conversation (older turns, condensed):"
+
+# Summary refreshes, turns folded, budget trims and tokens kept out of prompts.
+STATS: Counter = Counter()
+
+FUSED_AGENT = "context_agent"
+
+ENTITY_FIELDS = ("text", "type", "normalized_value", "is_sensitive", "coreference_target")
+
+
+def compact_entity(payload: dict) -> dict:
+    entities = []
+    for entity in payload.get("entities") or []:
+        if entity.get("type") == "PRONOUN" and not entity.get("coreference_target"):
+            continue
+        entities.append({key: entity[key] for key in ENTITY_FIELDS if entity.get(key) is not None})
+    return {"topic_summary": payload.get("topic_summary"), "entities": entities}
+
+
+def compact_intent(payload: dict) -> dict:
+    return {
+        "primary_intent": payload.get("primary_intent"),
+        "secondary_intents": payload.get("secondary_intents") or [],
+        "confidence_score": payload.get("confidence_score"),
+    }
+
+
+def compact_tone(payload: dict) -> dict:
+    return {
+        "primary_emotion": payload.get("primary_emotion"),
+        "secondary_emotions": payload.get("secondary_emotions") or [],
+        "sentiment": payload.get("sentiment"),
+        "intensity_score": payload.get("intensity_score"),
+    }
+
+
+COMPACTORS = {
+    "entity": compact_entity,
+    "intent": compact_intent,
+    "tone": compact_tone,
+}
+
+
+def compact(agent_name: str, payload: dict) -> dict:
+    return COMPACTORS[agent_name](payload)
+
+
+def _raw(value) -> dict:
+    return {"raw": str(value).strip()[:500]}
+
+
+def compact_reply(agent_name: str, value) -> dict:
+    """Compact form of a context agent's raw reply (JSON text or dict)."""
+    decoded = decode(agent_name, value)
+    return compact(agent_name, decoded.value.model_dump()) if decoded.ok else _raw(value)
+
+
+def store_compact_context(callback_context):
+    """after_agent_callback: replaces a context agent's raw output with its compact form."""
+    name = callback_context.agent_name
+    state = callback_context.state
+    if name in CONTEXT_KEYS and state.get(CONTEXT_KEYS[name]) is not None:
+        state[CONTEXT_KEYS[name]] = compact_reply(name, state[CONTEXT_KEYS[name]])
+    elif name == FUSED_AGENT and state.get(FUSED_KEY) is not None:
+        value = state[FUSED_KEY]
+        decoded = decode(FUSED_AGENT, value)
+        report = decoded.value.model_dump() if decoded.ok else None
+        for part, key in CONTEXT_KEYS.items():
+            state[key] = compact(part, report[part]) if report else _raw(value)
+        state[FUSED_KEY] = None
+    return None
+
+
+def session_events(callback_context) -> list:
+    """Events of the session a callback runs in.
+
+    ADK's callback contexts expose state and the user content but not the
+    session itself, so this is the one place that reaches into the private
+    invocation context.
+    """
+    return callback_context._invocation_context.session.events
+
+
+def dialogue_contents(events: Iterable) -> List[types.Content]:
+    """User messages and final output_agent replies, in order."""
+    contents = []
+    for event in events:
+        if event.partial or not event.content:
+            continue
+        if event.author == "user":
+            role = "user"
+        elif event.author.startswith(OUTPUT_PREFIX):
+            role = "model"
+        else:
+            continue
+        text = content_text(event.content)
+        if text:
+            contents.append(types.Content(role=role, parts=[types.Part(text=text)]))
+    return contents
+
+
+def dialogue_turns(events: Iterable) -> List[List[types.Content]]:
+    """Groups the dialogue into turns, each starting with a user message."""
+    turns: List[List[types.Content]] = []
+    for content in dialogue_contents(events):
+        if content.role == "user" or not turns:
+            turns.append([content])
+        else:
+            turns[-1].append(content)
+    return turns
+
+
+def _turn_text(turn: List[types.Content]) -> str:
+    return "\n".join(content_text(content) for content in turn)
+
+
+def _first_sentence(text: str, max_words: int = 30) -> str:
+    sentence = re.split(r"(?<=[.!?।])\s", text.strip(), maxsplit=1)[0]
+    words = sentence.split()
+    return " ".join(words[:max_words]) + (" ..." if len(words) > max_words else "")
+
+
+EARLIER_PREFIX = "Earlier: "
+
+
+def _turn_line(turn: List[types.Content]) -> str:
+    """One summary line for a turn: what the user said and how Saarthi answered."""
+    user = " ".join(content_text(c) for c in turn if c.role == "user").strip()
+    reply = " ".join(content_text(c) for c in turn if c.role != "user").strip()
+    parts = []
+    if user:
+        parts.append(f"User: {_first_sentence(user, 25)}")
+    if reply:
+        parts.append(f"Saarthi: {_first_sentence(reply, 15)}")
+    return "- " + " / ".join(parts) if parts else ""
+
+
+def extractive_summary(previous: str, turns: List[List[types.Content]]) -> str:
+    """Adds one line per newly aged-out turn to ``previous`` and condenses it to size.
+
+    The summary is an ``Earlier:`` line followed by one line per turn. When
+    it outgrows ``SUMMARY_MAX_TOKENS``, the oldest turn lines are folded
+    into the ``Earlier:`` line as just the user's first few words; once
+    that line takes half the budget, its oldest entries are dropped.
+    """
+    lines = previous.splitlines() if previous else []
+    earlier = lines.pop(0)[len(EARLIER_PREFIX):] if lines and lines[0].startswith(EARLIER_PREFIX) else ""
+    lines += [line for line in map(_turn_line, turns) if line]
+
+    def size():
+        return estimate_tokens(EARLIER_PREFIX + earlier + "\n" + "\n".join(lines))
+
+    budget = settings.SUMMARY_MAX_TOKENS
+    while size() > budget:
+        if lines and ("; " not in earlier or estimate_tokens(earlier) <= budget // 2):
+            oldest = lines.pop(0)[2:].split(" / Saarthi: ")[0].removeprefix("User: ")
+            gist = _first_sentence(oldest, 8)
+            earlier = f"{earlier}; {gist}" if earlier else gist
+        elif "; " in earlier:
+            earlier = earlier.split("; ", 1)[1]
+        else:
+            break
+    return "\n".join(([EARLIER_PREFIX + earlier] if earlier else []) + lines)
+
+
+Summarizer = Callable[[str, List[List[types.Content]]], str]
+
+
+class HistoryManager:
+    """Rolling summary plus per-agent token budgets over the dialogue view."""
+
+    def __init__(
+        self,
+        keep_turns: Optional[int] = None,
+        fold_every: Optional[int] = None,
+        budget: Optional[int] = None,
+        budgets: Optional[dict] = None,
+        summarizer: Summarizer = extractive_summary,
+    ):
+        self.keep_turns = settings.HISTORY_KEEP_TURNS if keep_turns is None else keep_turns
+        self.fold_every = max(1, fold_every or settings.HISTORY_FOLD_EVERY)
+        self.budget = budget or settings.HISTORY_BUDGET
+        self.budgets = settings.HISTORY_BUDGETS if budgets is None else budgets
+        self.summarizer = summarizer
+
+    def budget_for(self, agent_name: str) -> int:
+        return self.budgets.get(agent_name, self.budget)
+
+    def refresh_summary(self, callback_context):
+        """before_agent_callback: folds turns that left the verbatim window into the summary."""
+        state = callback_context.state
+        # The last turn is the message being answered now.
+        completed = dialogue_turns(session_events(callback_context))[:-1]
+        cutoff = max(0, len(completed) - self.keep_turns)
+        upto = state.get(SUMMARY_UPTO_KEY) or 0
+        # Folding in batches keeps summary refreshes (and any model-backed
+        # summarizer calls) to one every few turns.
+        if cutoff - upto >= self.fold_every:
+            state[SUMMARY_KEY] = self.summarizer(state.get(SUMMARY_KEY) or "", completed[upto:cutoff])
+            state[SUMMARY_UPTO_KEY] = cutoff
+            STATS["refreshes"] += 1
+            STATS["turns_folded"] += cutoff - upto
+        return None
+
+    def apply(self, callback_context, llm_request):
+        """before_model_callback: summary + recent turns, trimmed to the agent's budget."""
+        state = callback_context.state
+        turns = dialogue_turns(session_events(callback_context))
+        upto = min(state.get(SUMMARY_UPTO_KEY) or 0, max(0, len(turns) - 1))
+        summary = state.get(SUMMARY_KEY) or ""
+        recent = turns[upto:]
+
+        instruction = str(llm_request.config.system_instruction or "") if llm_request.config else ""
+        available = self.budget_for(callback_context.agent_name) - estimate_tokens(instruction)
+        summary_tokens = estimate_tokens(f"{SUMMARY_HEADER}\n{summary}") if summary else 0
+        sizes = [estimate_tokens(_turn_text(turn)) for turn in recent]
+        # Drop the oldest verbatim turns first; the current message always stays.
+        while len(recent) > 1 and summary_tokens + sum(sizes) > available:
+            recent, sizes = recent[1:], sizes[1:]
+            STATS["budget_trims"] += 1
+        if summary and summary_tokens + sum(sizes) > available:
+            summary, summary_tokens = "", 0
+            STATS["budget_trims"] += 1
+
+        contents = []
+        if summary:
+            contents.append(
+                types.Content(role="user", parts=[types.Part(text=f"{SUMMARY_HEADER}\n{summary}")])
+            )
+        for turn in recent:
+            contents.extend(turn)
+        STATS["tokens_saved"] += max(
+            0, sum(estimate_tokens(_turn_text(turn)) for turn in turns) - summary_tokens - sum(sizes)
+        )
+        llm_request.contents = contents
+        return None
+
+
+HISTORY = HistoryManager()
+
+
+def use_current_message(callback_context, llm_request):
+    """before_model_callback: sends only the message being answered.
+
+    ``include_contents="none"`` is not enough inside the pipeline: ADK starts
+    the "current turn" at the latest event from any other agent, which here
+    is the state-only event of ``final_agent``'s callbacks, so the model
+    would see no user text at all.
+    """
+    if callback_context.user_content:
+        llm_request.contents = [callback_context.user_content]
+    return None
+
+
+def use_dialogue_history(callback_context, llm_request):
+    """before_model_callback: sends the user-visible dialogue instead of the raw session."""
+    llm_request.contents = dialogue_contents(session_events(callback_context))
+    return None
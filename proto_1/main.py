@@ -1,14 +1,24 @@
 from .agents.entity import root_agent as entity_agent
 from .agents.intent import root_agent as intent_agent
 from .agents.tone import root_agent as tone_agent
+from .agents.context import root_agent as fused_context_agent
 from google.adk.tools import google_search
-from google.adk.agents import LlmAgent, SequentialAgent, ParallelAgent
+from google.adk.agents import LlmAgent, SequentialAgent
 
-# Context layer (hidden from user)
-context_agent = ParallelAgent(
-    name="context_agent",
-    sub_agents=[entity_agent, intent_agent, tone_agent],
-    description="Runs entity, intent, and tone extraction in parallel. Internal only."
+from . import settings
+from .crisis import flag_crisis
+from .deadlines import DeadlineParallelAgent
+from .grounding import gate_search, record_search
+from .resilience import use_resilience
+from .router import route_turn, skip_unrouted
+from .speculation import SpeculativeAgent, make_drafter
+from .history import (
+    CONTEXT_KEYS,
+    FUSED_KEY,
+    HISTORY,
+    store_compact_context,
+    use_current_message,
+    use_dialogue_history,
 )
 
 # User-facing response generator
@@ -27,6 +37,10 @@ ROLE:
 
 GUIDELINES:
 1. Use entity, intent, and tone context to guide your reply.
+   Context for the latest message (internal, never quote it):
+   - Entities: {entity_context?}
+   - Intent: {intent_context?}
+   - Tone: {tone_context?}
    - venting/self_reflection → listen, validate.
    - ask_info/seek_coping → give clear, practical coping steps.
    - gratitude → respond warmly, encouraging.
@@ -34,20 +48,159 @@ GUIDELINES:
 2. Keep replies short (2–5 sentences), human, conversational.
 3. Never diagnose. Never promise medical outcomes.
 4. If crisis is flagged, gently provide helpline info and emphasize reaching out immediately.
-5. Use google_search tool silently for grounding — but reply in plain text.
+   The local crisis screen for this message reported: {crisis_flag?}
+   If it is not "none", the app has already shown helpline numbers; follow up gently and personally.
+5. When the google_search tool is available, use it silently for grounding — but reply in plain text.
 
 OUTPUT:
 - Natural empathetic chat message only.
 - No JSON, no system notes, no explanations.
 """,
-    tools=[google_search]
+    tools=[google_search],
+    after_model_callback=record_search,
 )
 
 
-final_agent = SequentialAgent(
-    name="final_agent",
-    sub_agents=[context_agent, output_agent],
-    description="End-to-end pipeline: context extraction (hidden) → empathetic user-facing reply."
-)
+
+def _callbacks(callbacks):
+    if callbacks is None:
+        return []
+    return list(callbacks) if isinstance(callbacks, list) else [callbacks]
+
+
+def _copy(agent, model=None, **update):
+    """Fresh copy of a template agent so several pipelines can coexist in one process."""
+    if model:
+        update["model"] = model
+    return agent.clone(update=update or None)
+
+
+def _compact(agent, key, history):
+    """Clone overrides that keep an agent's output in state instead of the shared history.
+
+    ``history`` is the before_model_callback that supplies earlier turns, or
+    None for agents that only need the current message.
+    """
+    return {
+        "output_key": key,
+        "after_agent_callback": store_compact_context,
+        "include_contents": "default" if history else "none",
+        "before_model_callback": [
+            history or use_current_message,
+            *_callbacks(agent.before_model_callback),
+        ],
+    }
+
+
+# Context layer (hidden from user)
+def _history_callback(summarize_history):
+    summarize = settings.SUMMARIZE_HISTORY if summarize_history is None else summarize_history
+    return HISTORY.apply if summarize else use_dialogue_history
+
+
+def context_deadlines(overrides=None):
+    """Sub-agent name -> deadline in seconds, from settings unless ``overrides`` is given."""
+    if overrides is not None:
+        return {name: seconds for name, seconds in overrides.items() if seconds > 0}
+    deadlines = {name: settings.CONTEXT_DEADLINE for name in CONTEXT_KEYS}
+    deadlines.update(settings.CONTEXT_DEADLINES)
+    return {name: seconds for name, seconds in deadlines.items() if seconds > 0}
+
+
+def build_context_agent(
+    mode=None,
+    model=None,
+    compact_history=None,
+    summarize_history=None,
+    route_messages=False,
+    deadlines=None,
+):
+    """Context stage; ``route_messages`` lets ``state["route"]`` skip parallel agents.
+
+    ``deadlines`` (agent name -> seconds) overrides the settings' budgets.
+    """
+    mode = mode or settings.CONTEXT_MODE
+    compact = settings.COMPACT_HISTORY if compact_history is None else compact_history
+    history = _history_callback(summarize_history)
+
+    def leaf(agent, key, needs_history):
+        update = _compact(agent, key, history if needs_history else None) if compact else {}
+        if route_messages and mode == "parallel":
+            callbacks = update.get("before_model_callback") or _callbacks(agent.before_model_callback)
+            update["before_model_callback"] = [skip_unrouted, *callbacks]
+        return _copy(agent, model, **update)
+
+    if mode == "fused":
+        return leaf(fused_context_agent, FUSED_KEY, True)
+    if mode != "parallel":
+        raise ValueError(f"Unknown context mode: {mode}")
+    return DeadlineParallelAgent(
+        name="context_agent",
+        sub_agents=[
+            # Entity coreference needs earlier turns; intent and tone only need this message.
+            leaf(entity_agent, CONTEXT_KEYS["entity"], True),
+            leaf(intent_agent, CONTEXT_KEYS["intent"], False),
+            leaf(tone_agent, CONTEXT_KEYS["tone"], False),
+        ],
+        description="Runs entity, intent, and tone extraction in parallel. Internal only.",
+        deadlines=context_deadlines(deadlines),
+    )
+
+
+def build_pipeline(
+    context_mode=None,
+    model=None,
+    compact_history=None,
+    summarize_history=None,
+    gate_search_tool=None,
+    route_messages=None,
+    context_deadlines=None,
+    resilience=None,
+    speculate=None,
+):
+    """Assembles the end-to-end pipeline; ``model`` overrides every agent's model.
+
+    Rolling summarization works on the compact dialogue view, so it only
+    applies when ``compact_history`` is on. ``gate_search_tool`` keeps
+    google_search only for intents in ``settings.GROUNDED_INTENTS``, and
+    ``route_messages`` runs only the context agents a message needs,
+    ``context_deadlines`` overrides each context agent's time budget.
+    ``resilience`` wraps every model in retries (and hedging) from settings.
+    ``speculate`` drafts the reply while the context stage runs; it needs
+    ``compact_history``, since drafts are checked against the compact context.
+    """
+    model = model or settings.MODEL
+    compact = settings.COMPACT_HISTORY if compact_history is None else compact_history
+    summarize = compact and (
+        settings.SUMMARIZE_HISTORY if summarize_history is None else summarize_history
+    )
+    gate = settings.GATE_SEARCH if gate_search_tool is None else gate_search_tool
+    routed = settings.ROUTER_ENABLED if route_messages is None else route_messages
+    output_callbacks = ([_history_callback(summarize)] if compact else []) + ([gate_search] if gate else [])
+    output = _copy(
+        output_agent, model, **({"before_model_callback": output_callbacks} if output_callbacks else {})
+    )
+    before_turn = [flag_crisis] + ([route_turn] if routed else [])
+    if summarize:
+        before_turn.append(HISTORY.refresh_summary)
+    speculative = compact and (settings.SPECULATE if speculate is None else speculate)
+    sub_agents = [
+        build_context_agent(context_mode, model, compact, summarize, routed, context_deadlines),
+        output,
+    ]
+    if speculative:
+        sub_agents.append(make_drafter(output, [_history_callback(summarize)]))
+    pipeline = (SpeculativeAgent if speculative else SequentialAgent)(
+        name="final_agent",
+        sub_agents=sub_agents,
+        description="End-to-end pipeline: context extraction (hidden) → empathetic user-facing reply.",
+        before_agent_callback=before_turn,
+    )
+    if resilience is None:
+        resilience = settings.RETRY_ATTEMPTS > 1 or settings.HEDGE_PERCENTILE > 0
+    return use_resilience(pipeline) if resilience else pipeline
+
+
+final_agent = build_pipeline()
 
 root_agent = final_agent
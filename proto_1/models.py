@@ -0,0 +1,200 @@
+"""Model backends for running the pipeline without Vertex.
+
+``StubLlm`` answers every agent with a canned but schema-shaped reply and
+simulates latency from prompt and output size, so orchestration changes can
+be compared offline. When a request carries the google_search tool it
+always "searches": the call takes ``search_latency`` longer and returns
+grounding metadata. A ``spike_rate`` share of calls is held up by an extra
+``spike_latency``, as a slow replica or quota back-pressure would, and an
+``error_rate`` share fails with a 429 or 503 after the first-token delay.
+"""
+import asyncio
+import json
+import random
+import time
+from typing import AsyncGenerator, Callable, List, Optional, Tuple
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import errors, types
+from pydantic import PrivateAttr
+
+from .cascade import INTENT_MODEL
+from .utils import content_text, estimate_tokens
+
+ENTITY_REPLY = {
+    "topic_summary": "Exam stress and self-doubt",
+    "entities": [
+        {
+            "text": "exam",
+            "type": "TOPIC_ACADEMIC",
+            "normalized_value": "exam",
+            "is_sensitive": False,
+            "confidence_score": 0.97,
+            "coreference_target": None,
+        }
+    ],
+}
+INTENT_REPLY = {
+    "primary_intent": "sharing_feelings",
+    "secondary_intents": ["seeking_comfort"],
+    "confidence_score": 0.9,
+    "rationale": "The user describes how they feel about a recent event.",
+}
+TONE_REPLY = {
+    "primary_emotion": "sadness",
+    "secondary_emotions": ["guilt"],
+    "sentiment": "negative",
+    "intensity_score": 0.7,
+    "rationale": "Self-critical wording about a disappointing result.",
+}
+OUTPUT_REPLY = (
+    "That sounds really hard, and it makes sense that you're feeling low right now. "
+    "One result doesn't define you. Would you like to talk about what happened?"
+)
+
+
+def request_text(llm_request: LlmRequest) -> str:
+    """System instruction plus every text part of the request contents."""
+    pieces = []
+    if llm_request.config and llm_request.config.system_instruction:
+        pieces.append(str(llm_request.config.system_instruction))
+    for content in llm_request.contents or []:
+        for part in content.parts or []:
+            if part.text:
+                pieces.append(part.text)
+    return "\n".join(pieces)
+
+
+def intent_reply(llm_request: LlmRequest) -> dict:
+    """INTENT_REPLY, relabelled with the lexicon's guess for the latest user message.
+
+    Keeps the stub's intent mix close to a real corpus even for messages the
+    cascade would not answer on its own.
+    """
+    users = [content for content in llm_request.contents or [] if content.role == "user"]
+    text = content_text(users[-1]) if users else ""
+    prediction = INTENT_MODEL.predict([text])[0] if text else None
+    if not prediction or not prediction.cues:
+        return INTENT_REPLY
+    return {**INTENT_REPLY, "primary_intent": prediction.label}
+
+
+def schema_reply(llm_request: LlmRequest) -> str:
+    """Picks a canned reply from the JSON schema the instruction asks for."""
+    instruction = ""
+    if llm_request.config and llm_request.config.system_instruction:
+        instruction = str(llm_request.config.system_instruction)
+    wants_entity = '"entities"' in instruction
+    wants_intent = '"primary_intent"' in instruction
+    wants_tone = '"primary_emotion"' in instruction
+    if wants_entity and wants_intent and wants_tone:
+        return json.dumps({"entity": ENTITY_REPLY, "intent": intent_reply(llm_request), "tone": TONE_REPLY})
+    if wants_entity:
+        return json.dumps(ENTITY_REPLY)
+    if wants_intent:
+        return json.dumps(intent_reply(llm_request))
+    if wants_tone:
+        return json.dumps(TONE_REPLY)
+    return OUTPUT_REPLY
+
+
+class StubLlm(BaseLlm):
+    """Deterministic offline model with a simple prefill/decode latency model."""
+
+    model: str = "gemini-2.0-flash-stub"
+    first_token_latency: float = 0.35
+    seconds_per_1k_prompt_tokens: float = 0.04
+    seconds_per_output_token: float = 0.006
+    # Added to prefill when google_search is offered, for the search round trip.
+    search_latency: float = 0.8
+    # Share of calls delayed by spike_latency, drawn from a generator seeded with seed.
+    spike_rate: float = 0.0
+    spike_latency: float = 3.0
+    seed: int = 0
+    # Share of calls that fail with one of error_codes instead of answering.
+    error_rate: float = 0.0
+    error_codes: Tuple[int, ...] = (429, 503)
+    # Divides every simulated delay, so benchmarks can run faster than real time.
+    time_scale: float = 1.0
+    responder: Callable[[LlmRequest], str] = schema_reply
+    calls: List[dict] = []
+    _rng: Optional[random.Random] = PrivateAttr(default=None)
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"gemini-.*-stub"]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        started = time.perf_counter()
+        reply = self.responder(llm_request)
+        prompt_tokens = estimate_tokens(request_text(llm_request))
+        output_tokens = estimate_tokens(reply)
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens,
+        )
+        prefill = self.first_token_latency + self.seconds_per_1k_prompt_tokens * prompt_tokens / 1000
+        tools = (llm_request.config.tools if llm_request.config else None) or []
+        searched = any(tool.google_search for tool in tools)
+        if searched:
+            prefill += self.search_latency
+        if self._rng is None:
+            self._rng = random.Random(self.seed)
+        spiked = bool(self.spike_rate) and self._rng.random() < self.spike_rate
+        if spiked:
+            prefill += self.spike_latency
+        if self.error_rate and self._rng.random() < self.error_rate:
+            await asyncio.sleep(self.first_token_latency / self.time_scale)
+            code = self._rng.choice(self.error_codes)
+            self.calls.append({"latency_s": time.perf_counter() - started, "error": code})
+            error_type = errors.ClientError if code < 500 else errors.ServerError
+            raise error_type(code, {"error": {"code": code, "message": "Injected by StubLlm"}})
+        decode = self.seconds_per_output_token * output_tokens
+        await asyncio.sleep(prefill / self.time_scale)
+
+        if stream:
+            words = reply.split(" ")
+            chunk = max(1, len(words) // 4)
+            for start in range(0, len(words), chunk):
+                text = " ".join(words[start:start + chunk])
+                if start + chunk < len(words):
+                    text += " "
+                await asyncio.sleep(decode * chunk / len(words) / self.time_scale)
+                yield LlmResponse(
+                    content=types.Content(role="model", parts=[types.Part(text=text)]),
+                    partial=True,
+                )
+        else:
+            await asyncio.sleep(decode / self.time_scale)
+
+        self.calls.append(
+            {
+                "prompt_tokens": prompt_tokens,
+                "output_tokens": output_tokens,
+                "latency_s": time.perf_counter() - started,
+                "searched": searched,
+                "spiked": spiked,
+            }
+        )
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=reply)]),
+            usage_metadata=usage,
+            grounding_metadata=(
+                types.GroundingMetadata(web_search_queries=[request_text(llm_request)[-80:]])
+                if searched
+                else None
+            ),
+        )
+
+
+def stub_model(time_scale: float = 1.0, responder: Optional[Callable] = None) -> StubLlm:
+    """A fresh stub with its own call log."""
+    stub = StubLlm(time_scale=time_scale, calls=[])
+    if responder:
+        stub.responder = responder
+    return stub
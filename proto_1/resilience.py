@@ -0,0 +1,240 @@
+"""Retries and hedged requests around every model call.
+
+``use_resilience`` swaps each LlmAgent's model in a pipeline for a
+``ResilientLlm`` wrapping the original, the same way ``use_cassette`` does:
+
+- retryable errors (429, 500, 502, 503, 504) are retried up to
+  ``attempts`` times with full-jitter exponential backoff, as long as
+  nothing has been streamed to the caller yet; a ``Retry-After`` from the
+  server replaces the backoff, and one longer than ``max_delay`` ends the
+  retries
+- with ``hedge_percentile`` set, a call that has not produced its first
+  chunk by that percentile of the agent's recent first-chunk latencies gets
+  a duplicate request; whichever answers first is used and the other is
+  cancelled
+
+This is the only layer that retries once a turn is running. The client
+side (``deployment/events.py``) shares ``is_retryable`` and
+``retry_delay`` but only resends a ``stream_query`` the engine refused
+before accepting it, which never reached a model, so the two never
+multiply.
+"""
+import asyncio
+import random
+from collections import Counter, deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncGenerator, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from pydantic import PrivateAttr
+
+from . import settings
+
+RETRYABLE_CODES = frozenset({429, 500, 502, 503, 504})
+
+# "<agent>.retried", ".hedged", ".hedge_won" and ".failed" per agent.
+STATS: Counter = Counter()
+
+_END = object()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for rate-limit and transient server errors from genai, api_core or HTTP clients."""
+    for attribute in ("code", "status_code"):
+        code = getattr(error, attribute, None)
+        code = getattr(code, "value", code)
+        if isinstance(code, int):
+            return code in RETRYABLE_CODES
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in RETRYABLE_CODES
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng=random) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return rng.uniform(0.0, min(cap, base * 2 ** attempt))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked to wait before retrying, from ``Retry-After``."""
+    seconds = getattr(error, "retry_after", None)
+    if seconds is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        value = headers.get("Retry-After") if hasattr(headers, "get") else None
+        if value is None:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                return None
+    return max(0.0, float(seconds))
+
+
+def retry_delay(error: BaseException, attempt: int, base: float, cap: float, rng=random) -> Optional[float]:
+    """Backoff before retrying ``error``, or its ``Retry-After``; None when that exceeds ``cap``."""
+    asked = retry_after(error)
+    if asked is None:
+        return backoff_delay(attempt, base, cap, rng)
+    return asked if asked <= cap else None
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class _Attempt:
+    """Runs one model request in a task, buffering its responses."""
+
+    def __init__(self, model: BaseLlm, llm_request: LlmRequest, stream: bool):
+        self.responses: asyncio.Queue = asyncio.Queue()
+        # Set once the first response (or an error) is available.
+        self.first = asyncio.Event()
+        # The error, when the request failed before producing anything.
+        self.error: Optional[Exception] = None
+        self.task = asyncio.create_task(self._run(model, llm_request, stream))
+
+    async def _run(self, model, llm_request, stream):
+        generator = model.generate_content_async(llm_request, stream=stream)
+        try:
+            async for response in generator:
+                self.responses.put_nowait(response)
+                self.first.set()
+            self.responses.put_nowait(_END)
+        except Exception as error:
+            if not self.first.is_set():
+                self.error = error
+            self.responses.put_nowait(error)
+        finally:
+            self.first.set()
+            await generator.aclose()
+
+    def cancel(self) -> None:
+        self.task.cancel()
+
+
+class ResilientLlm(BaseLlm):
+    """Model wrapper adding retries with backoff and optional hedging."""
+
+    model: str = "resilient"
+    agent_name: str
+    inner: BaseLlm
+    attempts: int = 3
+    base_delay: float = 0.25
+    max_delay: float = 4.0
+    # Percentile of recent first-chunk latencies after which to hedge; 0 disables.
+    hedge_percentile: float = 0.0
+    # First-chunk latencies observed before hedging starts.
+    min_samples: int = 20
+    _latencies: deque = PrivateAttr(default_factory=lambda: deque(maxlen=200))
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge_percentile or len(self._latencies) < self.min_samples:
+            return None
+        return _percentile(self._latencies, self.hedge_percentile)
+
+    async def _first_of(self, llm_request: LlmRequest, stream: bool) -> _Attempt:
+        """Starts the request, hedges it if it is slow, and returns the attempt that answered."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        primary = _Attempt(self.inner, llm_request, stream)
+        attempts = [primary]
+        delay = self.hedge_delay()
+        if delay is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(primary.first.wait()), delay)
+            except asyncio.TimeoutError:
+                STATS[f"{self.agent_name}.hedged"] += 1
+                attempts.append(_Attempt(self.inner, llm_request.model_copy(deep=True), stream))
+        try:
+            while True:
+                waits = {asyncio.ensure_future(attempt.first.wait()): attempt for attempt in attempts}
+                done, pending = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+                for future in pending:
+                    future.cancel()
+                winner = waits[done.pop()]
+                if winner.error is not None and len(attempts) > 1:
+                    # This copy failed; the other may still answer.
+                    attempts.remove(winner)
+                    continue
+                break
+        except BaseException:
+            for attempt in attempts:
+                attempt.cancel()
+            raise
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+        if winner.error is None:
+            self._latencies.append(loop.time() - started)
+            if winner is not primary:
+                STATS[f"{self.agent_name}.hedge_won"] += 1
+        return winner
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        for attempt in range(self.attempts):
+            winner = await self._first_of(llm_request, stream)
+            yielded = False
+            try:
+                while True:
+                    item = await winner.responses.get()
+                    if item is _END:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yielded = True
+                    yield item
+            except Exception as error:
+                delay = None
+                if not yielded and is_retryable(error) and attempt < self.attempts - 1:
+                    delay = retry_delay(error, attempt, self.base_delay, self.max_delay)
+                if delay is None:
+                    STATS[f"{self.agent_name}.failed"] += 1
+                    raise
+                STATS[f"{self.agent_name}.retried"] += 1
+                await asyncio.sleep(delay)
+            finally:
+                winner.cancel()
+
+
+def _llm_agents(agent):
+    if hasattr(agent, "canonical_model"):
+        yield agent
+    for sub_agent in agent.sub_agents:
+        yield from _llm_agents(sub_agent)
+
+
+def use_resilience(
+    agent,
+    attempts: Optional[int] = None,
+    base_delay: Optional[float] = None,
+    max_delay: Optional[float] = None,
+    hedge_percentile: Optional[float] = None,
+):
+    """Wraps every LlmAgent's model under ``agent`` in place and returns ``agent``.
+
+    Unset arguments come from ``settings``.
+    """
+    for llm_agent in _llm_agents(agent):
+        inner = llm_agent.canonical_model
+        if isinstance(inner, ResilientLlm):
+            continue
+        llm_agent.model = ResilientLlm(
+            # Keeps the wrapped model's name: built-in tools such as
+            # google_search check it.
+            model=inner.model,
+            agent_name=llm_agent.name,
+            inner=inner,
+            attempts=settings.RETRY_ATTEMPTS if attempts is None else attempts,
+            base_delay=settings.RETRY_BASE_DELAY if base_delay is None else base_delay,
+            max_delay=settings.RETRY_MAX_DELAY if max_delay is None else max_delay,
+            hedge_percentile=settings.HEDGE_PERCENTILE if hedge_percentile is None else hedge_percentile,
+        )
+    return agent
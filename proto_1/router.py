@@ -0,0 +1,193 @@
+"""Adaptive routing of each message through a reduced context stage.
+
+"thanks" or "ok" don't need entity extraction with coreference resolution,
+and often not an intent model call either. ``route`` looks at cheap local
+features of the message (length, third-person pronouns, likely named
+entities, people or topics named with a possessive such as "my mom" or "my
+exam", non-Latin script, the crisis screen) and picks one of three plans:
+
+- ``tone``: only the tone agent calls its model; trivial small talk and thanks
+- ``intent_tone``: intent and tone; short messages with nothing to resolve
+- ``full``: entity, intent and tone; anything long, referential or safety-related
+
+``route_turn`` runs as a before_agent_callback of the pipeline and writes the
+decision to ``state["route"]`` and the log. ``skip_unrouted`` is the first
+before_model_callback of every context agent: agents outside the plan
+answer locally in the same schema, so compaction and the output agent see
+the usual shape. A skipped entity agent repeats the last known entity
+context, as a late one does in ``proto_1.deadlines``, so a turn without
+entities doesn't erase the topics of earlier turns; a skipped intent agent
+gives the lexicon's intent.
+
+Only the parallel context stage is reduced; the fused agent is a single
+call either way and always runs.
+"""
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Tuple
+
+from . import settings
+from .cascade import intent_payloads
+from .crisis import assess as assess_crisis
+from .deadlines import fallback
+from .utils import content_text, json_response
+
+logger = logging.getLogger(__name__)
+
+ROUTE_KEY = "route"
+
+TONE = "tone"
+INTENT_TONE = "intent_tone"
+FULL = "full"
+
+PLAN_AGENTS = {
+    TONE: ("tone",),
+    INTENT_TONE: ("intent", "tone"),
+    FULL: ("entity", "intent", "tone"),
+}
+
+# Intents the lexicon may settle on its own for a plan without the intent agent.
+TRIVIAL_INTENTS = frozenset({"small_talk", "gratitude_expression"})
+TRIVIAL_TOKENS = 4
+
+# Pronouns whose referent lives in an earlier turn or another clause.
+PRONOUNS = frozenset(
+    {"he", "she", "him", "her", "his", "hers", "they", "them", "their", "theirs", "it"}
+)
+
+POSSESSIVES = frozenset({"my", "our", "your"})
+# People and topics the entity agent should pick up after a possessive.
+RELATION_NOUNS = frozenset(
+    {
+        "mom", "mum", "mother", "dad", "father", "parent", "brother", "sister", "sibling",
+        "son", "daughter", "kid", "child", "children", "wife", "husband", "partner",
+        "boyfriend", "girlfriend", "ex", "friend", "bestie", "boss", "manager", "teacher",
+        "professor", "coworker", "colleague", "roommate", "family", "grandma", "grandmother",
+        "grandpa", "grandfather", "aunt", "uncle", "cousin", "doctor", "therapist", "landlord",
+        "exam", "test", "result", "grade", "job", "work", "school", "college", "class",
+        "interview", "relationship", "marriage", "pet", "dog", "cat",
+    }
+)
+# Words allowed between the possessive and the noun ("my best friend").
+RELATION_GAP = 2
+
+# Plans chosen, plus "<agent>.skipped" for every model call avoided.
+STATS: Counter = Counter()
+
+_WORD = re.compile(r"[\w']+")
+_SENTENCE_END = re.compile(r"[.!?]")
+_TOKEN = re.compile(r"[\w']+|[.!?]")
+
+
+@dataclass(frozen=True)
+class Route:
+    plan: str
+    reasons: Tuple[str, ...]
+    tokens: int
+
+    @property
+    def agents(self) -> Tuple[str, ...]:
+        return PLAN_AGENTS[self.plan]
+
+    def as_state(self) -> dict:
+        return {"plan": self.plan, "agents": list(self.agents), "reasons": list(self.reasons)}
+
+
+def _named_entities(text: str) -> bool:
+    """Capitalized words that don't start a sentence, or numbers (dates, ages, amounts)."""
+    sentence_start = True
+    for match in _TOKEN.finditer(text):
+        word = match.group()
+        if _SENTENCE_END.fullmatch(word):
+            sentence_start = True
+            continue
+        if word.isdigit():
+            return True
+        if not sentence_start and word[0].isupper() and word not in ("I", "I'm", "I've", "I'd", "I'll"):
+            return True
+        sentence_start = False
+    return False
+
+
+def _relations(words) -> bool:
+    """A possessive followed closely by a person or topic ("my mom", "our final exam")."""
+    for index, word in enumerate(words):
+        if word not in POSSESSIVES:
+            continue
+        for noun in words[index + 1 : index + 2 + RELATION_GAP]:
+            if noun in RELATION_NOUNS or (noun.endswith("s") and noun[:-1] in RELATION_NOUNS):
+                return True
+    return False
+
+
+def route(text: str) -> Route:
+    """Picks the context plan for ``text`` from local features only."""
+    words = _WORD.findall(text)
+    # "it's" and "she'll" count as their pronoun.
+    stems = [word.lower().split("'")[0] for word in words]
+    lowered = set(stems)
+    reasons = []
+    if assess_crisis(text).matches:
+        reasons.append("safety")
+    if not text.isascii():
+        # No cheap entity or pronoun cues outside Latin script.
+        reasons.append("script")
+    if lowered & PRONOUNS:
+        reasons.append("pronoun")
+    if _named_entities(text):
+        reasons.append("named_entity")
+    if _relations(stems):
+        reasons.append("relation")
+    if len(words) > settings.ROUTER_SHORT_TOKENS:
+        reasons.append("long")
+    if reasons:
+        return Route(FULL, tuple(reasons), len(words))
+
+    payload, confidence = intent_payloads([text])[0]
+    if (
+        len(words) <= TRIVIAL_TOKENS
+        and payload["primary_intent"] in TRIVIAL_INTENTS
+        and confidence >= settings.CASCADE_THRESHOLD
+    ):
+        return Route(TONE, ("trivial",), len(words))
+    return Route(INTENT_TONE, ("short",), len(words))
+
+
+def route_turn(callback_context):
+    """before_agent_callback: records this turn's plan in ``state["route"]``."""
+    text = content_text(callback_context.user_content)
+    if not text:
+        callback_context.state[ROUTE_KEY] = None
+        return None
+    decision = route(text)
+    STATS[decision.plan] += 1
+    callback_context.state[ROUTE_KEY] = decision.as_state()
+    logger.info(
+        "route invocation=%s plan=%s reasons=%s tokens=%d",
+        callback_context.invocation_id,
+        decision.plan,
+        ",".join(decision.reasons),
+        decision.tokens,
+    )
+    return None
+
+
+def _local_reply(agent: str, text: str, state) -> dict:
+    if agent == "intent":
+        payload, _ = intent_payloads([text])[0]
+        return {**payload, "rationale": "Routed past the intent agent; " + payload["rationale"]}
+    return fallback("entity", text, state)
+
+
+def skip_unrouted(callback_context, llm_request):
+    """before_model_callback: answers locally when the turn's plan leaves this agent out."""
+    decision = callback_context.state.get(ROUTE_KEY)
+    agent = callback_context.agent_name
+    if not decision or agent in decision["agents"] or agent not in PLAN_AGENTS[FULL]:
+        return None
+    STATS[f"{agent}.skipped"] += 1
+    return json_response(
+        _local_reply(agent, content_text(callback_context.user_content), callback_context.state)
+    )
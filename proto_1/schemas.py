@@ -0,0 +1,55 @@
+"""Typed output schemas of the context agents.
+
+Field names mirror the JSON schemas spelled out in each agent's
+instruction, so the same models validate LLM output, cascade output and the
+fused agent's combined report.
+"""
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class Entity(BaseModel):
+    text: str
+    type: str
+    normalized_value: str
+    is_sensitive: bool = False
+    confidence_score: float = 1.0
+    coreference_target: Optional[str] = None
+
+
+class EntityReport(BaseModel):
+    topic_summary: str = ""
+    entities: List[Entity] = Field(default_factory=list)
+
+
+class IntentReport(BaseModel):
+    primary_intent: str
+    secondary_intents: List[str] = Field(default_factory=list)
+    confidence_score: float = 0.0
+    rationale: str = ""
+
+
+class ToneReport(BaseModel):
+    primary_emotion: str
+    secondary_emotions: List[str] = Field(default_factory=list)
+    sentiment: str = "neutral"
+    intensity_score: float = 0.0
+    rationale: str = ""
+
+
+class ContextReport(BaseModel):
+    """Combined output of the fused context agent."""
+
+    entity: EntityReport = Field(default_factory=EntityReport)
+    intent: IntentReport
+    tone: ToneReport
+
+
+# Agent name -> schema of its final JSON reply.
+AGENT_SCHEMAS = {
+    "entity": EntityReport,
+    "intent": IntentReport,
+    "tone": ToneReport,
+    "context_agent": ContextReport,
+}
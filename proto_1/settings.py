@@ -0,0 +1,183 @@
+"""Deployment-time knobs for the Saarthi pipeline, read from the environment.
+
+Values come from the process environment, falling back to ``proto_1/.env``.
+Every variable is prefixed with ``SAARTHI_`` so ``deployment/remote.py`` can
+forward them to the Agent Engine runtime.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+ENV_PREFIX = "SAARTHI_"
+
+
+def _flag(name: str, default: bool) -> bool:
+    value = os.getenv(ENV_PREFIX + name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _mapping(name: str, cast) -> dict:
+    """Parses "key=value,key=value" into a dict."""
+    value = os.getenv(ENV_PREFIX + name, "")
+    pairs = (item.split("=", 1) for item in value.split(",") if "=" in item)
+    return {key.strip(): cast(val.strip()) for key, val in pairs}
+
+
+MODEL = os.getenv(ENV_PREFIX + "MODEL", "gemini-2.0-flash")
+
+# "parallel" runs the entity, intent and tone agents side by side; "fused"
+# asks a single agent for all three analyses in one structured call.
+CONTEXT_MODE = os.getenv(ENV_PREFIX + "CONTEXT_MODE", "parallel")
+
+# Context agents write compact results to session state and agents see only
+# the user-visible dialogue instead of every internal JSON event.
+COMPACT_HISTORY = _flag("COMPACT_HISTORY", True)
+
+# Rolling summary: the last HISTORY_KEEP_TURNS turns stay verbatim, older
+# turns are folded into a summary, and each agent's prompt is held to a token
+# budget (HISTORY_BUDGETS overrides per agent, e.g. "entity=2000,output_agent=6000").
+SUMMARIZE_HISTORY = _flag("SUMMARIZE_HISTORY", True)
+HISTORY_KEEP_TURNS = int(os.getenv(ENV_PREFIX + "HISTORY_KEEP_TURNS", "6"))
+HISTORY_FOLD_EVERY = int(os.getenv(ENV_PREFIX + "HISTORY_FOLD_EVERY", "3"))
+HISTORY_BUDGET = int(os.getenv(ENV_PREFIX + "HISTORY_BUDGET", "6000"))
+HISTORY_BUDGETS = _mapping("HISTORY_BUDGETS", int)
+SUMMARY_MAX_TOKENS = int(os.getenv(ENV_PREFIX + "SUMMARY_MAX_TOKENS", "400"))
+
+# Cheap-first cascade in front of the intent and tone agents.
+CASCADE_ENABLED = _flag("CASCADE_ENABLED", True)
+CASCADE_THRESHOLD = float(os.getenv(ENV_PREFIX + "CASCADE_THRESHOLD", "0.85"))
+
+# Model calls are retried on 429/5xx with full-jitter exponential backoff
+# (RETRY_ATTEMPTS counts the first try), or after the server's Retry-After
+# when that fits in RETRY_MAX_DELAY. Clients use the same budget to resend a
+# stream_query only when it was refused before the turn started.
+# HEDGE_PERCENTILE > 0 sends a duplicate request once a call is slower than
+# that percentile of the agent's recent first-chunk latencies.
+RETRY_ATTEMPTS = int(os.getenv(ENV_PREFIX + "RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv(ENV_PREFIX + "RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = float(os.getenv(ENV_PREFIX + "RETRY_MAX_DELAY", "4.0"))
+HEDGE_PERCENTILE = float(os.getenv(ENV_PREFIX + "HEDGE_PERCENTILE", "0"))
+
+# Per-agent deadlines for the parallel context stage, in seconds from its
+# start (CONTEXT_DEADLINES overrides per agent, e.g. "entity=1.5,tone=1.0";
+# 0 waits indefinitely). A late agent's context falls back to a default and
+# its result is kept for the next turn.
+CONTEXT_DEADLINE = float(os.getenv(ENV_PREFIX + "CONTEXT_DEADLINE", "3.0"))
+CONTEXT_DEADLINES = _mapping("CONTEXT_DEADLINES", float)
+
+# Speculative drafting: output_agent starts from the raw message with locally
+# assumed intent/tone, and the draft is used only if the context stage agrees.
+SPECULATE = _flag("SPECULATE", False)
+
+# Adaptive router: short messages with no pronouns, named people or topics or
+# safety cues skip the entity agent (and, when trivial, the intent agent too).
+ROUTER_ENABLED = _flag("ROUTER_ENABLED", True)
+ROUTER_SHORT_TOKENS = int(os.getenv(ENV_PREFIX + "ROUTER_SHORT_TOKENS", "12"))
+
+# The output agent only keeps its google_search tool for these intents.
+GATE_SEARCH = _flag("GATE_SEARCH", True)
+GROUNDED_INTENTS = frozenset(
+    intent.strip()
+    for intent in os.getenv(
+        ENV_PREFIX + "GROUNDED_INTENTS", "factual_query,explanation_seeking,seeking_advice"
+    ).split(",")
+    if intent.strip()
+)
+
+# Per-stage latency spans: appended as OTLP/JSON lines to TRACE_FILE and/or
+# POSTed to an OTLP/HTTP collector (e.g. "http://localhost:4318").
+TRACE_FILE = os.getenv(ENV_PREFIX + "TRACE_FILE", "")
+OTLP_ENDPOINT = os.getenv(ENV_PREFIX + "OTLP_ENDPOINT", "")
+
+# "remote" talks to the deployed Agent Engine; "local" runs the pipeline
+# in-process (see deployment/local.py) on MODEL_BACKEND: "gemini", "stub"
+# (simulated latency), "fake" (instant, deterministic) or "cassette"
+# (replays CASSETTE_PATH). Local sessions live in memory unless SESSION_DB
+# names a database URL such as "sqlite:///saarthi_sessions.db".
+RUNTIME = os.getenv(ENV_PREFIX + "RUNTIME", "remote")
+MODEL_BACKEND = os.getenv(ENV_PREFIX + "MODEL_BACKEND", "gemini")
+CASSETTE_PATH = os.getenv(ENV_PREFIX + "CASSETTE_PATH", "")
+CASSETTE_MODE = os.getenv(ENV_PREFIX + "CASSETTE_MODE", "replay")
+SESSION_DB = os.getenv(ENV_PREFIX + "SESSION_DB", "")
+
+# deployment/gateway.py: an asyncio front end multiplexing client sessions
+# over one engine handle. GATEWAY_URL (e.g. "http://localhost:8080") makes
+# app.py talk to a running gateway instead of the engine.
+GATEWAY_URL = os.getenv(ENV_PREFIX + "GATEWAY_URL", "")
+GATEWAY_HOST = os.getenv(ENV_PREFIX + "GATEWAY_HOST", "127.0.0.1")
+GATEWAY_PORT = int(os.getenv(ENV_PREFIX + "GATEWAY_PORT", "8080"))
+
+# Outbound scheduler (deployment/scheduler.py) in front of every stream_query
+# sent from app.py or the gateway. RATE_LIMITS caps each quota dimension in
+# units per minute (e.g. "turns=300,gemini-2.0-flash=1200"); RATE_COSTS says
+# how many units one turn takes (e.g. "gemini-2.0-flash=4", default 1). A
+# bucket banks up to RATE_BURST_SECONDS of its rate. Beyond
+# SCHEDULER_MAX_QUEUE waiting turns new ones are refused; a turn gives up
+# after SCHEDULER_MAX_WAIT seconds in the queue.
+RATE_LIMITS = _mapping("RATE_LIMITS", float)
+RATE_COSTS = _mapping("RATE_COSTS", float)
+RATE_BURST_SECONDS = float(os.getenv(ENV_PREFIX + "RATE_BURST_SECONDS", "1.0"))
+SCHEDULER_MAX_QUEUE = int(os.getenv(ENV_PREFIX + "SCHEDULER_MAX_QUEUE", "100"))
+SCHEDULER_MAX_WAIT = float(os.getenv(ENV_PREFIX + "SCHEDULER_MAX_WAIT", "30"))
+
+# app.py hands out pre-created sessions (deployment/session_pool.py):
+# SESSION_POOL_SIZE ready for new visitors, SESSION_POOL_SPARES per active
+# user for "Start New Session". Spares are off by default, since each one is
+# a create_session call that most visitors never use. Unused sessions are
+# deleted after SESSION_POOL_TTL seconds.
+SESSION_POOL_SIZE = int(os.getenv(ENV_PREFIX + "SESSION_POOL_SIZE", "2"))
+SESSION_POOL_SPARES = int(os.getenv(ENV_PREFIX + "SESSION_POOL_SPARES", "0"))
+SESSION_POOL_TTL = float(os.getenv(ENV_PREFIX + "SESSION_POOL_TTL", "1800"))
+
+# app.py keeps the newest TRANSCRIPT_WINDOW messages of a chat in memory and
+# moves older ones to a SQLite file at TRANSCRIPT_PATH (default: one per
+# process in a private temp directory, removed at exit), read back when the
+# user pages up.
+TRANSCRIPT_WINDOW = int(os.getenv(ENV_PREFIX + "TRANSCRIPT_WINDOW", "200"))
+TRANSCRIPT_PATH = os.getenv(ENV_PREFIX + "TRANSCRIPT_PATH", "")
+
+# With COALESCE_WINDOW > 0, app.py waits that many seconds after a message
+# for more before sending them together as one turn, but no longer than
+# COALESCE_MAX_WAIT after the first (deployment/coalesce.py).
+COALESCE_WINDOW = float(os.getenv(ENV_PREFIX + "COALESCE_WINDOW", "0"))
+COALESCE_MAX_WAIT = float(os.getenv(ENV_PREFIX + "COALESCE_MAX_WAIT", "6"))
+
+# DEPLOYMENTS ("us=projects/.../reasoningEngines/1,eu=...") makes app.py and
+# remote.py route sessions across several engines (deployment/routing.py):
+# latency and error rate are EWMAs with weight ROUTER_ALPHA; a deployment with
+# ROUTER_EJECT_AFTER failures in a row, or an error rate above
+# ROUTER_EJECT_ERROR_RATE, is skipped for ROUTER_COOLDOWN seconds; and
+# ROUTER_EXPLORE of new sessions go to a random deployment.
+DEPLOYMENTS = _mapping("DEPLOYMENTS", str)
+ROUTER_ALPHA = float(os.getenv(ENV_PREFIX + "ROUTER_ALPHA", "0.2"))
+ROUTER_EJECT_AFTER = int(os.getenv(ENV_PREFIX + "ROUTER_EJECT_AFTER", "3"))
+ROUTER_EJECT_ERROR_RATE = float(os.getenv(ENV_PREFIX + "ROUTER_EJECT_ERROR_RATE", "0.5"))
+ROUTER_COOLDOWN = float(os.getenv(ENV_PREFIX + "ROUTER_COOLDOWN", "30"))
+ROUTER_EXPLORE = float(os.getenv(ENV_PREFIX + "ROUTER_EXPLORE", "0.05"))
+
+# Only meaningful on the machine running local mode or the gateway; never forwarded.
+LOCAL_ONLY = frozenset(
+    ENV_PREFIX + name
+    for name in (
+        "RUNTIME", "MODEL_BACKEND", "CASSETTE_PATH", "CASSETTE_MODE", "SESSION_DB",
+        "GATEWAY_URL", "GATEWAY_HOST", "GATEWAY_PORT",
+        "RATE_LIMITS", "RATE_COSTS", "RATE_BURST_SECONDS", "SCHEDULER_MAX_QUEUE", "SCHEDULER_MAX_WAIT",
+        "SESSION_POOL_SIZE", "SESSION_POOL_SPARES", "SESSION_POOL_TTL",
+        "TRANSCRIPT_WINDOW", "TRANSCRIPT_PATH", "COALESCE_WINDOW", "COALESCE_MAX_WAIT",
+        "DEPLOYMENTS", "ROUTER_ALPHA", "ROUTER_EJECT_AFTER", "ROUTER_EJECT_ERROR_RATE", "ROUTER_COOLDOWN",
+        "ROUTER_EXPLORE",
+    )
+)
+
+
+def deployment_env() -> dict:
+    """SAARTHI_* variables to forward to a deployed Agent Engine."""
+    return {
+        key: value
+        for key, value in os.environ.items()
+        if key.startswith(ENV_PREFIX) and key not in LOCAL_ONLY
+    }
@@ -0,0 +1,247 @@
+"""Speculative output drafting while the context stage runs.
+
+``SpeculativeAgent`` runs the same ``[context_agent, output_agent]``
+sequence as ``final_agent``, but starts a draft reply as soon as the turn
+begins. The drafter is a copy of the output agent whose prompt is filled
+with *assumed* context: the local lexicon's intent and tone for the message
+and the entity context of the previous turn. Its events are kept out of
+the session.
+
+Once the context stage finishes the draft is:
+
+- committed, when the crisis screen and the context agents found no safety
+  intent, the real intent calls for the same kind of reply as the assumed
+  one (``REPLY_MODES``, after the output agent's guidelines) and the
+  sentiment is not the opposite of the assumed one; the draft is then
+  emitted as the output agent's reply, typically well before a fresh
+  generation would have finished. With SSE its chunks are forwarded as the
+  output agent's partial events: those drafted while the context stage ran
+  at once, the rest as they arrive
+- discarded otherwise, and the output agent runs with the full context as
+  it always did
+
+Messages the local screen flags, or whose assumed intent needs search
+grounding, are not drafted at all. Each turn's outcome is written to
+``state["speculation"]``; ``STATS`` counts drafts, commits and the reasons
+for discards.
+"""
+import asyncio
+import re
+import time
+from collections import Counter
+from typing import AsyncGenerator, Optional, Tuple
+
+from google.adk.agents import LlmAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+
+from . import settings
+from .cascade import INTENT_MODEL, SAFETY_INTENTS, TONE_MODEL, intent_payloads, tone_payloads
+from .history import CONTEXT_KEYS, compact
+from .schemas import EntityReport
+from .utils import content_text
+
+SPECULATION_KEY = "speculation"
+DRAFT_SUFFIX = "_draft"
+
+# "drafted", "committed", "discarded.<reason>" and "skipped.<reason>".
+STATS: Counter = Counter()
+
+_END = object()
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\??\}")
+
+# Intent -> the kind of reply output_agent's guidelines ask for. A draft
+# stands when the real intent asks for the same kind of reply.
+REPLY_MODES = {
+    **dict.fromkeys(
+        ("sharing_feelings", "venting", "seeking_comfort", "seeking_companionship"), "listen"
+    ),
+    **dict.fromkeys(("seeking_advice", "factual_query", "explanation_seeking"), "inform"),
+    **dict.fromkeys(("small_talk", "gratitude_expression", "celebrating_success"), "warm"),
+    **dict.fromkeys(SAFETY_INTENTS, "safety"),
+}
+# Assumed when the lexicon finds no cue at all: listen, without presuming a mood.
+DEFAULT_INTENT = "sharing_feelings"
+DEFAULT_SENTIMENT = "neutral"
+
+
+def assumptions(text: str, state) -> dict:
+    """Context the draft is written against, in the compact state shape."""
+    intent, _ = intent_payloads([text])[0]
+    tone, _ = tone_payloads([text])[0]
+    if not INTENT_MODEL.predict([text])[0].cues:
+        intent = {**intent, "primary_intent": DEFAULT_INTENT, "secondary_intents": []}
+    if not TONE_MODEL.predict([text])[0].cues:
+        tone = {**tone, "sentiment": DEFAULT_SENTIMENT}
+    entity = state.get(CONTEXT_KEYS["entity"])
+    return {
+        CONTEXT_KEYS["entity"]: entity if isinstance(entity, dict) else compact(
+            "entity", EntityReport().model_dump()
+        ),
+        CONTEXT_KEYS["intent"]: compact("intent", intent),
+        CONTEXT_KEYS["tone"]: compact("tone", tone),
+        "crisis_flag": state.get("crisis_flag", "none"),
+    }
+
+
+def skip_reason(assumed: dict) -> Optional[str]:
+    """Why a message should not be drafted, or None."""
+    if assumed["crisis_flag"] != "none":
+        return "crisis"
+    intent = assumed[CONTEXT_KEYS["intent"]]["primary_intent"]
+    if intent in SAFETY_INTENTS:
+        return "safety_intent"
+    if settings.GATE_SEARCH and intent in settings.GROUNDED_INTENTS:
+        return "grounded_intent"
+    return None
+
+
+def verdict(assumed: dict, state) -> Tuple[bool, str]:
+    """Whether the context stage confirmed the draft's assumptions."""
+    intent = state.get(CONTEXT_KEYS["intent"]) or {}
+    tone = state.get(CONTEXT_KEYS["tone"]) or {}
+    if state.get("crisis_flag", "none") != "none":
+        return False, "crisis"
+    if intent.get("primary_intent") in SAFETY_INTENTS:
+        return False, "safety_intent"
+    expected = REPLY_MODES.get(assumed[CONTEXT_KEYS["intent"]]["primary_intent"])
+    if REPLY_MODES.get(intent.get("primary_intent")) != expected:
+        return False, "intent_mismatch"
+    sentiments = {tone.get("sentiment"), assumed[CONTEXT_KEYS["tone"]]["sentiment"]}
+    if sentiments == {"positive", "negative"}:
+        return False, "tone_mismatch"
+    return True, "confirmed"
+
+
+def make_drafter(output_agent: LlmAgent, history_callback) -> LlmAgent:
+    """Copy of ``output_agent`` prompted with assumed context and no tools."""
+    template = output_agent.instruction
+
+    def instruction(readonly_context):
+        text = content_text(readonly_context.user_content)
+        values = assumptions(text, readonly_context.state)
+        return _PLACEHOLDER.sub(lambda match: str(values.get(match.group(1), "")), template)
+
+    return output_agent.clone(
+        update={
+            "name": output_agent.name + DRAFT_SUFFIX,
+            "instruction": instruction,
+            "tools": [],
+            "before_model_callback": history_callback,
+            "after_model_callback": None,
+        }
+    )
+
+
+class SpeculativeAgent(SequentialAgent):
+    """``[context_agent, output_agent]`` with the reply drafted in parallel.
+
+    The drafter is the third sub-agent, so model wrappers and tracing treat
+    it like any other agent; it only ever runs through ``_draft``.
+    """
+
+    def _event(self, ctx: InvocationContext, **fields) -> Event:
+        fields.setdefault("author", self.name)
+        return Event(invocation_id=ctx.invocation_id, branch=ctx.branch, **fields)
+
+    async def _draft(
+        self, drafter: LlmAgent, ctx: InvocationContext, partials: asyncio.Queue
+    ) -> Optional[Event]:
+        """Runs the drafter on its own branch and returns its final reply event.
+
+        Partial events go to ``partials`` as they arrive, followed by ``_END``.
+        """
+        branch = f"{ctx.branch}.{drafter.name}" if ctx.branch else drafter.name
+        final = None
+        try:
+            async for event in drafter.run_async(ctx.model_copy(update={"branch": branch})):
+                if not event.content:
+                    continue
+                if event.partial:
+                    partials.put_nowait(event)
+                else:
+                    final = event
+        finally:
+            partials.put_nowait(_END)
+        return final
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        context_agent, output_agent, drafter = self.sub_agents
+        text = content_text(ctx.user_content)
+        assumed = assumptions(text, ctx.session.state)
+        reason = skip_reason(assumed) if text else "no_text"
+        if reason:
+            STATS[f"skipped.{reason}"] += 1
+            outcome = {"drafted": False, "reason": reason}
+            yield self._event(ctx, actions=EventActions(state_delta={SPECULATION_KEY: outcome}))
+            for agent in (context_agent, output_agent):
+                async for event in agent.run_async(ctx):
+                    yield event
+            return
+
+        STATS["drafted"] += 1
+        started, started_at = time.monotonic(), time.time()
+        partials: asyncio.Queue = asyncio.Queue()
+        draft = asyncio.create_task(self._draft(drafter, ctx, partials))
+        try:
+            async for event in context_agent.run_async(ctx):
+                yield event
+            context_s = time.monotonic() - started
+
+            committed, reason = verdict(assumed, ctx.session.state)
+            final = None
+            if committed:
+                streamed = False
+                while (partial := await partials.get()) is not _END:
+                    streamed = True
+                    yield self._event(
+                        ctx, author=output_agent.name, content=partial.content, partial=True
+                    )
+                try:
+                    final = await draft
+                except Exception:
+                    if streamed:
+                        # Part of the reply is out; fail like output_agent would.
+                        raise
+                    final = None
+                if final is None or not content_text(final.content):
+                    committed, reason = False, "draft_failed"
+            outcome = {
+                "drafted": True,
+                "committed": committed,
+                "reason": reason,
+                "context_s": round(context_s, 4),
+            }
+            if committed:
+                ready_s = time.monotonic() - started
+                # A fresh reply would have started at context_s and taken as
+                # long as the draft did.
+                draft_s = final.timestamp - started_at
+                outcome["saved_s"] = round(max(0.0, context_s + draft_s - ready_s), 4)
+                STATS["committed"] += 1
+                yield Event(
+                    invocation_id=ctx.invocation_id,
+                    author=output_agent.name,
+                    branch=ctx.branch,
+                    content=final.content,
+                    custom_metadata=final.custom_metadata,
+                    actions=EventActions(state_delta={SPECULATION_KEY: outcome}),
+                )
+                return
+        finally:
+            if not draft.done():
+                draft.cancel()
+
+        STATS[f"discarded.{reason}"] += 1
+        # Authored by the drafter so a finished draft's tokens are still accounted.
+        spent = draft.result() if draft.done() and not draft.cancelled() and not draft.exception() else None
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=drafter.name,
+            branch=ctx.branch,
+            custom_metadata=spent.custom_metadata if spent else None,
+            actions=EventActions(state_delta={SPECULATION_KEY: outcome}),
+        )
+        async for event in output_agent.run_async(ctx):
+            yield event
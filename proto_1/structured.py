@@ -0,0 +1,149 @@
+"""Structured-output enforcement and a tolerant decoder for context-agent replies.
+
+``StructuredOutput`` asks Gemini for schema-constrained JSON on every call.
+``decode`` turns whatever text comes back into a validated model: the fast
+path is a single pydantic-core parse+validate, then fence/prose stripping,
+then one repair pass, then a partial parse of truncated output. Validators
+are built once at import, so a clean decode costs microseconds.
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from pydantic_core import from_json
+
+from .schemas import AGENT_SCHEMAS
+
+VALIDATORS = {name: TypeAdapter(schema) for name, schema in AGENT_SCHEMAS.items()}
+
+# Per-agent outcome counts: "<agent>.clean", ".extracted", ".repaired",
+# ".partial", ".default" and ".failed".
+STATS: Counter = Counter()
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_PY_LITERALS = re.compile(r"\b(True|False|None)\b")
+_PY_LITERAL_MAP = {"True": "true", "False": "false", "None": "null"}
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+class StructuredOutput:
+    """before_model_callback that requests JSON constrained to ``schema``."""
+
+    def __init__(self, schema: type[BaseModel]):
+        self.schema = schema
+
+    def __call__(self, callback_context, llm_request):
+        llm_request.config.response_mime_type = "application/json"
+        llm_request.config.response_schema = self.schema
+        return None
+
+
+@dataclass
+class Decoded:
+    value: Optional[BaseModel]
+    stage: str
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.value is not None
+
+
+def _extract(text: str) -> str:
+    """Drops code fences and any prose around the outermost JSON object."""
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1:
+        return text
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def repair(text: str) -> str:
+    """One-shot fixes for the mistakes models actually make in JSON."""
+    text = text.translate(_SMART_QUOTES)
+    text = _TRAILING_COMMA.sub(r"\1", text)
+    text = _PY_LITERALS.sub(lambda m: _PY_LITERAL_MAP[m.group(1)], text)
+    if '"' not in text:
+        text = text.replace("'", '"')
+    return text
+
+
+def decode_partial(text: str) -> Any:
+    """Best-effort parse of a possibly truncated (streaming) JSON reply."""
+    try:
+        return from_json(_extract(text), allow_partial="trailing-strings")
+    except ValueError:
+        return None
+
+
+def decode(agent_name: str, text: Any) -> Decoded:
+    """Validates an agent reply against its schema, repairing it if needed.
+
+    ``text`` is the reply's JSON text or an already-parsed object. Anything
+    else (None, a list, a number) never raises: it decodes to the schema's
+    defaults ("default") when every field has one, and to "failed" otherwise.
+    """
+    validator = VALIDATORS[agent_name]
+    if isinstance(text, BaseModel):
+        text = text.model_dump()
+    elif isinstance(text, (bytes, bytearray)):
+        text = bytes(text).decode("utf-8", errors="replace")
+    if not isinstance(text, (str, dict)):
+        try:
+            result = Decoded(validator.validate_python({}), "default")
+        except ValidationError:
+            result = Decoded(None, "failed", f"expected JSON text or an object, got {type(text).__name__}")
+        STATS[f"{agent_name}.{result.stage}"] += 1
+        return result
+    if isinstance(text, dict):
+        try:
+            result = Decoded(validator.validate_python(text), "clean")
+        except ValidationError as error:
+            result = Decoded(None, "failed", str(error))
+        STATS[f"{agent_name}.{result.stage}"] += 1
+        return result
+
+    result = None
+    error = None
+    stripped = text.strip()
+    candidates = (("clean", lambda: stripped), ("extracted", lambda: _extract(stripped)),
+                  ("repaired", lambda: repair(_extract(stripped))))
+    for stage, candidate in candidates:
+        try:
+            result = Decoded(validator.validate_json(candidate()), stage)
+            break
+        except ValidationError as exc:
+            error = str(exc)
+    if result is None:
+        partial = decode_partial(repair(stripped))
+        try:
+            if isinstance(partial, dict):
+                result = Decoded(validator.validate_python(partial), "partial")
+        except ValidationError as exc:
+            error = str(exc)
+    if result is None:
+        result = Decoded(None, "failed", error)
+    STATS[f"{agent_name}.{result.stage}"] += 1
+    return result
+
+
+def decode_stats() -> dict:
+    """Repair and failure rates per agent from ``STATS``."""
+    report = {}
+    for agent in AGENT_SCHEMAS:
+        counts = {stage: STATS[f"{agent}.{stage}"] for stage in
+                  ("clean", "extracted", "repaired", "partial", "default", "failed")}
+        total = sum(counts.values())
+        if total:
+            report[agent] = {
+                **counts,
+                "repair_rate": (counts["repaired"] + counts["partial"]) / total,
+                "failure_rate": counts["failed"] / total,
+            }
+    return report
@@ -0,0 +1,367 @@
+"""Per-stage latency spans for the agent pipeline.
+
+``TracingPlugin`` is an ADK plugin, so it sees every agent, model and tool
+call without touching the agents themselves. Each turn becomes one trace:
+
+    turn
+    └─ final_agent
+       ├─ context_agent
+       │  ├─ entity ── model:entity
+       │  ├─ intent ── model:intent
+       │  └─ tone   ── model:tone
+       └─ output_agent ── model:output_agent (+ google_search when grounded)
+
+Finished traces go to a JSONL file in OTLP/JSON format (readable by an
+OpenTelemetry collector's ``otlpjsonfile`` receiver) and/or are POSTed to an
+OTLP/HTTP endpoint, from a background thread so a slow collector never
+holds up the event loop. The spans recorded so far are also attached to
+the final output_agent event as ``custom_metadata["trace"]`` so a remote
+client can draw the waterfall without access to the server, and each model
+call's usage is copied to ``custom_metadata["usage"]`` so it survives in
+stored sessions.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+TRACE_METADATA_KEY = "trace"
+# Session services do not persist usage_metadata, but they keep custom_metadata.
+USAGE_METADATA_KEY = "usage"
+OUTPUT_AGENT = "output_agent"
+
+# Key of the model call in flight in the current task. A call's before- and
+# after-model callbacks run in the same task, while calls that overlap (an
+# agent still running detached past its deadline, the speculative drafter)
+# run in tasks of their own, so each call finds its own span.
+_MODEL_CALL: contextvars.ContextVar = contextvars.ContextVar("saarthi_model_call", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    start: float
+    end: Optional[float] = None
+    span_id: str = field(default_factory=lambda: os.urandom(8).hex())
+    parent_id: Optional[str] = None
+    attributes: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+
+def _trace_id(invocation_id: str) -> str:
+    return hashlib.md5(invocation_id.encode()).hexdigest()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(invocation_id: str, spans: List[Span]) -> dict:
+    """One trace in the OTLP/JSON ``ExportTraceServiceRequest`` shape."""
+    trace_id = _trace_id(invocation_id)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "saarthi"}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "proto_1.tracing"},
+                        "spans": [
+                            {
+                                "traceId": trace_id,
+                                "spanId": span.span_id,
+                                "parentSpanId": span.parent_id or "",
+                                "name": span.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(int(span.start * 1e9)),
+                                "endTimeUnixNano": str(int((span.end or span.start) * 1e9)),
+                                "attributes": [
+                                    {"key": key, "value": _otlp_value(value)}
+                                    for key, value in {"saarthi.kind": span.kind, **span.attributes}.items()
+                                ],
+                            }
+                            for span in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def export(invocation_id: str, spans: List[Span]) -> None:
+    """Writes a finished trace to the configured file and/or OTLP endpoint."""
+    if not (settings.TRACE_FILE or settings.OTLP_ENDPOINT):
+        return
+    payload = to_otlp(invocation_id, spans)
+    try:
+        if settings.TRACE_FILE:
+            with open(settings.TRACE_FILE, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(payload) + "\n")
+        if settings.OTLP_ENDPOINT:
+            request = urllib.request.Request(
+                settings.OTLP_ENDPOINT.rstrip("/") + "/v1/traces",
+                data=json.dumps(payload).encode(),
+                headers={"Content-Type": "application/json"},
+            )
+            urllib.request.urlopen(request, timeout=2).close()
+    except OSError as error:
+        logger.warning("Trace export failed: %s", error)
+
+
+class Exporter:
+    """Runs ``export`` on a daemon thread; traces beyond ``max_queue`` waiting are dropped."""
+
+    def __init__(self, max_queue: int = 1000):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, invocation_id: str, spans: List[Span]) -> None:
+        if not (settings.TRACE_FILE or settings.OTLP_ENDPOINT):
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="saarthi-trace-export", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait((invocation_id, spans))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Trace export queue full; dropped trace %s", invocation_id)
+
+    def _run(self) -> None:
+        while True:
+            export(*self._queue.get())
+            self._queue.task_done()
+
+    def flush(self) -> None:
+        """Waits until every submitted trace has been written."""
+        self._queue.join()
+
+
+EXPORTER = Exporter()
+
+
+class TracingPlugin(BasePlugin):
+    """Records turn, agent, model and tool spans for every invocation."""
+
+    def __init__(self, name: str = "saarthi_tracing", keep: int = 50):
+        super().__init__(name=name)
+        self._lock = threading.Lock()
+        self._spans: Dict[str, List[Span]] = {}
+        self._open: Dict[tuple, Span] = {}
+        # Most recent finished traces, for in-process consumers.
+        self.recent = deque(maxlen=keep)
+
+    def __getstate__(self):
+        # Only configuration travels with the pickled app; spans stay per process.
+        return {"name": self.name, "keep": self.recent.maxlen}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _start(self, invocation_id, key, name, kind, parent_key=None, **attributes) -> Span:
+        with self._lock:
+            if key != "turn" and invocation_id not in self._spans:
+                # A sub-agent still running after its turn ended (see
+                # proto_1/deadlines.py); the turn's trace is already exported.
+                return Span(name=name, kind=kind, start=time.time(), attributes=attributes)
+            parent = self._open.get((invocation_id, parent_key)) if parent_key else None
+            span = Span(
+                name=name,
+                kind=kind,
+                start=time.time(),
+                parent_id=parent.span_id if parent else None,
+                attributes=attributes,
+            )
+            self._spans.setdefault(invocation_id, []).append(span)
+            self._open[(invocation_id, key)] = span
+            return span
+
+    def _finish(self, invocation_id, key, **attributes) -> Optional[Span]:
+        with self._lock:
+            span = self._open.pop((invocation_id, key), None)
+        if span:
+            span.end = time.time()
+            span.attributes.update(attributes)
+        return span
+
+    async def before_run_callback(self, *, invocation_context):
+        self._start(invocation_context.invocation_id, "turn", "turn", "turn")
+        return None
+
+    async def before_agent_callback(self, *, agent, callback_context):
+        parent_key = ("agent", agent.parent_agent.name) if agent.parent_agent else "turn"
+        self._start(callback_context.invocation_id, ("agent", agent.name), agent.name, "agent", parent_key)
+        return None
+
+    async def after_agent_callback(self, *, agent, callback_context):
+        invocation_id = callback_context.invocation_id
+        # A model span still open here was answered by a before_model_callback
+        # (e.g. the cascade) without reaching the model.
+        with self._lock:
+            unanswered = [
+                key for open_id, key in self._open
+                if open_id == invocation_id and key[0] == "model" and key[1] == agent.name
+            ]
+        for key in unanswered:
+            self._finish(invocation_id, key, short_circuited=True)
+        self._finish(invocation_id, ("agent", agent.name))
+        return None
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        invocation_id = callback_context.invocation_id
+        name = callback_context.agent_name
+        agent_span = self._open.get((invocation_id, ("agent", name)))
+        # One key per call, so repeated or overlapping calls of an agent
+        # (tool round trips, a detached late call) keep separate spans.
+        key = ("model", name, os.urandom(4).hex())
+        _MODEL_CALL.set(key)
+        span = self._start(
+            invocation_id, key, f"model:{name}", "model", ("agent", name),
+            model=llm_request.model or "",
+        )
+        if agent_span:
+            # Time between the agent starting and its model request leaving.
+            span.attributes["queued_s"] = round(span.start - agent_span.start, 4)
+        return None
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        if llm_response.usage_metadata and not llm_response.partial:
+            # Set on the response so it is part of the event when it is stored.
+            llm_response.custom_metadata = {
+                **(llm_response.custom_metadata or {}),
+                USAGE_METADATA_KEY: llm_response.usage_metadata.model_dump(mode="json", exclude_none=True),
+            }
+        invocation_id = callback_context.invocation_id
+        name = callback_context.agent_name
+        call = _MODEL_CALL.get()
+        if call is None or call[1] != name:
+            return None
+        span = self._open.get((invocation_id, call))
+        if span is None:
+            return None
+        if "first_chunk_s" not in span.attributes:
+            span.attributes["first_chunk_s"] = round(time.time() - span.start, 4)
+        if llm_response.partial:
+            return None
+        usage = llm_response.usage_metadata
+        attributes = {}
+        if usage:
+            attributes["prompt_tokens"] = usage.prompt_token_count or 0
+            attributes["output_tokens"] = usage.candidates_token_count or 0
+        finished = self._finish(invocation_id, call, **attributes)
+        if finished and llm_response.grounding_metadata:
+            # google_search is a built-in tool executed inside the model call,
+            # so its span covers the grounded call rather than a separate hop.
+            queries = llm_response.grounding_metadata.web_search_queries or []
+            with self._lock:
+                self._spans[invocation_id].append(
+                    Span(
+                        name="google_search",
+                        kind="tool",
+                        start=finished.start,
+                        end=finished.end,
+                        parent_id=finished.span_id,
+                        attributes={"queries": len(queries)},
+                    )
+                )
+        return None
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        invocation_id = tool_context.invocation_id
+        self._start(
+            invocation_id, ("tool", tool.name), tool.name, "tool", ("agent", tool_context.agent_name)
+        )
+        return None
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        self._finish(tool_context.invocation_id, ("tool", tool.name))
+        return None
+
+    async def on_event_callback(self, *, invocation_context, event):
+        if not event.author.startswith(OUTPUT_AGENT) or event.partial or not event.content:
+            return None
+        with self._lock:
+            spans = list(self._spans.get(invocation_context.invocation_id, []))
+        event.custom_metadata = {
+            **(event.custom_metadata or {}),
+            TRACE_METADATA_KEY: [span_dict(span) for span in spans],
+        }
+        return event
+
+    async def after_run_callback(self, *, invocation_context):
+        invocation_id = invocation_context.invocation_id
+        self._finish(invocation_id, "turn")
+        with self._lock:
+            spans = self._spans.pop(invocation_id, [])
+            for key in [key for key in self._open if key[0] == invocation_id]:
+                del self._open[key]
+        self.recent.append((invocation_id, spans))
+        EXPORTER.submit(invocation_id, spans)
+        return None
+
+
+def span_dict(span: Span) -> dict:
+    """JSON-friendly form of a span, as attached to events."""
+    return asdict(span)
+
+
+def critical_path(spans: List[dict]) -> dict:
+    """Summarizes one turn's spans (as produced by ``span_dict``).
+
+    For an agent whose sub-agents overlap (the ParallelAgent), ``parallelism``
+    is their summed duration divided by the parent's wall time: close to the
+    number of sub-agents when they really run side by side, close to 1.0 when
+    they run one after another. ``slowest`` is the sub-agent that finished
+    last, i.e. the one on the critical path.
+    """
+    agents = [span for span in spans if span["kind"] == "agent" and span.get("end")]
+    summary = {
+        "durations": {span["name"]: span["end"] - span["start"] for span in agents},
+        "parallel_stage": None,
+        "parallelism": None,
+        "slowest": None,
+    }
+    for parent in agents:
+        children = [span for span in agents if span.get("parent_id") == parent["span_id"]]
+        if len(children) < 2 or any(child["name"] == OUTPUT_AGENT for child in children):
+            continue
+        wall = parent["end"] - parent["start"]
+        busy = sum(child["end"] - child["start"] for child in children)
+        summary.update(
+            parallel_stage=parent["name"],
+            parallelism=round(busy / wall, 2) if wall else None,
+            slowest=max(children, key=lambda child: child["end"])["name"],
+        )
+    return summary
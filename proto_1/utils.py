@@ -0,0 +1,27 @@
+"""Small helpers shared by the agent callbacks."""
+import json
+from typing import Optional
+
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def content_text(content: Optional[types.Content]) -> str:
+    """Concatenates the text parts of a Content, ignoring tool parts."""
+    if not content or not content.parts:
+        return ""
+    return "".join(part.text for part in content.parts if part.text)
+
+
+def json_response(payload: dict) -> LlmResponse:
+    """Builds a model response carrying ``payload`` as its JSON text."""
+    return LlmResponse(
+        content=types.Content(
+            role="model", parts=[types.Part(text=json.dumps(payload, ensure_ascii=False))]
+        )
+    )
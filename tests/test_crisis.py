@@ -0,0 +1,93 @@
+import pytest
+
+from proto_1.crisis import DANGER, SUICIDE, CrisisMatcher, assess, crisis_response, normalize
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "I want to die",
+        "No I want to die",
+        "no no no I want to die",
+        "No. I want to die",
+        "Not anymore, I want to end it all",
+        "I'll try not to kill myself tonight",
+        "I never said I don't feel suicidal",
+        "I'm not sure, but I want to die",
+        "Honestly I wish I was dead",
+        "I've been thinking about self-harm again",
+        "kabhi kabhi khudkushi ka khayal aata hai",
+        "main marna chahta hoon",
+        "मैं मरना चाहता हूँ",
+        "quiero morir",
+    ],
+)
+def test_flags_crisis(message):
+    assert assess(message).is_crisis
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "I would never kill myself",
+        "I don't want to die, I want things to get better",
+        "I do not want to die",
+        "I will not hurt myself",
+        "I'm not suicidal, just tired",
+        "I have no suicidal thoughts",
+        "I would never ever hurt myself",
+        "no quiero morir",
+        "I had a long day at work and feel drained",
+    ],
+)
+def test_does_not_flag(message):
+    assert not assess(message).is_crisis
+
+
+def test_negated_match_is_kept():
+    assessment = assess("I would never kill myself")
+    assert [match.phrase for match in assessment.matches] == ["kill myself"]
+    assert assessment.matches[0].negated
+
+
+def test_negation_does_not_cross_clause_punctuation():
+    assert assess("I don't know. I want to die").is_crisis
+
+
+def test_negation_only_covers_the_phrase_it_governs():
+    assessment = assess("I don't want to die but I keep thinking about suicide")
+    assert assessment.is_crisis
+    assert [match.phrase for match in assessment.active] == ["suicid"]
+
+
+def test_category_and_state():
+    assessment = assess("he is going to kill me and I want to die")
+    assert assessment.category == SUICIDE
+    assert assessment.as_state() == {
+        "category": SUICIDE,
+        "intent": "crisis_help",
+        "phrases": ["he is going to kill me", "want to die"],
+    }
+    assert assess("I am not safe at home").category == DANGER
+
+
+def test_word_boundaries():
+    assert not assess("the painkiller myselfie").is_crisis
+    assert assess("suicidal thoughts").is_crisis
+
+
+def test_response_language():
+    assert "Tele-MANAS" in crisis_response(assess("मैं मरना चाहता हूँ"))
+    assert "988" in crisis_response(assess("quiero morir"))
+    assert crisis_response(assess("main marna chahta hoon")) == crisis_response(assess("I want to die"))
+
+
+def test_custom_lexicon_and_cues():
+    matcher = CrisisMatcher({("en", SUICIDE): ["give up*"]}, negation_cues=["never"])
+    assert matcher.assess("I want to give up").is_crisis
+    assert not matcher.assess("I will never give up").is_crisis
+    assert matcher.assess("I will not give up").matches[0].negated
+
+
+def test_normalize():
+    assert normalize("I’m NOT  ok!! Really?") == "i'm not ok , really ,"
@@ -0,0 +1,28 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from deployment.gateway import create_gateway
+from deployment.gateway_client import GatewayBusy, GatewayClient
+from deployment.scheduler import Scheduler
+
+
+def full_gateway():
+    """A gateway whose only slot is taken and whose queue holds nothing."""
+    scheduler = Scheduler(limits={"turns": 0.5}, max_queue=0)
+    assert scheduler.submit().granted
+    return TestClient(create_gateway(remote_app=None, scheduler=scheduler))
+
+
+def test_full_queue_is_refused_before_the_stream():
+    response = full_gateway().post("/sessions/u/s/messages", json={"message": "hello"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_client_raises_busy_for_a_full_queue():
+    client = GatewayClient("http://testserver")
+    client._http = full_gateway()
+    with pytest.raises(GatewayBusy) as raised:
+        list(client.stream_query("u", "s", "hello"))
+    assert not raised.value.accepted
+    assert raised.value.retry_after >= 1
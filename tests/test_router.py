@@ -0,0 +1,31 @@
+import json
+from types import SimpleNamespace
+
+from google.genai import types
+
+from proto_1.router import FULL, INTENT_TONE, ROUTE_KEY, route, skip_unrouted
+
+
+def test_possessive_relations_need_the_entity_agent():
+    decision = route("I failed my exam and my mom is angry with me")
+    assert decision.plan == FULL
+    assert "relation" in decision.reasons
+    assert route("my best friends ignore me").plan == FULL
+
+
+def test_short_messages_without_cues_skip_the_entity_agent():
+    assert route("I feel tired today").plan == INTENT_TONE
+
+
+def test_skipped_entity_agent_keeps_the_last_entity_context():
+    previous = {
+        "topic_summary": "exam stress",
+        "entities": [{"text": "mom", "type": "PERSON", "normalized_value": "mother"}],
+    }
+    context = SimpleNamespace(
+        agent_name="entity",
+        state={ROUTE_KEY: route("I feel tired today").as_state(), "entity_context": previous},
+        user_content=types.Content(role="user", parts=[types.Part(text="I feel tired today")]),
+    )
+    reply = skip_unrouted(context, llm_request=None)
+    assert json.loads(reply.content.parts[0].text) == previous
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from deployment.scheduler import CRISIS, QueueFull, QueueTimeout, Scheduler
+
+
+def busy_scheduler(**options):
+    """A scheduler whose only slot is taken, so the next turn queues."""
+    scheduler = Scheduler(limits={"turns": 0.001}, **options)
+    assert scheduler.submit().granted
+    return scheduler
+
+
+def depth(scheduler):
+    return scheduler.snapshot()["queue_depth"]
+
+
+def test_cancel_leaves_the_queue():
+    scheduler = busy_scheduler()
+    ticket = scheduler.submit()
+    assert depth(scheduler) == 1
+    assert ticket.cancel()
+    assert not ticket.cancel()
+    assert depth(scheduler) == 0
+    assert scheduler.stats["interactive.cancelled"] == 1
+
+
+def test_full_queue_refuses_all_but_crisis():
+    scheduler = busy_scheduler(max_queue=0)
+    with pytest.raises(QueueFull):
+        scheduler.submit()
+    scheduler.submit(CRISIS).cancel()
+
+
+def test_acquire_times_out_and_leaves_the_queue():
+    scheduler = busy_scheduler(max_wait=0.05)
+    with pytest.raises(QueueTimeout):
+        scheduler.acquire(interval=0.02)
+    assert depth(scheduler) == 0
+    assert scheduler.stats["interactive.timed_out"] == 1
+
+
+def test_acquire_abandoned_while_waiting_leaves_the_queue():
+    scheduler = busy_scheduler()
+
+    def stop(position, waited):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.acquire(on_wait=stop, interval=0.01)
+    assert depth(scheduler) == 0
+
+
+def test_queued_times_out_and_leaves_the_queue():
+    scheduler = busy_scheduler(max_wait=0.05)
+
+    async def wait():
+        async for _ in scheduler.queued(interval=0.02):
+            pass
+
+    with pytest.raises(QueueTimeout):
+        asyncio.run(wait())
+    assert depth(scheduler) == 0
+
+
+def test_closed_queued_leaves_the_queue():
+    scheduler = busy_scheduler()
+
+    async def close_while_waiting():
+        waiting = scheduler.queued(interval=0.01)
+        assert (await anext(waiting))["position"] == 0
+        await waiting.aclose()
+
+    asyncio.run(close_while_waiting())
+    assert depth(scheduler) == 0
+
+
+def test_cancelled_queued_leaves_the_queue():
+    scheduler = busy_scheduler()
+
+    async def cancel_while_waiting():
+        async def wait():
+            async for _ in scheduler.queued(interval=0.01):
+                pass
+
+        task = asyncio.create_task(wait())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_while_waiting())
+    assert depth(scheduler) == 0
@@ -0,0 +1,45 @@
+import pytest
+
+from proto_1.schemas import EntityReport, IntentReport
+from proto_1.structured import decode
+
+
+def test_clean_json():
+    decoded = decode("intent", '{"primary_intent": "venting", "confidence_score": 0.8}')
+    assert decoded.stage == "clean"
+    assert decoded.value.primary_intent == "venting"
+
+
+def test_fenced_and_repaired():
+    decoded = decode("intent", "Sure!\n```json\n{'primary_intent': 'venting', 'secondary_intents': [],}\n```")
+    assert decoded.ok
+    assert decoded.stage == "repaired"
+
+
+def test_truncated_reply_decodes_partially():
+    decoded = decode("tone", '{"primary_emotion": "sadness", "rationale": "the user sou')
+    assert decoded.stage == "partial"
+    assert decoded.value.primary_emotion == "sadness"
+
+
+def test_dict_and_model_input():
+    assert decode("intent", {"primary_intent": "venting"}).ok
+    assert decode("intent", IntentReport(primary_intent="venting")).value.primary_intent == "venting"
+
+
+@pytest.mark.parametrize("value", [None, [], ["a"], 3, 2.5, True])
+def test_non_text_input_never_raises(value):
+    assert decode("entity", value).value == EntityReport()
+    decoded = decode("intent", value)
+    assert not decoded.ok
+    assert decoded.stage == "failed"
+
+
+def test_bytes_input():
+    assert decode("intent", b'{"primary_intent": "venting"}').ok
+
+
+def test_garbage_fails():
+    decoded = decode("intent", "I could not classify this message.")
+    assert not decoded.ok
+    assert decoded.error